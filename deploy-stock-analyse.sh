@@ -137,7 +137,7 @@ After=network.target
 Type=simple
 User=$USER
 WorkingDirectory=/opt/stock-analyse/python-data-service
-ExecStart=/usr/bin/python3 stock_data_service.py
+ExecStart=/usr/bin/python3 serve.py
 Restart=always
 RestartSec=10
 
@@ -0,0 +1,124 @@
+"""
+新闻正文缓存 - 按URL持久化保存提取后的正文文本及 ETag/Last-Modified
+
+新闻发布后正文基本不变：
+    - 在 REVALIDATE_AFTER_SECONDS 内命中缓存直接返回，不访问网络
+    - 超过该时间后用 If-None-Match/If-Modified-Since 做条件请求，304 时沿用缓存
+    - 条目数超过 MAX_ENTRIES 时按最近访问时间做LRU淘汰
+使用 SQLite 存储，服务重启后仍然有效。
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import metrics
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'article_cache.sqlite3')
+
+MAX_ENTRIES = int(os.getenv('ARTICLE_CACHE_MAX_ENTRIES', '5000'))
+REVALIDATE_AFTER_SECONDS = int(os.getenv('ARTICLE_CACHE_REVALIDATE_AFTER', str(7 * 24 * 3600)))
+
+
+@dataclass
+class CachedArticle:
+    url: str
+    content: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    validated_at: float
+
+    @property
+    def needs_revalidation(self) -> bool:
+        return time.time() - self.validated_at > REVALIDATE_AFTER_SECONDS
+
+
+class ArticleCache:
+    """线程安全的 SQLite 正文缓存。"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = MAX_ENTRIES):
+        self.path = path or os.getenv('ARTICLE_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """调用方需持有 self._lock。"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS articles ('
+                ' url TEXT PRIMARY KEY,'
+                ' content TEXT NOT NULL,'
+                ' etag TEXT,'
+                ' last_modified TEXT,'
+                ' fetched_at REAL NOT NULL,'
+                ' validated_at REAL NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_articles_last_access ON articles(last_access)')
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, url: str) -> Optional[CachedArticle]:
+        """读取缓存并更新最近访问时间。"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute(
+                    'SELECT content, etag, last_modified, validated_at FROM articles WHERE url = ?', (url,)
+                ).fetchone()
+                if row is None:
+                    metrics.observe_cache('article', 'miss')
+                    return None
+                conn.execute('UPDATE articles SET last_access = ? WHERE url = ?', (time.time(), url))
+                conn.commit()
+        except sqlite3.Error as exc:
+            print(f"[{datetime.now()}] ⚠️ 读取新闻正文缓存失败: {exc}")
+            return None
+        metrics.observe_cache('article', 'hit')
+        return CachedArticle(url=url, content=row[0], etag=row[1], last_modified=row[2], validated_at=row[3])
+
+    def put(self, url: str, content: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """写入正文，超出容量时淘汰最久未访问的条目。"""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    'INSERT OR REPLACE INTO articles (url, content, etag, last_modified, fetched_at, validated_at, last_access)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (url, content, etag, last_modified, now, now, now)
+                )
+                count = conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+                if count > self.max_entries:
+                    conn.execute(
+                        'DELETE FROM articles WHERE url IN ('
+                        ' SELECT url FROM articles ORDER BY last_access ASC LIMIT ?)',
+                        (count - self.max_entries,)
+                    )
+                conn.commit()
+        except sqlite3.Error as exc:
+            print(f"[{datetime.now()}] ⚠️ 写入新闻正文缓存失败: {exc}")
+
+    def mark_validated(self, url: str) -> None:
+        """条件请求返回304后，刷新校验时间。"""
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute('UPDATE articles SET validated_at = ? WHERE url = ?', (time.time(), url))
+                conn.commit()
+        except sqlite3.Error as exc:
+            print(f"[{datetime.now()}] ⚠️ 更新新闻正文缓存失败: {exc}")
+
+
+article_cache = ArticleCache()
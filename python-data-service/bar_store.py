@@ -0,0 +1,354 @@
+"""
+日线K线本地存储 - 按股票代码分文件保存标准化后的OHLCV数据
+
+存储格式：
+    data/bars/<symbol>.parquet    标准化的不复权日线（date/open/high/low/close/volume/turnover），
+                                  volume 单位为股，turnover 为成交额（元）
+    data/bars/<symbol>.meta.json  覆盖起始日期、最后同步时间、数据来源、存储格式版本
+
+未安装 pyarrow 时自动回退为 pickle 格式，接口保持不变。
+
+增量同步：已入库的股票只向上游请求 [最后交易日+1, 今天] 的日线（sync_tail），
+不再重复下载上市以来的全量历史。
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from lazy_import import lazy_import
+from trading_calendar import market_now, trading_calendar
+
+# pandas 延迟导入（见 lazy_import.py），导入本模块时不加载
+pd = lazy_import('pandas')
+
+BAR_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume', 'turnover']
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'bars')
+
+# 存储格式版本：单位或口径变化时递增，旧版本的本地数据视为不存在，重新全量拉取
+BAR_SCHEMA_VERSION = 2
+
+# 标准列名 -> 各AKShare日线接口中的候选列名（按优先级）
+_COLUMN_CANDIDATES = {
+    'date': ('日期', '交易日期', 'Date', 'date'),
+    'open': ('开盘', '开盘价', 'Open', 'open'),
+    'high': ('最高', '最高价', 'High', 'high'),
+    'low': ('最低', '最低价', 'Low', 'low'),
+    'close': ('收盘', '收盘价', 'Close', 'close'),
+    'volume': ('成交量', 'Volume', 'volume'),
+    # 成交额（元）。stock_zh_a_daily、stock_zh_a_hist_tx 返回的 turnover 列是换手率，不作为成交额
+    'turnover': ('成交额', '成交金额', 'Amount', 'amount'),
+}
+
+# 以“手”为单位的成交量列（东方财富 stock_zh_a_hist），入库时换算为股；
+# stock_zh_a_daily 和 stock_zh_a_hist_tx 的 volume 已经是股
+_VOLUME_LOT_COLUMNS = ('成交量',)
+SHARES_PER_LOT = 100
+
+# 标准化后各列的单位，随响应返回给客户端
+BAR_UNITS = {'volume': '股', 'turnover': '元'}
+
+# 交易时段内距离上次同步不足该秒数时，即使最新交易日尚未入库也不再访问上游（停牌场景）；
+# 闭市期间同步过的股票在下一个交易时段开始前都不再访问上游
+SYNC_INTERVAL_SECONDS = int(os.getenv('BAR_STORE_SYNC_INTERVAL', '600'))
+# 内存中最多保留的股票数量（LRU）
+MEMORY_SYMBOLS = int(os.getenv('BAR_STORE_MEMORY_SYMBOLS', '256'))
+
+
+def _detect_format() -> str:
+    # 只检查是否安装，不导入 pyarrow（读写 parquet 时由 pandas 导入）
+    return 'parquet' if importlib.util.find_spec('pyarrow') is not None else 'pickle'
+
+
+def plain_code(symbol: str) -> str:
+    """sh600000 -> 600000（stock_zh_a_hist 只接受6位代码，带前缀时返回空数据）。"""
+    return symbol[-6:]
+
+
+def normalize_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """把AKShare各日线接口的返回值统一成 BAR_COLUMNS 格式（volume 为股，turnover 为成交额/元）。
+
+    已经是 BAR_COLUMNS 格式的数据原样通过，可以重复调用。
+    缺失的 volume/turnover 保留为 NaN，由调用方决定如何估算。
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+
+    if list(df.columns) == BAR_COLUMNS:
+        columns = {col: df[col] for col in BAR_COLUMNS}
+    else:
+        columns = {}
+        for target, candidates in _COLUMN_CANDIDATES.items():
+            source = next((col for col in candidates if col in df.columns), None)
+            if source is None:
+                continue
+            values = df[source]
+            if target == 'volume' and source in _VOLUME_LOT_COLUMNS:
+                values = pd.to_numeric(values, errors='coerce') * SHARES_PER_LOT
+            columns[target] = values
+
+    if 'date' not in columns or 'close' not in columns:
+        raise ValueError(f"日线数据缺少日期或收盘价列, 可用列: {list(df.columns)}")
+
+    df = pd.DataFrame({col: columns.get(col, float('nan')) for col in BAR_COLUMNS}, index=df.index)
+    df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.normalize()
+    for col in BAR_COLUMNS[1:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+
+    df = df[df['date'].notna() & (df['close'] > 0)]
+    df = df.drop_duplicates(subset=['date'], keep='last').sort_values('date')
+    return df.reset_index(drop=True)
+
+
+def expected_last_trade_date(now: Optional[datetime] = None) -> pd.Timestamp:
+    """当前应能取到的最新日线日期（交易日 15:30 之后为当日，否则为上一个交易日）。"""
+    return pd.Timestamp(trading_calendar.last_settled_trade_date(now))
+
+
+class DailyBarStore:
+    """按股票代码分文件的日线存储，带内存LRU和按股票粒度的锁。"""
+
+    def __init__(self, root: Optional[str] = None, fmt: Optional[str] = None):
+        self.root = root or os.getenv('STOCK_BAR_STORE_DIR', DEFAULT_STORE_DIR)
+        self.fmt = fmt or _detect_format()
+        self._memory: 'OrderedDict[str, pd.DataFrame]' = OrderedDict()
+        self._meta: Dict[str, Dict] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._guard = threading.Lock()
+
+    # ---- 路径与锁 ----
+    def _data_path(self, symbol: str) -> str:
+        ext = 'parquet' if self.fmt == 'parquet' else 'pkl'
+        return os.path.join(self.root, f"{symbol}.{ext}")
+
+    def _meta_path(self, symbol: str) -> str:
+        return os.path.join(self.root, f"{symbol}.meta.json")
+
+    def lock_for(self, symbol: str) -> threading.RLock:
+        with self._guard:
+            lock = self._locks.get(symbol)
+            if lock is None:
+                lock = self._locks[symbol] = threading.RLock()
+            return lock
+
+    # ---- 读写 ----
+    def _load(self, symbol: str) -> Optional[pd.DataFrame]:
+        with self._guard:
+            cached = self._memory.get(symbol)
+            if cached is not None:
+                self._memory.move_to_end(symbol)
+                return cached
+
+        path = self._data_path(symbol)
+        if not os.path.exists(path) or self.meta(symbol).get('schema') != BAR_SCHEMA_VERSION:
+            return None
+        try:
+            if self.fmt == 'parquet':
+                df = pd.read_parquet(path)
+            else:
+                df = pd.read_pickle(path)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 读取本地日线失败 {symbol}: {exc}")
+            return None
+        self._remember(symbol, df)
+        return df
+
+    def _remember(self, symbol: str, df: pd.DataFrame) -> None:
+        with self._guard:
+            self._memory[symbol] = df
+            self._memory.move_to_end(symbol)
+            while len(self._memory) > MEMORY_SYMBOLS:
+                self._memory.popitem(last=False)
+
+    def _write(self, symbol: str, df: pd.DataFrame) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._data_path(symbol)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if self.fmt == 'parquet':
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+    def meta(self, symbol: str) -> Dict:
+        with self._guard:
+            if symbol in self._meta:
+                return self._meta[symbol]
+        meta = {}
+        path = self._meta_path(symbol)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as fh:
+                    meta = json.load(fh)
+            except Exception:  # pylint: disable=broad-except
+                meta = {}
+        with self._guard:
+            self._meta[symbol] = meta
+        return meta
+
+    def _save_meta(self, symbol: str, meta: Dict) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = self._meta_path(symbol)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump(meta, fh, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._guard:
+            self._meta[symbol] = meta
+
+    def read(self, symbol: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Optional[pd.DataFrame]:
+        """读取 [start, end] 区间的日线，没有本地数据时返回 None。"""
+        df = self._load(symbol)
+        if df is None or df.empty:
+            return None
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df['date'] >= pd.Timestamp(start).normalize()
+        if end is not None:
+            mask &= df['date'] <= pd.Timestamp(end)
+        return df[mask].reset_index(drop=True)
+
+    def last_date(self, symbol: str) -> Optional[pd.Timestamp]:
+        df = self._load(symbol)
+        if df is None or df.empty:
+            return None
+        return df['date'].iloc[-1]
+
+    def merge(self, symbol: str, df_new: pd.DataFrame, coverage_start: Optional[datetime] = None,
+              source: str = '') -> pd.DataFrame:
+        """把新拉取的日线合并入库（同日期以新数据为准），返回合并后的全量数据。
+
+        coverage_start 表示本次拉取保证完整覆盖的起始日期，None 表示从上市首日起完整。
+        """
+        bars = normalize_bars(df_new)
+        with self.lock_for(symbol):
+            existing = self._load(symbol)
+            meta = dict(self.meta(symbol))
+            if meta.get('schema') != BAR_SCHEMA_VERSION:
+                # 旧格式的数据单位不同，不与新数据合并
+                existing, meta = None, {'schema': BAR_SCHEMA_VERSION}
+            if existing is not None and not existing.empty:
+                merged = pd.concat([existing, bars], ignore_index=True)
+                merged = merged.drop_duplicates(subset=['date'], keep='last').sort_values('date').reset_index(drop=True)
+            else:
+                merged = bars
+
+            if not merged.empty:
+                self._write(symbol, merged)
+                self._remember(symbol, merged)
+
+            previous_start = meta.get('coverageStart')
+            if coverage_start is None:
+                meta['coverageStart'] = None
+            else:
+                new_start = pd.Timestamp(coverage_start).strftime('%Y-%m-%d')
+                if 'coverageStart' not in meta or (previous_start is not None and new_start < previous_start):
+                    meta['coverageStart'] = new_start
+            meta['lastSync'] = datetime.now().isoformat()
+            if source:
+                meta['source'] = source
+            self._save_meta(symbol, meta)
+            return merged
+
+    def mark_synced(self, symbol: str) -> None:
+        """记录一次无新增数据的同步，避免节假日反复访问上游。"""
+        with self.lock_for(symbol):
+            meta = dict(self.meta(symbol))
+            meta['lastSync'] = datetime.now().isoformat()
+            self._save_meta(symbol, meta)
+
+    # ---- 新鲜度判断 ----
+    def covers(self, symbol: str, start: datetime) -> bool:
+        """本地数据是否完整覆盖从 start 开始的区间。"""
+        meta = self.meta(symbol)
+        if meta.get('schema') != BAR_SCHEMA_VERSION or 'coverageStart' not in meta:
+            return False
+        coverage_start = meta.get('coverageStart')
+        return coverage_start is None or pd.Timestamp(coverage_start) <= pd.Timestamp(start)
+
+    def is_fresh(self, symbol: str, now: Optional[datetime] = None) -> bool:
+        """最新交易日已入库，或上次同步后行情还不可能变化（闭市期间一直到下一个交易时段），则无需访问上游。"""
+        now = now or market_now()
+        last = self.last_date(symbol)
+        if last is None:
+            return False
+        if last >= expected_last_trade_date(now):
+            return True
+        last_sync = self.meta(symbol).get('lastSync')
+        if last_sync:
+            try:
+                synced_at = datetime.fromisoformat(last_sync).timestamp()
+                return now.timestamp() < trading_calendar.expires_at(synced_at, SYNC_INTERVAL_SECONDS)
+            except ValueError:
+                return False
+        return False
+
+
+bar_store = DailyBarStore()
+
+
+def sync_tail(symbol: str, store: Optional[DailyBarStore] = None, now: Optional[datetime] = None) -> Optional[int]:
+    """增量同步：只拉取最后入库日期之后的日线并合并。
+
+    依次尝试带日期区间的 stock_zh_a_hist（无复权，与 stock_zh_a_daily 口径一致）和 stock_zh_a_hist_tx。
+    某个接口返回空数据时视为未命中，继续尝试下一个；只有所有接口都确认没有新增日线时才记录本次同步。
+
+    Returns:
+        新增（或更新）的K线条数；本地尚无该股票数据时返回 None，由调用方做全量拉取。
+
+    Raises:
+        RuntimeError: 没有接口返回新增日线，且至少有一个接口调用失败（结果不确定，不记录同步）。
+    """
+    import akshare as ak  # pylint: disable=import-outside-toplevel
+    from provider_health import provider_health  # pylint: disable=import-outside-toplevel
+    from upstream import ak_call  # pylint: disable=import-outside-toplevel
+
+    store = store or bar_store
+    now = now or market_now()
+    with store.lock_for(symbol):
+        last = store.last_date(symbol)
+        if last is None:
+            return None
+        # 最新交易日已入库（或闭市期间刚同步过）：没有交易日过去，不访问上游
+        if store.is_fresh(symbol, now):
+            return 0
+
+        start_str = (last + timedelta(days=1)).strftime('%Y%m%d')
+        end_str = now.strftime('%Y%m%d')
+        fetchers = {
+            'stock_zh_a_hist': (ak.stock_zh_a_hist, {'symbol': plain_code(symbol), 'period': "daily",
+                                                     'start_date': start_str, 'end_date': end_str, 'adjust': ""}),
+            'stock_zh_a_hist_tx': (ak.stock_zh_a_hist_tx, {'symbol': symbol, 'start_date': start_str, 'end_date': end_str}),
+        }
+        last_exc = None
+        for source in provider_health.order(fetchers):
+            func, kwargs = fetchers[source]
+            try:
+                df_tail = ak_call(func, **kwargs)
+            except Exception as exc:  # pylint: disable=broad-except
+                last_exc = exc
+                print(f"[{datetime.now()}] ⚠️ 增量同步 {symbol} ({source}) 失败: {str(exc)[:200]}")
+                continue
+
+            bars = normalize_bars(df_tail) if df_tail is not None else pd.DataFrame(columns=BAR_COLUMNS)
+            bars = bars[bars['date'] > last]
+            if bars.empty:
+                print(f"[{datetime.now()}] 增量同步 {symbol} ({source}): {start_str}~{end_str} 无新增日线，尝试下一个接口")
+                continue
+            store.merge(symbol, bars, coverage_start=last, source=source)
+            print(f"[{datetime.now()}] ✅ 增量同步 {symbol}: 新增 {len(bars)} 条日线 ({source})")
+            return len(bars)
+
+        if last_exc is not None:
+            raise RuntimeError(f"增量同步 {symbol} 失败") from last_exc
+        # 所有接口都确认没有新增（节假日、停牌）
+        store.mark_synced(symbol)
+        print(f"[{datetime.now()}] 增量同步 {symbol}: {start_str}~{end_str} 无新增日线")
+        return 0
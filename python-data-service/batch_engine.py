@@ -0,0 +1,98 @@
+"""
+批量任务引擎 - 有界并发地处理一批独立条目，按完成顺序逐个产出结果
+
+    - 每个批次最多同时执行 concurrency 个条目（滑动窗口），所有批次共享一个线程池
+    - 每个条目从开始执行起计时（在共享线程池中排队的时间不计入），超过 item_timeout 秒即报告为超时，
+      不再等待；已开始的执行无法中断，在后台继续（已发出的上游请求结果会进入各自的缓存），其结果被忽略
+    - 调用方提前停止迭代（如流式响应的客户端断开）时，尚未开始执行的条目被取消
+    - 单个条目失败只影响该条目，错误随结果一起返回
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+# 所有批次共享的线程数
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '16'))
+# 单个批次同时执行的条目数
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '8'))
+# 单个条目的最长执行时间（秒）
+BATCH_ITEM_TIMEOUT = float(os.getenv('BATCH_ITEM_TIMEOUT', '20'))
+
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='batch')
+
+
+@dataclass
+class BatchOutcome:
+    index: int
+    key: Any
+    ok: bool
+    value: Any = None
+    error: Optional[str] = None
+    timed_out: bool = False
+    elapsed: float = 0.0
+
+
+class _Running:
+    """执行窗口中的一个条目；started_at 在线程池真正开始执行时设置。"""
+
+    def __init__(self, index: int, submitted_at: float):
+        self.index = index
+        self.submitted_at = submitted_at
+        self.started_at: Optional[float] = None
+
+    def elapsed(self, now: float) -> float:
+        return now - (self.started_at or self.submitted_at)
+
+
+def _execute(fn: Callable[[Any], Any], key: Any, item: _Running) -> Any:
+    item.started_at = time.time()
+    return fn(key)
+
+
+def run_batch(keys: Iterable[Any], fn: Callable[[Any], Any], concurrency: int = BATCH_CONCURRENCY,
+              item_timeout: float = BATCH_ITEM_TIMEOUT) -> Iterator[BatchOutcome]:
+    """对每个 key 执行 fn(key)，按完成顺序产出 BatchOutcome；fn 抛出异常表示该条目失败。"""
+    pending = list(enumerate(keys))
+    key_of = dict(pending)
+    pending.reverse()
+    running: Dict[Future, _Running] = {}
+
+    try:
+        while pending or running:
+            while pending and len(running) < max(1, concurrency):
+                index, key = pending.pop()
+                item = _Running(index, time.time())
+                running[_executor.submit(_execute, fn, key, item)] = item
+
+            # 尚未开始执行的条目最早也要 item_timeout 秒后才会超时，届时重新计算
+            now = time.time()
+            deadline = min((item.started_at if item.started_at is not None else now) + item_timeout
+                           for item in running.values())
+            done, _ = wait(running, timeout=max(0.0, deadline - now), return_when=FIRST_COMPLETED)
+
+            now = time.time()
+            for future in done:
+                item = running.pop(future)
+                try:
+                    outcome = BatchOutcome(item.index, key_of[item.index], True, value=future.result(),
+                                           elapsed=item.elapsed(now))
+                except Exception as exc:  # pylint: disable=broad-except
+                    outcome = BatchOutcome(item.index, key_of[item.index], False,
+                                           error=f"{type(exc).__name__}: {str(exc)[:200]}", elapsed=item.elapsed(now))
+                yield outcome
+
+            for future, item in list(running.items()):
+                if item.started_at is not None and now - item.started_at >= item_timeout:
+                    # 超时条目不再等待，让出窗口给后续条目；执行中的调用无法中断，其结果被忽略
+                    running.pop(future)
+                    yield BatchOutcome(item.index, key_of[item.index], False, error=f"超过 {item_timeout:.0f} 秒未完成",
+                                       timed_out=True, elapsed=item.elapsed(now))
+    finally:
+        # 提前停止迭代时，还在排队的条目不再执行
+        for future in running:
+            future.cancel()
@@ -0,0 +1,169 @@
+"""
+序列化与压缩基准测试（不访问网络，使用合成数据）
+
+对比三种响应：多年日线历史、分时、200只股票的批量基本面
+    - 原路径：逐行构造字典 + Flask 默认 jsonify（标准库 json，排序键、转义中文）
+    - 新路径：serialization.dumps（orjson；DataFrame 按列整表编码）
+    - 响应体大小：未压缩 / gzip / brotli（已安装时）
+
+运行方式: python bench_serialization.py [--rows 2500] [--repeat 20]
+"""
+import argparse
+import sys
+import time
+
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except Exception:
+        pass
+
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify
+
+import serialization
+import stock_data_service
+from serialization import FrameRecords, compress_body, dumps
+
+
+def make_history_df(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    close = 10 + rng.random(rows).cumsum() / 10
+    return pd.DataFrame({
+        '日期': pd.date_range('2015-01-05', periods=rows, freq='B').date,
+        '开盘': close * 0.99,
+        '收盘': close,
+        '最高': close * 1.02,
+        '最低': close * 0.97,
+        '成交量': rng.integers(1e5, 1e7, rows).astype(float),
+        '成交额': rng.random(rows) * 1e9,
+    })
+
+
+def make_minute_df(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(2)
+    close = 10 + rng.random(rows).cumsum() / 100
+    return pd.DataFrame({
+        'day': pd.date_range('2024-06-03 09:30', periods=rows, freq='min').strftime('%Y-%m-%d %H:%M:%S'),
+        'open': close, 'high': close * 1.001, 'low': close * 0.999, 'close': close,
+        'volume': rng.integers(100, 100000, rows).astype(float),
+    })
+
+
+def make_batch_payload(count: int) -> dict:
+    items = []
+    for i in range(count):
+        items.append({
+            'stockCode': f"{600000 + i:06d}",
+            'stockName': f"测试股份{i}",
+            'exchange': 'SSE',
+            'industry': '银行',
+            'reportDate': '2024-09-30',
+            'totalRevenue': 1.2345e10 + i,
+            'netProfit': 2.345e9 + i,
+            'eps': 1.23,
+            'roe': 11.5,
+            'grossMargin': 35.2,
+            'netMargin': 18.9,
+            'debtRatio': 91.2,
+            'updateTime': '2024-10-30T16:00:00',
+        })
+    return {'success': True, 'data': items, 'count': count, 'errors': [], 'failedCount': 0}
+
+
+def legacy_history_records(df: pd.DataFrame) -> list:
+    """改造前的逐行转换（每行一个字典）"""
+    records = []
+    for _, row in df.iterrows():
+        value = row['日期']
+        records.append({
+            'tradeDate': value if isinstance(value, str) else value.strftime("%Y-%m-%d"),
+            'open': float(row['开盘']),
+            'close': float(row['收盘']),
+            'high': float(row['最高']),
+            'low': float(row['最低']),
+            'volume': float(row['成交量']),
+            'turnover': float(row['成交额']),
+        })
+    return records
+
+
+def legacy_minute_records(df: pd.DataFrame) -> list:
+    records = []
+    for _, row in df.iterrows():
+        records.append({
+            'time': pd.to_datetime(row['day']).strftime("%Y-%m-%d %H:%M:%S"),
+            'open': float(row['open']), 'high': float(row['high']), 'low': float(row['low']),
+            'close': float(row['close']), 'volume': float(row['volume']),
+        })
+    return records
+
+
+def timed(fn, repeat: int):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def report(name: str, legacy, fast, repeat: int) -> None:
+    legacy_seconds, legacy_body = timed(legacy, repeat)
+    fast_seconds, fast_body = timed(fast, repeat)
+    print(f"\n{name}")
+    print(f"  原路径: {legacy_seconds * 1000:8.2f} ms  {len(legacy_body):>10,} 字节")
+    print(f"  新路径: {fast_seconds * 1000:8.2f} ms  {len(fast_body):>10,} 字节  "
+          f"（快 {legacy_seconds / fast_seconds:.1f} 倍）")
+    for encoding in ('gzip', 'br'):
+        if encoding == 'br' and serialization.brotli is None:
+            print("  brotli: 未安装（pip install brotli）")
+            continue
+        compress_seconds, compressed = timed(lambda: compress_body(fast_body, encoding), repeat)
+        print(f"  {encoding:>6}: {compress_seconds * 1000:8.2f} ms  {len(compressed):>10,} 字节  "
+              f"（原始大小的 {len(compressed) / len(fast_body):.0%}）")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='序列化与压缩基准测试')
+    parser.add_argument('--rows', type=int, default=2500, help='日线条数（默认约10年）')
+    parser.add_argument('--batch', type=int, default=200, help='批量接口股票数')
+    parser.add_argument('--repeat', type=int, default=20, help='每项重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    # 原路径使用 Flask 默认的 JSON 提供者（独立的 Flask 应用）
+    app = Flask(__name__)
+    print(f"orjson: {'已安装' if serialization.orjson is not None else '未安装（使用标准库 json）'}")
+
+    history_df = make_history_df(args.rows)
+    minute_df = make_minute_df(240)
+    batch_payload = make_batch_payload(args.batch)
+
+    with app.app_context():
+        report(
+            f"日线历史 {args.rows} 条（转换 + 编码）",
+            lambda: jsonify({'success': True, 'data': legacy_history_records(history_df)}).get_data(),
+            lambda: dumps({'success': True,
+                           'data': FrameRecords(stock_data_service._convert_history_df_to_frame(history_df))}),
+            args.repeat,
+        )
+        report(
+            "分时 240 条（转换 + 编码）",
+            lambda: jsonify({'success': True, 'records': legacy_minute_records(minute_df)[-200:]}).get_data(),
+            lambda: dumps({'success': True,
+                           'records': FrameRecords(stock_data_service._convert_minute_df_to_frame(minute_df.tail(200)))}),
+            args.repeat,
+        )
+        report(
+            f"批量基本面 {args.batch} 只（编码）",
+            lambda: jsonify(batch_payload).get_data(),
+            lambda: dumps(batch_payload),
+            args.repeat,
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+上游熔断器 - 每个AKShare函数一个熔断器，服务和策略模块共享
+
+    - closed：正常放行；连续 FAILURE_THRESHOLD 次上游故障后转为 open
+    - open：直接抛出 CircuitOpenError，不再等待超时；RESET_TIMEOUT 秒后转为 half-open
+    - half-open：只放行一个探测请求，成功则恢复 closed，失败则重新 open
+
+只有连接、超时、HTTP错误、响应解析失败等上游故障计入失败次数；
+参数错误或个股无数据之类的异常说明上游仍在正常响应，不会触发熔断。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+FAILURE_THRESHOLD = int(os.getenv('UPSTREAM_BREAKER_FAILURES', '5'))
+RESET_TIMEOUT_SECONDS = float(os.getenv('UPSTREAM_BREAKER_RESET', '30'))
+
+_FAILURE_MARKERS = ('connection', 'timeout', 'timed out', 'time out', '10054', '远程主机强迫关闭',
+                    'max retries exceeded', 'remote end closed')
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，调用被直接拒绝。"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} 已熔断，{retry_after:.0f}秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    """判断异常是否属于上游故障（而不是参数或数据问题）。"""
+    if isinstance(exc, (ConnectionError, TimeoutError, json.JSONDecodeError)):
+        return True
+    try:
+        import requests  # pylint: disable=import-outside-toplevel
+        if isinstance(exc, requests.RequestException):
+            return True
+    except ImportError:
+        pass
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(marker in text for marker in _FAILURE_MARKERS)
+
+
+class CircuitBreaker:
+    """单个上游函数的熔断器，线程安全。"""
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD,
+                 reset_timeout: float = RESET_TIMEOUT_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """调用前检查；熔断中抛出 CircuitOpenError，半开状态下只放行一个探测请求。"""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self.opened_at + self.reset_timeout - time.time()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                print(f"[{datetime.now()}] 🔌 [{self.name}] 熔断半开，放行探测请求")
+                return
+            self.rejected += 1
+            raise CircuitOpenError(self.name, max(remaining, 0.0))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"[{datetime.now()}] ✅ [{self.name}] 探测成功，熔断恢复")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"[{datetime.now()}] ⛔ [{self.name}] 连续失败 {self.consecutive_failures} 次，"
+                          f"熔断 {self.reset_timeout:.0f}秒")
+                self.state = OPEN
+                self.opened_at = time.time()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutiveFailures': self.consecutive_failures,
+                'rejected': self.rejected,
+                'openedAt': datetime.fromtimestamp(self.opened_at).isoformat() if self.opened_at else None,
+            }
+
+
+class CircuitBreakerRegistry:
+    """按上游函数名管理熔断器。"""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(name, CircuitBreaker(name))
+        return breaker
+
+    def peek(self, name: str) -> Optional[CircuitBreaker]:
+        return self._breakers.get(name)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            breakers = sorted(self._breakers.items())
+        return {name: breaker.snapshot() for name, breaker in breakers}
+
+
+circuit_breakers = CircuitBreakerRegistry()
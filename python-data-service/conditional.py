@@ -0,0 +1,105 @@
+"""
+条件请求 - 读接口的 ETag / If-None-Match 支持
+
+    - ETag 由数据版本计算：缓存的获取时间、日线数据的内容指纹、结果内容的哈希等，
+      与响应中随每次请求变化的字段（缓存年龄、生成时间）无关，因此使用弱 ETag（W/"..."）
+    - 客户端带 If-None-Match 且版本未变时直接返回 304：不重新计算、不重新序列化、不传输响应体
+    - 响应带 Cache-Control: no-cache，客户端可以保存响应，但每次使用前都要带 ETag 重新验证
+
+ResponseCache 按键缓存视图结果和对应的 ETag，新的请求方（不带 ETag）也不必重新计算。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from flask import Response, request
+
+import metrics
+from lazy_import import lazy_import
+
+# pandas 延迟导入（见 lazy_import.py），导入本模块时不加载
+pd = lazy_import('pandas')
+
+
+def etag_for(*parts: Any) -> str:
+    """由版本信息计算 ETag 值（不含引号和 W/ 前缀）。"""
+    return hashlib.blake2b(repr(parts).encode('utf-8'), digest_size=12).hexdigest()
+
+
+def frame_fingerprint(frame) -> str:
+    """DataFrame 的内容指纹（按行哈希后再整体哈希），内容相同则指纹相同。"""
+    if frame is None or frame.empty:
+        return 'empty'
+    hashed = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return hashlib.blake2b(hashed.tobytes() + repr(list(frame.columns)).encode('utf-8'), digest_size=12).hexdigest()
+
+
+def not_modified(etag: str) -> Optional[Response]:
+    """请求的 If-None-Match 与 etag 匹配时返回 304 响应，否则返回 None。"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(Response(status=304), etag)
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@dataclass
+class CachedResponse:
+    fetched_at: float
+    etag: str
+    value: Any
+
+
+class ResponseCache:
+    """
+    视图结果缓存：key -> CachedResponse，线程安全。
+
+    expiry(fetched_at, ttl) 返回过期时间戳（如交易时段内 ttl 秒、闭市期间到下一个交易时段）；
+    ttl 为 None 时条目不过期（键本身就包含数据版本）。超出容量时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None, max_entries: int = 512,
+                 expiry: Optional[Callable[[float, float], float]] = None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.expiry = expiry
+        self._entries: 'OrderedDict[Any, CachedResponse]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, entry: CachedResponse, now: float) -> bool:
+        if self.ttl is None:
+            return False
+        if self.expiry is not None:
+            return now >= self.expiry(entry.fetched_at, self.ttl)
+        return now - entry.fetched_at > self.ttl
+
+    def get(self, key: Any) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, time.time()):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        metrics.observe_cache(self.name, 'hit' if entry is not None else 'miss')
+        return entry
+
+    def put(self, key: Any, value: Any, etag: str) -> CachedResponse:
+        entry = CachedResponse(time.time(), etag, value)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
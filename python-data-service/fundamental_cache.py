@@ -0,0 +1,168 @@
+"""
+基本面数据缓存 - 按股票代码和最新报告期缓存 stock_financial_abstract 的解析结果
+
+财务摘要只在定期报告披露后才会变化，因此过期时间跟随披露日历：
+    - 披露季（4月年报/一季报、8月中报、10月三季报）使用短TTL
+    - 其余月份使用长TTL，但不会跨过下一个披露季的开始
+缓存持久化到 JSON 文件，服务重启后仍然有效。多个工作进程共用同一个文件：落盘时在文件锁内先读入磁盘上的条目，
+再覆盖本进程改动过的股票，不会丢弃其他进程写入的条目。
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 下为单进程运行（waitress），不需要跨进程锁
+    fcntl = None
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'fundamental_cache.json')
+
+# 定期报告集中披露的月份
+DISCLOSURE_MONTHS = (4, 8, 10)
+SHORT_TTL_SECONDS = int(os.getenv('FUNDAMENTAL_CACHE_SHORT_TTL', str(6 * 3600)))
+LONG_TTL_SECONDS = int(os.getenv('FUNDAMENTAL_CACHE_LONG_TTL', str(7 * 24 * 3600)))
+# 批量筛选时会连续写入大量条目，落盘最小间隔（秒）
+PERSIST_INTERVAL_SECONDS = 5.0
+
+
+def _next_disclosure_start(now: datetime) -> datetime:
+    """下一个披露季的第一天 00:00。"""
+    for year in (now.year, now.year + 1):
+        for month in DISCLOSURE_MONTHS:
+            start = datetime(year, month, 1)
+            if start > now:
+                return start
+    return now + timedelta(seconds=LONG_TTL_SECONDS)
+
+
+def compute_expiry(now: Optional[datetime] = None) -> datetime:
+    """根据披露日历计算缓存的过期时间。"""
+    now = now or datetime.now()
+    if now.month in DISCLOSURE_MONTHS:
+        return now + timedelta(seconds=SHORT_TTL_SECONDS)
+    return min(now + timedelta(seconds=LONG_TTL_SECONDS), _next_disclosure_start(now))
+
+
+class FundamentalCache:
+    """线程安全的基本面缓存，写入后按间隔落盘，进程退出时补写。"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('FUNDAMENTAL_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self._entries: Dict[str, Dict] = {}
+        # 自上次落盘以来本进程改动过的股票，落盘时只用它们覆盖磁盘上的条目
+        self._changed: Set[str] = set()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._last_persist = 0.0
+        atexit.register(self.flush)
+
+    def _read_file(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as fh:
+            entries = json.load(fh)
+        return entries if isinstance(entries, dict) else {}
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                self._entries = self._read_file()
+                if self._entries:
+                    print(f"[{datetime.now()}] 已加载基本面缓存: {len(self._entries)} 条")
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[{datetime.now()}] ⚠️ 基本面缓存文件损坏，忽略: {exc}")
+                self._entries = {}
+            self._loaded = True
+
+    def _persist(self) -> None:
+        """调用方需持有 self._lock。在文件锁内与磁盘上的条目合并后写入。"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.lock", 'a', encoding='utf-8') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                on_disk = self._read_file()
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[{datetime.now()}] ⚠️ 基本面缓存文件损坏，覆盖: {exc}")
+                on_disk = {}
+            # 其他进程写入的条目保留（并读入本进程），本进程改动过的股票以本进程为准
+            merged = {**on_disk, **{symbol: self._entries[symbol] for symbol in self._changed
+                                    if symbol in self._entries}}
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump(merged, fh, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        self._entries = merged
+        self._changed.clear()
+        self._dirty = False
+        self._last_persist = time.time()
+
+    def flush(self) -> None:
+        """把尚未落盘的条目写入文件。"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self._persist()
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[{datetime.now()}] ⚠️ 写入基本面缓存文件失败: {exc}")
+
+    def get(self, symbol: str, now: Optional[datetime] = None) -> Optional[Dict]:
+        """返回未过期的缓存数据（副本，调用方可以修改），否则返回 None。"""
+        self._ensure_loaded()
+        now = now or datetime.now()
+        with self._lock:
+            entry = self._entries.get(symbol)
+        try:
+            fresh = bool(entry) and datetime.fromisoformat(entry['expiresAt']) > now
+        except (KeyError, ValueError):
+            fresh = False
+        metrics.observe_cache('fundamental', 'hit' if fresh else 'miss')
+        return dict(entry['data']) if fresh and entry.get('data') is not None else None
+
+    def put(self, symbol: str, data: Dict, now: Optional[datetime] = None) -> None:
+        """写入缓存；报告期未变化时只顺延过期时间。"""
+        self._ensure_loaded()
+        now = now or datetime.now()
+        report_date = str(data.get('reportDate') or '')
+        with self._lock:
+            previous = self._entries.get(symbol)
+            if previous and previous.get('reportDate') == report_date and previous.get('data') is not None:
+                # 财务摘要随报告期变化，报告期相同则数据不变，只顺延过期时间
+                previous['expiresAt'] = compute_expiry(now).isoformat()
+            else:
+                if previous and previous.get('reportDate') != report_date:
+                    print(f"[{datetime.now()}] 基本面报告期更新: {symbol} {previous.get('reportDate')} -> {report_date}")
+                self._entries[symbol] = {
+                    'reportDate': report_date,
+                    'cachedAt': now.isoformat(),
+                    'expiresAt': compute_expiry(now).isoformat(),
+                    # 保存副本：调用方之后对 data 的修改不影响缓存
+                    'data': dict(data),
+                }
+            self._changed.add(symbol)
+            self._dirty = True
+            if time.time() - self._last_persist < PERSIST_INTERVAL_SECONDS:
+                return
+            try:
+                self._persist()
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[{datetime.now()}] ⚠️ 写入基本面缓存文件失败: {exc}")
+
+
+fundamental_cache = FundamentalCache()
@@ -0,0 +1,100 @@
+"""
+共享HTTP会话 - 所有 requests 调用（包括AKShare内部的 requests.get/post）复用同一个连接池
+
+requests.get/post 默认每次调用都新建 Session，请求结束即关闭连接，
+对同一批数据源主机反复进行 TCP/TLS 握手。install() 之后：
+    - requests.get/post/request 改为经共享 Session 发出，按主机保持长连接（keep-alive）
+    - 不信任环境变量中的代理，强制直连；默认超时 DEFAULT_TIMEOUT 秒
+    - 连接/5xx/429 错误沿用原 create_no_proxy_session 的重试策略（3 次，退避 0.5 秒）
+    - 其他代码自行创建的 requests.Session 同样禁用代理
+    - 进程启动时一次性移除代理环境变量（pandas.read_html 等走 urllib 的调用也直连）
+代理策略只在这里设置一次，请求处理过程中不再修改 os.environ，可以安全地多线程运行。
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+# 连接池数量（按主机区分）和每个主机保持的最大连接数
+POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '32'))
+POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '16'))
+DEFAULT_TIMEOUT = float(os.getenv('HTTP_DEFAULT_TIMEOUT', '30'))
+
+_NO_PROXIES = {'http': None, 'https': None}
+PROXY_ENV_VARS = ('HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'ALL_PROXY', 'all_proxy')
+
+_original_session_init = requests.Session.__init__
+_shared_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+_installed = False
+
+
+def default_retry() -> Retry:
+    return Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+    )
+
+
+def create_session(retries: Union[Retry, int, None] = None, pool_connections: int = POOL_CONNECTIONS,
+                   pool_maxsize: int = POOL_MAXSIZE) -> requests.Session:
+    """创建禁用代理、带连接池的会话；retries 为 None 时使用默认重试策略，为 0 时不重试。"""
+    session = requests.Session()
+    session.trust_env = False
+    session.proxies = dict(_NO_PROXIES)
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=default_retry() if retries is None else retries,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def shared_session() -> requests.Session:
+    """进程内共享的会话（连接池线程安全），首次使用时创建。"""
+    global _shared_session
+    if _shared_session is None:
+        with _lock:
+            if _shared_session is None:
+                _shared_session = create_session()
+    return _shared_session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """替代 requests.api.request：经共享会话发出请求，强制直连并设置默认超时。"""
+    kwargs['proxies'] = dict(_NO_PROXIES)
+    if kwargs.get('timeout') is None:
+        kwargs['timeout'] = DEFAULT_TIMEOUT
+    return shared_session().request(method, url, **kwargs)
+
+
+def _no_proxy_session_init(self, *args, **kwargs):
+    _original_session_init(self, *args, **kwargs)
+    self.trust_env = False
+    self.proxies = dict(_NO_PROXIES)
+
+
+def install() -> None:
+    """移除代理环境变量，并让 requests.get/post/... 经共享会话发出（可重复调用，只生效一次）。"""
+    global _installed
+    with _lock:
+        if _installed:
+            return
+        for var in PROXY_ENV_VARS:
+            os.environ.pop(var, None)
+        os.environ['NO_PROXY'] = '*'
+        os.environ['no_proxy'] = '*'
+        # requests.get/post 等都通过 requests.api 模块内的 request() 发出
+        requests.api.request = request
+        requests.request = request
+        requests.Session.__init__ = _no_proxy_session_init
+        _installed = True
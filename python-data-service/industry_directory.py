@@ -0,0 +1,306 @@
+"""
+行业板块目录 - 缓存东方财富行业板块列表、各板块成分股，以及 股票 -> 行业 的反向索引
+
+板块列表和成分股很少变化：
+    - 板块名称 -> 板块代码 来自 stock_board_industry_name_em
+    - 板块代码 -> 成分股 来自 stock_board_industry_cons_em，按需加载并缓存
+    - 后台线程按 REFRESH_INTERVAL 定期重建整个目录（逐个板块拉取成分股，速率由上游令牌桶控制），
+      同时得到 股票代码 -> 行业名称 的反向索引
+目录持久化到 JSON 文件，服务重启后直接可用。行业接口查询行业、板块代码和成分股时只需查字典，
+只有板块实时行情需要访问网络。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from lazy_import import lazy_import
+
+# pandas 延迟导入（见 lazy_import.py），导入本模块时不加载
+pd = lazy_import('pandas')
+
+DEFAULT_DIRECTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'industry_directory.json')
+
+# 整个目录的重建间隔（秒）
+REFRESH_INTERVAL = int(os.getenv('INDUSTRY_DIRECTORY_REFRESH', str(24 * 3600)))
+# 板块列表中的板块行情用作实时行情的回退，过期后在后台刷新，每个周期最多刷新一次（秒）
+BOARD_QUOTE_TTL = float(os.getenv('INDUSTRY_BOARD_QUOTE_TTL', '60'))
+
+
+def _default_fetch(name: str, **kwargs) -> pd.DataFrame:
+    import akshare as ak  # pylint: disable=import-outside-toplevel
+    from upstream import ak_call  # pylint: disable=import-outside-toplevel
+    return ak_call(getattr(ak, name), **kwargs)
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if pd.isna(value) else value
+
+
+class IndustryDirectory:
+    """线程安全的行业板块目录。fetch(name, **kwargs) 按AKShare函数名取数，便于替换。"""
+
+    def __init__(self, path: Optional[str] = None, fetch: Callable[..., pd.DataFrame] = _default_fetch):
+        self.path = path or os.getenv('INDUSTRY_DIRECTORY_PATH', DEFAULT_DIRECTORY_PATH)
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._boards: Dict[str, str] = {}
+        self._board_rows: Dict[str, Dict] = {}
+        self._boards_fetched_at = 0.0
+        # 板块代码 -> {'fetchedAt': ts, 'stocks': [{'code', 'name', 'price', 'changePercent'}]}
+        self._constituents: Dict[str, Dict] = {}
+        self._stock_industry: Dict[str, str] = {}
+        self._built_at = 0.0
+        self._loaded = False
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._boards_thread: Optional[threading.Thread] = None
+        self._boards_attempted_at = 0.0
+
+    # ---------- 持久化 ----------
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as fh:
+                        payload = json.load(fh)
+                    self._boards = payload.get('boards', {})
+                    self._boards_fetched_at = payload.get('boardsFetchedAt', 0.0)
+                    self._constituents = payload.get('constituents', {})
+                    self._built_at = payload.get('builtAt', 0.0)
+                    self._rebuild_reverse_index()
+                    print(f"[{datetime.now()}] 已加载行业目录: {len(self._boards)} 个板块, "
+                          f"{len(self._stock_industry)} 只股票")
+                except Exception as exc:  # pylint: disable=broad-except
+                    print(f"[{datetime.now()}] ⚠️ 行业目录文件损坏，忽略: {exc}")
+            self._loaded = True
+
+    def _persist(self) -> None:
+        with self._lock:
+            payload = {
+                'boards': dict(self._boards),
+                'boardsFetchedAt': self._boards_fetched_at,
+                'constituents': dict(self._constituents),
+                'builtAt': self._built_at,
+            }
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump(payload, fh, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 写入行业目录文件失败: {exc}")
+
+    def _rebuild_reverse_index(self) -> None:
+        """调用方需持有 self._lock。"""
+        code_to_name = {code: name for name, code in self._boards.items()}
+        index: Dict[str, str] = {}
+        for board_code, entry in self._constituents.items():
+            board_name = code_to_name.get(board_code)
+            if not board_name:
+                continue
+            for stock in entry.get('stocks', []):
+                index.setdefault(stock['code'], board_name)
+        self._stock_industry = index
+
+    # ---------- 板块列表 ----------
+
+    def refresh_boards(self) -> pd.DataFrame:
+        """重新拉取板块列表（同时包含各板块的行情），失败时抛出异常。"""
+        df = self._fetch('stock_board_industry_name_em')
+        if df is None or df.empty or '板块名称' not in df.columns or '板块代码' not in df.columns:
+            raise ValueError("stock_board_industry_name_em 返回数据无效")
+        boards = {str(row['板块名称']).strip(): str(row['板块代码']).strip() for _, row in df.iterrows()}
+        rows = {str(row['板块名称']).strip(): row.to_dict() for _, row in df.iterrows()}
+        with self._lock:
+            self._boards = boards
+            self._board_rows = rows
+            self._boards_fetched_at = time.time()
+            self._rebuild_reverse_index()
+        self._persist()
+        print(f"[{datetime.now()}] ✅ 行业板块列表已更新: {len(boards)} 个板块")
+        return df
+
+    def _ensure_boards(self) -> None:
+        self._ensure_loaded()
+        self._start_refresh_if_due()
+        if self._boards:
+            return
+        try:
+            self.refresh_boards()
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 获取行业板块列表失败: {str(exc)[:150]}")
+
+    def warm_boards(self) -> int:
+        """确保板块列表已就绪（本地文件或上游），返回板块数；取不到时抛出异常。供启动预热使用。"""
+        self._ensure_boards()
+        with self._lock:
+            count = len(self._boards)
+        if not count:
+            raise ValueError("行业板块列表为空")
+        return count
+
+    @property
+    def boards_fetched_at(self) -> float:
+        return self._boards_fetched_at
+
+    def resolve_board(self, industry_name: str) -> Optional[Dict[str, str]]:
+        """行业名称 -> {'name', 'code'}：先精确匹配，再做包含匹配。"""
+        if not industry_name:
+            return None
+        self._ensure_boards()
+        with self._lock:
+            code = self._boards.get(industry_name)
+            if code:
+                return {'name': industry_name, 'code': code}
+            for name, code in self._boards.items():
+                if industry_name in name:
+                    return {'name': name, 'code': code}
+        return None
+
+    def board_row(self, board_name: str) -> Optional[Dict]:
+        """最近一次拉取板块列表时该板块的行情行（仅在本进程拉取过列表后可用）。"""
+        with self._lock:
+            return self._board_rows.get(board_name)
+
+    def board_quote(self, board_name: str) -> Optional[Dict]:
+        """板块行情行（可能已过期），不等待网络；过期或尚未拉取时在后台刷新板块列表。"""
+        self._start_boards_refresh_if_due()
+        return self.board_row(board_name)
+
+    def _start_boards_refresh_if_due(self) -> None:
+        now = time.time()
+        with self._lock:
+            if self._board_rows and now - self._boards_fetched_at <= BOARD_QUOTE_TTL:
+                return
+            # 上游持续失败时，每个 BOARD_QUOTE_TTL 周期最多发起一次刷新
+            if now - self._boards_attempted_at < BOARD_QUOTE_TTL:
+                return
+            if self._boards_thread is not None and self._boards_thread.is_alive():
+                return
+            self._boards_attempted_at = now
+            self._boards_thread = threading.Thread(target=self._refresh_boards_quietly,
+                                                   name='industry-boards', daemon=True)
+            self._boards_thread.start()
+
+    def _refresh_boards_quietly(self) -> None:
+        try:
+            self.refresh_boards()
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 后台刷新行业板块列表失败: {str(exc)[:150]}")
+
+    # ---------- 成分股与反向索引 ----------
+
+    def _load_constituents(self, board_code: str) -> List[Dict]:
+        df = self._fetch('stock_board_industry_cons_em', symbol=board_code)
+        stocks = []
+        if df is not None and not df.empty:
+            for _, row in df.iterrows():
+                code = str(row.get('代码', '')).strip().zfill(6)
+                if not code.strip('0'):
+                    continue
+                stocks.append({
+                    'code': code,
+                    'name': str(row.get('名称', '')),
+                    'price': _to_float(row.get('最新价')),
+                    'changePercent': _to_float(row.get('涨跌幅')),
+                })
+        with self._lock:
+            self._constituents[board_code] = {'fetchedAt': time.time(), 'stocks': stocks}
+        return stocks
+
+    def constituents(self, board_code: str) -> List[Dict]:
+        """板块成分股（代码、名称及缓存时的价格）；未缓存或已过期时拉取一次。"""
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._constituents.get(board_code)
+        if entry is not None and time.time() - entry.get('fetchedAt', 0) <= REFRESH_INTERVAL:
+            return entry['stocks']
+        try:
+            stocks = self._load_constituents(board_code)
+        except Exception:  # pylint: disable=broad-except
+            if entry is not None:
+                print(f"[{datetime.now()}] ⚠️ 刷新板块 {board_code} 成分股失败，使用缓存")
+                return entry['stocks']
+            raise
+        with self._lock:
+            self._rebuild_reverse_index()
+        self._persist()
+        return stocks
+
+    def industry_of(self, stock_code: str) -> Optional[str]:
+        """股票代码 -> 所属行业名称（反向索引命中时无网络请求）。"""
+        self._ensure_loaded()
+        self._start_refresh_if_due()
+        with self._lock:
+            return self._stock_industry.get(str(stock_code).strip().zfill(6))
+
+    # ---------- 定期重建 ----------
+
+    def _start_refresh_if_due(self) -> None:
+        if time.time() - self._built_at <= REFRESH_INTERVAL:
+            return
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self.rebuild, name='industry-directory', daemon=True)
+            self._refresh_thread.start()
+
+    def rebuild(self) -> None:
+        """重建整个目录：板块列表 + 所有板块成分股。在后台线程中执行。"""
+        started = time.time()
+        try:
+            self.refresh_boards()
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 重建行业目录失败（板块列表）: {str(exc)[:150]}")
+            with self._lock:
+                # 失败后一小时内不再重试
+                self._built_at = time.time() - REFRESH_INTERVAL + 3600
+            return
+
+        with self._lock:
+            board_codes = list(self._boards.values())
+        failed = 0
+        for board_code in board_codes:
+            try:
+                self._load_constituents(board_code)
+            except Exception as exc:  # pylint: disable=broad-except
+                failed += 1
+                print(f"[{datetime.now()}] ⚠️ 拉取板块 {board_code} 成分股失败: {str(exc)[:100]}")
+
+        with self._lock:
+            self._rebuild_reverse_index()
+            self._built_at = time.time()
+            indexed = len(self._stock_industry)
+        self._persist()
+        print(f"[{datetime.now()}] ✅ 行业目录重建完成: {len(board_codes)} 个板块（失败 {failed}），"
+              f"{indexed} 只股票，用时 {time.time() - started:.1f}秒")
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'boards': len(self._boards),
+                'boardsWithConstituents': len(self._constituents),
+                'indexedStocks': len(self._stock_industry),
+                'boardQuotes': len(self._board_rows),
+                'boardsFetchedAt': (datetime.fromtimestamp(self._boards_fetched_at).isoformat()
+                                    if self._boards_fetched_at else None),
+                'builtAt': datetime.fromtimestamp(self._built_at).isoformat() if self._built_at else None,
+            }
+
+
+industry_directory = IndustryDirectory()
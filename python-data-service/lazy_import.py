@@ -0,0 +1,110 @@
+"""
+延迟导入 - 重量级依赖（akshare、bs4、策略模块）在第一次使用时才导入，或由预加载阶段提前导入
+
+导入 stock_data_service 时不再加载 akshare 的数百个子模块，服务可以立即绑定端口、响应 /health；
+preload() 在后台线程（或 gunicorn 主进程 fork 前）把这些模块导入好，第一个真实请求不必等待。
+
+    ak = lazy_import('akshare')
+    ak.stock_zh_a_daily(...)          # 第一次访问属性时才真正导入
+"""
+
+from __future__ import annotations
+
+import importlib
+import threading
+import time
+import types
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+_registry: Dict[str, 'LazyModule'] = {}
+_registry_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """模块代理：首次访问属性时导入真实模块，之后直接转发；记录导入耗时。"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_module'] = None
+        self.__dict__['_lazy_seconds'] = None
+        self.__dict__['_lazy_loaded_at'] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is not None:
+            return module
+        with self.__dict__['_lazy_lock']:
+            module = self.__dict__['_lazy_module']
+            if module is None:
+                started = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                self.__dict__['_lazy_seconds'] = time.perf_counter() - started
+                self.__dict__['_lazy_loaded_at'] = time.time()
+                self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value) -> None:
+        setattr(self._load(), attr, value)
+
+    def __dir__(self) -> List[str]:
+        return dir(self._load())
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__['_lazy_module'] is not None
+
+    def status(self) -> Dict:
+        seconds = self.__dict__['_lazy_seconds']
+        loaded_at = self.__dict__['_lazy_loaded_at']
+        return {
+            'loaded': self.loaded,
+            'importSeconds': round(seconds, 3) if seconds is not None else None,
+            'loadedAt': datetime.fromtimestamp(loaded_at).isoformat() if loaded_at else None,
+        }
+
+
+def lazy_import(name: str) -> LazyModule:
+    """返回 name 的延迟导入代理；同名模块共用一个代理。"""
+    with _registry_lock:
+        module = _registry.get(name)
+        if module is None:
+            module = _registry[name] = LazyModule(name)
+        return module
+
+
+def preload(names: Optional[Iterable[str]] = None, background: bool = False) -> Optional[threading.Thread]:
+    """
+    导入指定（默认全部已登记）的延迟模块。
+
+    background=True 时在守护线程中导入并返回该线程；多进程部署应在 fork 之前同步调用，
+    不能在导入进行到一半时 fork。
+    """
+    targets = [lazy_import(name) for name in names] if names is not None else list(_registry.values())
+
+    def run():
+        started = time.perf_counter()
+        for module in targets:
+            try:
+                module._load()
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[{datetime.now()}] ⚠️ 预加载 {module.__name__} 失败: {exc}")
+        print(f"[{datetime.now()}] ✅ 依赖预加载完成: {', '.join(m.__name__ for m in targets)}，"
+              f"耗时 {time.perf_counter() - started:.2f}秒")
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name='preload', daemon=True)
+    thread.start()
+    return thread
+
+
+def status() -> Dict[str, Dict]:
+    with _registry_lock:
+        modules = dict(_registry)
+    return {name: module.status() for name, module in sorted(modules.items())}
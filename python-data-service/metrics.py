@@ -0,0 +1,473 @@
+"""
+运行指标 - 以 Prometheus 文本格式（GET /metrics）输出服务内部的计数器、仪表和直方图
+
+    - 请求：按路由模板（如 /api/stock/analyze/<stock_code>）统计的延迟直方图、状态码计数和进行中的请求数
+    - 上游：按 AKShare 函数统计真实请求的延迟直方图、成功/失败次数（失败按异常类型）、合并的并发调用数和熔断拒绝数
+    - 重试：fetch_with_retry 和重试调度器发起的重试次数、重试耗尽次数
+    - 缓存：各缓存的命中/未命中（SWR 缓存另有 stale）次数和命中率
+
+借此区分一个慢请求的耗时来自上游延迟、备用数据源的逐个回退，还是服务自身的计算。
+
+不依赖 prometheus_client：指标量少，自带的实现只需要一把锁。
+
+多进程（gunicorn）：各工作进程独立统计，并定期（以及每次抓取时）把自己的数值写到共享目录 METRICS_DIR
+下的 <进程号>.json；/metrics 读取目录中所有进程的快照合并输出，无论抓取落到哪个工作进程，结果都覆盖整个服务：
+    - 计数器和直方图按标签求和（已退出的工作进程的计数仍然计入，总数不会因进程重启而回退）
+    - 仪表按进程输出，带 worker 标签（进程号），只包含仍在运行的进程
+    - 缓存命中率由合并后的查询次数计算
+未设置 METRICS_DIR 时（单进程运行）只输出本进程的数据，每条指标带 worker 标签。
+
+配置：
+    METRICS_ENABLED=1            是否启用 /metrics 和指标采集
+    METRICS_DIR=                 多进程共享的快照目录，serve.py 以 gunicorn 启动时自动设置
+    METRICS_FLUSH_SECONDS=5      工作进程写快照的间隔（秒）
+"""
+
+from __future__ import annotations
+
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+# 延迟直方图的桶上限（秒）：覆盖缓存命中的毫秒级到上游重试的数十秒
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_PREFIX = 'stock_service_'
+
+LabelValues = Tuple[str, ...]
+# 合并时每个进程的快照：(进程号, 是否仍在运行, 该指标的 {标签值: 数值})
+WorkerValues = List[Tuple[int, bool, Dict[LabelValues, Any]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = _PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def values(self) -> Dict[LabelValues, Any]:
+        """当前数值 {标签值: 数值}，写入快照和合并时使用。"""
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        pass
+
+    def merge(self, workers: WorkerValues, merged: Dict[str, Tuple[Sequence[str], Dict]]
+              ) -> Tuple[Sequence[str], Dict[LabelValues, Any]]:
+        """合并各进程的数值，返回 (标签名, {标签值: 数值})；merged 为已合并的其他指标（按注册顺序）。"""
+        raise NotImplementedError
+
+    def samples(self, labelnames: Optional[Sequence[str]] = None, values: Optional[Dict[LabelValues, Any]] = None
+                ) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        raise NotImplementedError
+
+    @property
+    def family(self) -> str:
+        """HELP/TYPE 行使用的指标名。"""
+        return self.name
+
+    def render(self, labelnames: Optional[Sequence[str]] = None,
+               values: Optional[Dict[LabelValues, Any]] = None) -> List[str]:
+        lines = [f'# HELP {self.family} {self.documentation}', f'# TYPE {self.family} {self.kind}']
+        for suffix, names, label_values, value in self.samples(labelnames, values):
+            lines.append(f'{self.name}{suffix}{_format_labels(names, label_values)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    @property
+    def family(self) -> str:
+        # 计数器的样本带 _total 后缀，HELP/TYPE 使用同一个名字
+        return self.name + '_total'
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def merge(self, workers, merged):
+        # 按标签求和，包括已退出的进程
+        total: Dict[LabelValues, float] = {}
+        for _, _, values in workers:
+            for key, value in values.items():
+                total[key] = total.get(key, 0.0) + value
+        return self.labelnames, total
+
+    def samples(self, labelnames=None, values=None):
+        labelnames = self.labelnames if labelnames is None else labelnames
+        values = self.values() if values is None else values
+        for key, value in sorted(values.items()):
+            yield '_total', labelnames, key, value
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        # collect() 在输出时计算当前值（如各主机的并发占用），设置后不使用 inc/dec/set
+        self._collect = collect
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def values(self) -> Dict[LabelValues, float]:
+        if self._collect is not None:
+            return self._collect()
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def merge(self, workers, merged):
+        # 各进程的瞬时值不能相加：按进程输出，只保留仍在运行的进程
+        per_worker: Dict[LabelValues, float] = {}
+        for pid, alive, values in workers:
+            if alive:
+                for key, value in values.items():
+                    per_worker[key + (str(pid),)] = value
+        return self.labelnames + ('worker',), per_worker
+
+    def samples(self, labelnames=None, values=None):
+        labelnames = self.labelnames if labelnames is None else labelnames
+        values = self.values() if values is None else values
+        for key, value in sorted(values.items()):
+            yield '', labelnames, key, value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数（不累计）..., +Inf 桶计数, 总和]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            entry[index] += 1
+            entry[-1] += value
+
+    def values(self) -> Dict[LabelValues, List[float]]:
+        with self._lock:
+            return {key: list(entry) for key, entry in self._values.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def merge(self, workers, merged):
+        # 各桶计数和总和按标签逐项求和，包括已退出的进程
+        total: Dict[LabelValues, List[float]] = {}
+        for _, _, values in workers:
+            for key, entry in values.items():
+                if len(entry) != len(self.buckets) + 2:
+                    continue
+                current = total.setdefault(key, [0.0] * len(entry))
+                for index, value in enumerate(entry):
+                    current[index] += value
+        return self.labelnames, total
+
+    def samples(self, labelnames=None, values=None):
+        labelnames = self.labelnames if labelnames is None else labelnames
+        values = self.values() if values is None else values
+        names = tuple(labelnames) + ('le',)
+        for key, entry in sorted(values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                yield '_bucket', names, tuple(key) + (_format_value(bound),), cumulative
+            yield '_count', labelnames, key, cumulative
+            yield '_sum', labelnames, key, entry[-1]
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 进程存在但无权发送信号
+        return True
+    return True
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def _all(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics)
+
+    def reset(self) -> None:
+        """清空所有数值（工作进程 fork 后丢弃从主进程继承的统计）。"""
+        for metric in self._all():
+            metric.reset()
+
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）：设置了 METRICS_DIR 时合并所有进程的快照，否则输出本进程的数据。"""
+        if METRICS_DIR:
+            self.write_snapshot(METRICS_DIR)
+            return self.render_merged(self.load_snapshots(METRICS_DIR))
+        return self.render_local()
+
+    def render_local(self) -> str:
+        """本进程的数据，每个指标附加 worker（进程号）标签。"""
+        worker = str(os.getpid())
+        lines = []
+        for metric in self._all():
+            for line in metric.render():
+                if line.startswith('#'):
+                    lines.append(line)
+                    continue
+                series, value = line.rsplit(' ', 1)
+                if series.endswith('}'):
+                    series = f'{series[:-1]},worker="{worker}"}}'
+                else:
+                    series = f'{series}{{worker="{worker}"}}'
+                lines.append(f'{series} {value}')
+        return '\n'.join(lines) + '\n'
+
+    # ---------- 多进程 ----------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """本进程所有指标的数值，可以 JSON 序列化。"""
+        return {
+            'pid': os.getpid(),
+            'writtenAt': time.time(),
+            'metrics': {metric.name: [[list(key), value] for key, value in metric.values().items()]
+                        for metric in self._all()},
+        }
+
+    def write_snapshot(self, directory: str) -> None:
+        """把本进程的快照原子地写到 directory/<进程号>.json。"""
+        pid = os.getpid()
+        path = os.path.join(directory, f'{pid}.json')
+        tmp_path = f'{path}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump(self.snapshot(), fh, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            print(f"[{datetime.now()}] ⚠️ 写入运行指标快照失败: {exc}")
+
+    @staticmethod
+    def load_snapshots(directory: str) -> List[Dict[str, Any]]:
+        snapshots = []
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                # 正在被替换或已损坏的文件跳过，下一次抓取再读
+                continue
+        return snapshots
+
+    def render_merged(self, snapshots: List[Dict[str, Any]]) -> str:
+        """合并各进程的快照后输出（计数器、直方图求和，仪表按进程输出）。"""
+        workers = [(int(snap['pid']), _pid_alive(int(snap['pid'])), snap.get('metrics', {})) for snap in snapshots]
+        merged: Dict[str, Tuple[Sequence[str], Dict]] = {}
+        lines = []
+        for metric in self._all():
+            per_worker = [(pid, alive, {tuple(key): value for key, value in values.get(metric.name, [])})
+                          for pid, alive, values in workers]
+            labelnames, values = merged[metric.name] = metric.merge(per_worker, merged)
+            lines.extend(metric.render(labelnames, values))
+        return '\n'.join(lines) + '\n'
+
+    def start_writer(self, directory: str, interval: float = METRICS_FLUSH_SECONDS) -> None:
+        """启动定期写快照的后台线程（每个进程一个），进程退出时再写一次。"""
+        with self._lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            os.makedirs(directory, exist_ok=True)
+
+            def _loop():
+                while True:
+                    self.write_snapshot(directory)
+                    time.sleep(interval)
+
+            self._writer = threading.Thread(target=_loop, name='metrics-writer', daemon=True)
+            self._writer.start()
+        atexit.register(self.write_snapshot, directory)
+
+
+registry = Registry()
+
+_started_at = time.time()
+
+# ---- 请求 ----
+http_requests = registry.register(Counter(
+    'http_requests', '按路由、方法和状态码统计的请求数', ('route', 'method', 'status')))
+http_request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', '按路由统计的请求处理耗时（流式响应为生成响应对象的耗时）', ('route', 'method')))
+http_requests_in_flight = registry.register(Gauge(
+    'http_requests_in_flight', '正在处理的请求数', ('route',)))
+
+# ---- 上游 ----
+upstream_calls = registry.register(Counter(
+    'upstream_calls', '按AKShare函数统计的真实上游请求数', ('function', 'host', 'outcome')))
+upstream_call_duration = registry.register(Histogram(
+    'upstream_call_duration_seconds', '按AKShare函数统计的上游请求耗时', ('function', 'host')))
+upstream_errors = registry.register(Counter(
+    'upstream_errors', '按AKShare函数和异常类型统计的上游请求失败数', ('function', 'error')))
+upstream_coalesced = registry.register(Counter(
+    'upstream_coalesced_calls', '与并发的相同调用合并、共享同一次上游请求结果的调用数（含发出请求的一方）', ('function',)))
+upstream_rejected = registry.register(Counter(
+    'upstream_circuit_rejections', '因熔断直接拒绝的调用数', ('function',)))
+
+# ---- 重试 ----
+retries = registry.register(Counter(
+    'retries', '失败后安排的重试次数', ('source', 'function')))
+retries_exhausted = registry.register(Counter(
+    'retries_exhausted', '所有重试都失败的调用数', ('source', 'function')))
+
+# ---- 缓存 ----
+cache_requests = registry.register(Counter(
+    'cache_requests', '各缓存的查询次数（hit/miss/stale）', ('cache', 'result')))
+
+
+def _cache_hit_ratios(requests: Optional[Dict[LabelValues, float]] = None) -> Dict[LabelValues, float]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), count in (cache_requests.values() if requests is None else requests).items():
+        entry = totals.setdefault(cache, [0.0, 0.0])
+        entry[1] += count
+        if result in ('hit', 'stale'):
+            entry[0] += count
+    return {(cache,): hits / total for cache, (hits, total) in totals.items() if total}
+
+
+class _HitRatioGauge(Gauge):
+    """由 cache_requests 计算的命中率：多进程时用所有进程合计的查询次数计算，不按进程输出。"""
+
+    def merge(self, workers, merged):
+        return self.labelnames, _cache_hit_ratios(merged[cache_requests.name][1])
+
+
+cache_hit_ratio = registry.register(_HitRatioGauge(
+    'cache_hit_ratio', '各缓存的命中率（stale 计为命中；多进程时为所有工作进程合计）', ('cache',),
+    collect=_cache_hit_ratios))
+
+process_start_time = registry.register(Gauge(
+    'process_start_time_seconds', '进程启动时间（Unix 时间戳）', collect=lambda: {(): _started_at}))
+
+
+def after_fork() -> None:
+    """gunicorn 工作进程启动时调用：丢弃从主进程继承的数值；设置了 METRICS_DIR 时开始定期写快照。"""
+    global _started_at  # pylint: disable=global-statement
+    _started_at = time.time()
+    registry.reset()
+    if METRICS_ENABLED and METRICS_DIR:
+        registry.start_writer(METRICS_DIR)
+
+
+def observe_cache(cache: str, result: str) -> None:
+    """记录一次缓存查询，result 为 hit / miss / stale。"""
+    if METRICS_ENABLED:
+        cache_requests.inc(cache=cache, result=result)
+
+
+def observe_retry(source: str, function: str, exhausted: bool = False) -> None:
+    """记录一次重试（exhausted=True 时记录重试耗尽）。"""
+    if not METRICS_ENABLED:
+        return
+    if exhausted:
+        retries_exhausted.inc(source=source, function=function)
+    else:
+        retries.inc(source=source, function=function)
+
+
+def observe_upstream(function: str, host: str, seconds: float, error: Optional[BaseException] = None) -> None:
+    """记录一次真实上游请求的耗时和结果。"""
+    if not METRICS_ENABLED:
+        return
+    upstream_call_duration.observe(seconds, function=function, host=host)
+    upstream_calls.inc(function=function, host=host, outcome='error' if error is not None else 'success')
+    if error is not None:
+        upstream_errors.inc(function=function, error=type(error).__name__)
+
+
+def render() -> str:
+    return registry.render()
@@ -0,0 +1,98 @@
+"""
+启动耗时分析 - 统计导入 stock_data_service 时各模块的导入耗时，并检查是否超出预算
+
+在独立的子进程中用 `python -X importtime` 导入服务（不受当前进程已加载模块的影响），输出：
+    - 导入服务的总耗时和预算检查结果
+    - 按顶层包汇总的耗时（flask、requests、本服务各模块等）
+    - 累计耗时最高的模块
+    - 可选 --preload：再测一次预加载阶段（pandas、akshare 等延迟导入的依赖）的耗时
+
+运行方式: python profile_startup.py [--budget 500] [--top 25] [--preload]
+超出预算时以退出码 1 结束，可用于部署前检查。
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+if sys.platform == 'win32':
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except Exception:
+        pass
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_importtime(code: str):
+    """在子进程中执行 code，返回 [(模块名, 自身微秒, 累计微秒, 嵌套层级)]。"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=SERVICE_DIR, capture_output=True, text=True, encoding='utf-8', errors='replace', check=False,
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit(f"导入失败（退出码 {result.returncode}）")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' '))) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def top_level_totals(rows):
+    """按顶层包汇总：每个模块的自身耗时计入其顶层包。"""
+    totals = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def print_report(title: str, rows, top: int, total_us: int) -> None:
+    print(f"\n{title}: {total_us / 1000:.0f} ms，共 {len(rows)} 个模块")
+
+    print(f"\n  按顶层包汇总（前 {top} 个）")
+    for package, self_us in top_level_totals(rows)[:top]:
+        print(f"    {self_us / 1000:8.1f} ms  {self_us / total_us:6.1%}  {package}")
+
+    print(f"\n  累计耗时最高的模块（前 {top} 个）")
+    for name, self_us, cumulative_us, depth in sorted(rows, key=lambda row: row[2], reverse=True)[:top]:
+        print(f"    {cumulative_us / 1000:8.1f} ms  (自身 {self_us / 1000:6.1f} ms)  {'  ' * depth}{name}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='stock_data_service 导入耗时分析')
+    parser.add_argument('--budget', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', '500')),
+                        help='导入服务的耗时预算（毫秒）')
+    parser.add_argument('--top', type=int, default=25, help='每个列表显示的条数')
+    parser.add_argument('--preload', action='store_true', help='同时测量预加载阶段的耗时')
+    args = parser.parse_args()
+
+    rows = run_importtime('import stock_data_service')
+    # 总耗时取服务模块的累计耗时，不含解释器自身启动（site、encodings 等）
+    total_us = next(cumulative for name, _, cumulative, _ in rows if name == 'stock_data_service')
+    print_report('导入 stock_data_service', rows, args.top, total_us)
+
+    if args.preload:
+        loaded = {name for name, _, _, _ in rows}
+        preload_rows = [row for row in run_importtime('import stock_data_service; '
+                                                      'stock_data_service.preload_dependencies()')
+                        if row[0] not in loaded]
+        print_report('预加载阶段（延迟导入的依赖）', preload_rows, args.top,
+                     sum(self_us for _, self_us, _, _ in preload_rows))
+
+    total_ms = total_us / 1000
+    if total_ms > args.budget:
+        print(f"\n❌ 导入耗时 {total_ms:.0f} ms 超出预算 {args.budget:.0f} ms")
+        sys.exit(1)
+    print(f"\n✅ 导入耗时 {total_ms:.0f} ms，预算 {args.budget:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+上游数据源健康度 - 按AKShare函数记录成功率和耗时，用于动态调整备用数据源的尝试顺序
+
+每次经由 ak_call 发出的真实请求都会记录一次结果：
+    - 成功率基于最近 WINDOW_SIZE 次调用（加一平滑，样本少时不会过度惩罚）
+    - 耗时使用指数移动平均（EWMA）
+返回空结果（空 DataFrame）也计为失败。
+
+排序以声明顺序为基准，只有测得问题的数据源才后移：
+    - 近期成功率低于 DEMOTE_SUCCESS_RATE，或平均耗时超过最快的健康数据源的 SLOW_LATENCY_FACTOR 倍
+      （且超过 SLOW_LATENCY_FLOOR 秒）的数据源排在健康的数据源之后，彼此按代价（平均耗时 / 成功率）升序
+    - 健康的数据源和尚无样本（或样本已过时）的数据源保持声明顺序，没有样本不会让数据源提前，
+      后移的数据源样本过时后回到原位重新试探
+    - 熔断中的数据源始终排在最后
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional
+
+from circuit_breaker import OPEN, circuit_breakers
+
+# 计算成功率使用的最近调用次数
+WINDOW_SIZE = 20
+# 耗时EWMA的平滑系数
+LATENCY_ALPHA = 0.3
+# 超过该时间没有调用的数据源视为无样本，重新试探（秒）
+STALE_AFTER_SECONDS = 600
+# 近期（原始）成功率低于该值的数据源后移
+DEMOTE_SUCCESS_RATE = 0.8
+# 平均耗时超过最快的健康数据源多少倍时后移
+SLOW_LATENCY_FACTOR = 3.0
+# 平均耗时低于该值（秒）时不因耗时后移
+SLOW_LATENCY_FLOOR = 1.0
+
+
+class _ProviderStats:
+    __slots__ = ('calls', 'failures', 'outcomes', 'latency_ewma', 'last_call', 'last_success', 'last_failure',
+                 'last_error')
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.outcomes: Deque[bool] = deque(maxlen=WINDOW_SIZE)
+        self.latency_ewma: Optional[float] = None
+        self.last_call = 0.0
+        self.last_success: Optional[float] = None
+        self.last_failure: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def success_rate(self) -> float:
+        successes = sum(1 for ok in self.outcomes if ok)
+        return (successes + 1) / (len(self.outcomes) + 2)
+
+    @property
+    def recent_failure_rate(self) -> float:
+        """最近 WINDOW_SIZE 次调用中失败的比例（不做平滑），无样本为 0。"""
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok in self.outcomes if not ok) / len(self.outcomes)
+
+    @property
+    def cost(self) -> float:
+        return (self.latency_ewma or 0.0) / self.success_rate
+
+
+class ProviderHealthRegistry:
+    """线程安全的数据源健康度登记表。"""
+
+    def __init__(self):
+        self._stats: Dict[str, _ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, ok: bool, latency: float, error: Optional[BaseException] = None) -> None:
+        now = time.time()
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = _ProviderStats()
+            stats.calls += 1
+            stats.last_call = now
+            stats.outcomes.append(ok)
+            if stats.latency_ewma is None:
+                stats.latency_ewma = latency
+            else:
+                stats.latency_ewma = LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * stats.latency_ewma
+            if ok:
+                stats.last_success = now
+            else:
+                stats.failures += 1
+                stats.last_failure = now
+                # 没有异常的失败是上游返回了空结果
+                stats.last_error = f"{type(error).__name__}: {str(error)[:200]}" if error is not None else '空结果'
+
+    def order(self, names: Iterable[str]) -> List[str]:
+        """按健康度排序数据源：健康和无样本的保持声明顺序，测得失败或过慢的后移并按代价升序，熔断中的排在最后。"""
+        names = list(names)
+        now = time.time()
+        with self._lock:
+            sampled = {
+                name: (self._stats[name].recent_failure_rate, self._stats[name].latency_ewma or 0.0,
+                       self._stats[name].cost)
+                for name in names
+                if name in self._stats and now - self._stats[name].last_call <= STALE_AFTER_SECONDS
+            }
+
+        failing = {name for name, (failure_rate, _, _) in sampled.items()
+                   if 1.0 - failure_rate < DEMOTE_SUCCESS_RATE}
+        healthy_latencies = [latency for name, (_, latency, _) in sampled.items() if name not in failing]
+        slow_after = max(min(healthy_latencies) * SLOW_LATENCY_FACTOR, SLOW_LATENCY_FLOOR) \
+            if healthy_latencies else None
+        demoted = failing | {name for name, (_, latency, _) in sampled.items()
+                             if slow_after is not None and latency > slow_after}
+
+        def _is_open(name: str) -> bool:
+            breaker = circuit_breakers.peek(name)
+            return breaker is not None and breaker.state == OPEN
+
+        # sorted 是稳定排序：未后移的数据源保持声明顺序
+        ordered = sorted(names, key=lambda name: (
+            _is_open(name), name in demoted, sampled[name][2] if name in demoted else 0.0))
+        if ordered != names:
+            print(f"[{datetime.now()}] 数据源顺序已按健康度调整: {' -> '.join(ordered)}")
+        return ordered
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """各数据源的统计信息，供健康度接口返回。"""
+        def _iso(ts: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+        with self._lock:
+            return {
+                name: {
+                    'calls': stats.calls,
+                    'failures': stats.failures,
+                    'recentSuccessRate': round(stats.success_rate, 3),
+                    'recentSamples': len(stats.outcomes),
+                    'latencyMs': round(stats.latency_ewma * 1000, 1) if stats.latency_ewma is not None else None,
+                    'cost': round(stats.cost, 3),
+                    'lastSuccess': _iso(stats.last_success),
+                    'lastFailure': _iso(stats.last_failure),
+                    'lastError': stats.last_error,
+                }
+                for name, stats in sorted(self._stats.items())
+            }
+
+
+provider_health = ProviderHealthRegistry()
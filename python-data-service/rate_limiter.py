@@ -0,0 +1,163 @@
+"""
+上游限速 - 按数据源主机和AKShare函数划分的令牌桶，所有线程和接口共享
+
+每次真实请求前从 函数桶 和 主机桶 各取一个令牌：桶里有令牌时立即放行，
+没有时只等待到下一个令牌生成为止。上游空闲时不再有固定延迟，并发请求再多也不会超过设定速率。
+
+速率配置（每秒请求数，可带突发容量）：
+    UPSTREAM_RATE_EASTMONEY=10        主机速率，容量默认等于速率
+    UPSTREAM_BURST_EASTMONEY=20       主机突发容量
+    UPSTREAM_FUNCTION_RATES=stock_board_industry_cons_em:3,stock_hot_keyword_em:3/5
+                                      函数速率，"/" 后为突发容量
+
+令牌桶在进程内共享。多进程部署（gunicorn）时每个工作进程各有一套桶，因此以上速率是整个服务的总预算，
+每个进程按 STOCK_SERVICE_WORKERS（serve.py 按实际的工作进程数设置）平分，所有进程合计不超过设定值。
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+# 各主机默认速率（次/秒）
+_DEFAULT_HOST_RATES = {
+    'eastmoney': 10.0,
+    'sina': 5.0,
+    'tencent': 5.0,
+    'exchange': 2.0,
+    'default': 5.0,
+}
+
+# 需要单独限速的函数（次/秒）：批量逐个拉取的接口
+_DEFAULT_FUNCTION_RATES = {
+    'stock_board_industry_cons_em': 3.0,
+    'stock_hot_keyword_em': 3.0,
+}
+
+
+def process_count() -> int:
+    """分摊上游预算的服务进程数：serve.py 按实际启动的工作进程数设置 STOCK_SERVICE_WORKERS，单进程运行时为 1。"""
+    try:
+        return max(1, int(os.getenv('STOCK_SERVICE_WORKERS', '1')))
+    except ValueError:
+        return 1
+
+
+def per_process(budget: float) -> float:
+    """服务总预算中本进程分得的部分。"""
+    return budget / process_count()
+
+
+class TokenBucket:
+    """令牌桶：以 rate 个/秒的速度生成令牌，最多积累 capacity 个。线程安全。"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._waited = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        """调用方需持有 self._lock。"""
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """预定一个令牌，返回需要等待的秒数（0 表示立即可用）。"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            self._waited += wait
+            return wait
+
+    def acquire(self) -> float:
+        """取一个令牌，必要时等待；返回等待的秒数。"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate': self.rate,
+                'capacity': self.capacity,
+                'tokens': round(self._tokens, 2),
+                'totalWaitSeconds': round(self._waited, 2),
+            }
+
+
+def _parse_rate(text: str) -> Tuple[float, Optional[float]]:
+    """'3' -> (3, None)，'3/5' -> (3, 5)。"""
+    rate, _, burst = text.partition('/')
+    return float(rate), (float(burst) if burst else None)
+
+
+def _function_rates_from_env() -> Dict[str, Tuple[float, Optional[float]]]:
+    rates = {name: (rate, None) for name, rate in _DEFAULT_FUNCTION_RATES.items()}
+    for item in os.getenv('UPSTREAM_FUNCTION_RATES', '').split(','):
+        name, _, value = item.partition(':')
+        if name.strip() and value.strip():
+            try:
+                rates[name.strip()] = _parse_rate(value.strip())
+            except ValueError:
+                print(f"[{datetime.now()}] ⚠️ 无效的函数限速配置: {item}")
+    return rates
+
+
+class RateLimiterRegistry:
+    """主机桶和函数桶的集合；速率 <= 0 表示不限速。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Optional[TokenBucket]] = {}
+        self._functions: Dict[str, Optional[TokenBucket]] = {}
+        self._function_rates = _function_rates_from_env()
+
+    def _host_bucket(self, host: str) -> Optional[TokenBucket]:
+        if host not in self._hosts:
+            with self._lock:
+                if host not in self._hosts:
+                    suffix = host.upper()
+                    rate = float(os.getenv(f'UPSTREAM_RATE_{suffix}', str(_DEFAULT_HOST_RATES.get(host, 5.0))))
+                    burst = os.getenv(f'UPSTREAM_BURST_{suffix}')
+                    self._hosts[host] = TokenBucket(
+                        per_process(rate), per_process(float(burst)) if burst else None) if rate > 0 else None
+        return self._hosts[host]
+
+    def _function_bucket(self, name: str) -> Optional[TokenBucket]:
+        if name not in self._functions:
+            with self._lock:
+                if name not in self._functions:
+                    rate, burst = self._function_rates.get(name, (0.0, None))
+                    self._functions[name] = TokenBucket(
+                        per_process(rate), per_process(burst) if burst else None) if rate > 0 else None
+        return self._functions[name]
+
+    def acquire(self, name: str, host: str) -> float:
+        """为一次对 name（位于 host）的请求取令牌，返回等待的总秒数。"""
+        waited = 0.0
+        for bucket in (self._function_bucket(name), self._host_bucket(host)):
+            if bucket is not None:
+                waited += bucket.acquire()
+        return waited
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            hosts = dict(self._hosts)
+            functions = dict(self._functions)
+        return {
+            'hosts': {host: bucket.snapshot() for host, bucket in sorted(hosts.items()) if bucket is not None},
+            'functions': {name: bucket.snapshot() for name, bucket in sorted(functions.items()) if bucket is not None},
+        }
+
+
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,192 @@
+"""
+重试调度器 - 把“调用失败 -> 等待 -> 再试”交给后台事件循环，退避等待不占用任何线程
+
+    - 请求线程默认在本线程内直接执行第一次尝试（不在线程池中排队，负载高时健康的调用也不会被拖慢），
+      失败即返回降级结果，退避等待和之后的重试交给后台继续，不占用请求线程
+    - 后台重试在一个小的工作线程池中执行；两次尝试之间的等待是事件循环上的定时器（asyncio.sleep）
+    - 相同 key 的任务共享同一个 Future；成功结果保留 RESULT_TTL_SECONDS 秒，
+      后台重试成功后，下一次相同请求可以直接拿到结果
+    - 熔断中的上游（CircuitOpenError）不再重试
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import metrics
+from circuit_breaker import CircuitOpenError
+
+RETRY_WORKERS = int(os.getenv('RETRY_SCHEDULER_WORKERS', '8'))
+# 后台重试成功后结果的保留时间（秒）
+RESULT_TTL_SECONDS = float(os.getenv('RETRY_RESULT_TTL', '30'))
+
+
+class RetryPending(FutureTimeoutError):
+    """第一次尝试已失败，任务在后台等待重试；按超时处理即可（返回降级结果）。"""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """重试策略：第 n 次失败后等待 base_delay * n（exponential 时为 base_delay * 2^(n-1)），不超过 max_delay。"""
+    retries: int = 3
+    base_delay: float = 1.0
+    exponential: bool = False
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int) -> float:
+        if self.exponential:
+            wait = self.base_delay * (2 ** (attempt - 1))
+        else:
+            wait = self.base_delay * attempt
+        return min(wait, self.max_delay)
+
+
+class RetryScheduler:
+    """后台事件循环上的重试调度器，首次使用时启动。"""
+
+    def __init__(self, workers: int = RETRY_WORKERS, result_ttl: float = RESULT_TTL_SECONDS):
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='retry-worker')
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        # key -> (future, 完成时间；未完成为 None, 第一次尝试已有结果的事件)
+        self._jobs: Dict[Hashable, Tuple[Future, Optional[float], threading.Event]] = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """调用方需持有 self._lock。"""
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='retry-scheduler', daemon=True).start()
+            self._loop = loop
+        return self._loop
+
+    @staticmethod
+    def _record_failure(exc: Exception, attempt: int, description: str, policy: RetryPolicy, name: str) -> bool:
+        """记录一次失败的尝试，返回是否还能重试。"""
+        if attempt >= policy.retries:
+            metrics.observe_retry('retry_scheduler', name, exhausted=True)
+            print(f"[{datetime.now()}] ❌ {description} 所有重试均失败 ({attempt}/{policy.retries}): "
+                  f"{type(exc).__name__}: {str(exc)[:150]}")
+            return False
+        metrics.observe_retry('retry_scheduler', name)
+        print(f"[{datetime.now()}] ⚠️ {description} 失败 ({attempt}/{policy.retries}): "
+              f"{type(exc).__name__}: {str(exc)[:150]}，{policy.delay(attempt):.1f}秒后重试")
+        return True
+
+    async def _run(self, fn: Callable[[], Any], description: str, policy: RetryPolicy, name: str,
+                   attempted: threading.Event, first_attempt: int = 1) -> Any:
+        """从第 first_attempt 次尝试开始执行；大于1时表示之前的尝试已在请求线程中失败，先退避再重试。"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(first_attempt, policy.retries + 1):
+            if attempt > 1:
+                await asyncio.sleep(policy.delay(attempt - 1))
+            try:
+                return await loop.run_in_executor(self._executor, fn)
+            except CircuitOpenError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                if not self._record_failure(exc, attempt, description, policy, name):
+                    raise
+                attempted.set()
+        raise RuntimeError(f"{description} 未执行")  # retries <= 0
+
+    def _prune(self, now: float) -> None:
+        """调用方需持有 self._lock。"""
+        expired = [key for key, (_, finished, _) in self._jobs.items()
+                   if finished is not None and now - finished > self.result_ttl]
+        for key in expired:
+            self._jobs.pop(key, None)
+
+    def _on_done(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            if self._jobs.get(key, (None,))[0] is not future:
+                return
+            if future.cancelled() or future.exception() is not None:
+                # 失败结果不保留，下一次请求重新发起
+                self._jobs.pop(key, None)
+            else:
+                self._jobs[key] = (future, time.time(), self._jobs[key][2])
+
+    def _job(self, key: Optional[Hashable]) -> Optional[Tuple[Future, Optional[float], threading.Event]]:
+        if key is None:
+            return None
+        with self._lock:
+            self._prune(time.time())
+            return self._jobs.get(key)
+
+    def _submit(self, fn: Callable[[], Any], description: str, policy: RetryPolicy,
+                key: Optional[Hashable], name: Optional[str], first_attempt: int = 1
+                ) -> Tuple[Future, threading.Event]:
+        with self._lock:
+            if key is not None:
+                self._prune(time.time())
+                job = self._jobs.get(key)
+                if job is not None:
+                    return job[0], job[2]
+            # 第一次尝试失败或任务结束时置位
+            attempted = threading.Event()
+            if first_attempt > 1:
+                attempted.set()
+            future = asyncio.run_coroutine_threadsafe(
+                self._run(fn, description, policy, name or description, attempted, first_attempt),
+                self._ensure_loop())
+            if key is not None:
+                self._jobs[key] = (future, None, attempted)
+        future.add_done_callback(lambda _: attempted.set())
+        if key is not None:
+            future.add_done_callback(lambda f: self._on_done(key, f))
+        return future, attempted
+
+    def submit(self, fn: Callable[[], Any], description: str, policy: RetryPolicy = RetryPolicy(),
+               key: Optional[Hashable] = None, name: Optional[str] = None) -> Future:
+        """提交带重试的任务，返回 concurrent.futures.Future；相同 key 的进行中或刚成功的任务会被复用。
+
+        name 为运行指标中的函数名（如上游函数名），默认使用 description。
+        """
+        return self._submit(fn, description, policy, key, name)[0]
+
+    def call(self, fn: Callable[[], Any], description: str, policy: RetryPolicy = RetryPolicy(),
+             timeout: Optional[float] = None, key: Optional[Hashable] = None, name: Optional[str] = None,
+             wait_retries: bool = False) -> Any:
+        """执行任务并返回结果。
+
+        wait_retries 为 False 时第一次尝试直接在调用线程中执行：失败即抛出 RetryPending，退避和重试在后台继续，
+        请求线程不会阻塞在退避等待上，也不会在线程池中排队。相同 key 已有后台任务时不再发起新的尝试，
+        改为等待该任务（最多 timeout 秒）。后台线程可以传 True，整个任务交给调度器并等到所有重试结束。
+
+        Raises:
+            concurrent.futures.TimeoutError: timeout 内未完成（任务仍在后台继续重试）；
+                RetryPending 是它的子类。
+            最后一次尝试的异常或 CircuitOpenError。
+        """
+        if wait_retries:
+            return self._submit(fn, description, policy, key, name)[0].result(timeout=timeout)
+
+        job = self._job(key)
+        if job is None:
+            try:
+                return fn()
+            except CircuitOpenError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                if not self._record_failure(exc, 1, description, policy, name or description):
+                    raise
+            self._submit(fn, description, policy, key, name, first_attempt=2)
+            raise RetryPending(f"{description} 第一次尝试失败，后台继续重试")
+
+        future, _, attempted = job
+        if not attempted.wait(timeout):
+            raise FutureTimeoutError()
+        if not future.done():
+            raise RetryPending(f"{description} 正在后台重试")
+        return future.result()
+
+
+retry_scheduler = RetryScheduler()
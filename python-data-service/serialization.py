@@ -0,0 +1,207 @@
+"""
+响应序列化与压缩 - 大响应的快速JSON编码路径和 gzip/brotli 压缩
+
+    - 安装了 orjson 时用它编码（比标准库 json 快数倍），否则回退到标准库
+    - DataFrame 结果用 FrameRecords 包装后直接放进响应：数值列整列编码（numpy 数组交给 orjson），
+      按行拼接成JSON数组后嵌入外层JSON，不再为每一行构造 Python 字典
+    - 响应体超过 COMPRESS_MIN_BYTES 时按请求的 Accept-Encoding 压缩：
+      优先 brotli（需安装 brotli 包），其次 gzip
+
+FastJSONProvider 替换 Flask 的默认JSON编码，所有 jsonify 调用都走这条路径。
+"""
+
+from __future__ import annotations
+
+import gzip
+import itertools
+import json
+import os
+from typing import Any, Iterable, Optional
+
+from flask.json.provider import DefaultJSONProvider
+
+from lazy_import import lazy_import
+
+# pandas 延迟导入（见 lazy_import.py），导入本模块时不加载
+pd = lazy_import('pandas')
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 可选依赖
+    brotli = None
+
+# 小于该字节数的响应不压缩（压缩收益抵不过开销）
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+# gzip 压缩级别（1-9），越高越省带宽、越耗CPU
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '5'))
+# brotli 压缩质量（0-11）
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+
+_COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html')
+
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+                   if orjson is not None else 0)
+
+_fragment_ids = itertools.count()
+
+
+class FrameRecords:
+    """
+    以 records 形式（[{列: 值}, ...]）输出的 DataFrame。
+
+    编码时整表一次转换成JSON数组；服务内部需要数据时直接使用 frame，无需再从字典列表重建 DataFrame。
+    """
+
+    __slots__ = ('frame',)
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def to_json_bytes(self) -> bytes:
+        if self.frame.empty:
+            return b'[]'
+        if orjson is None:
+            return json.dumps(self.to_records(), default=_flask_default, ensure_ascii=False,
+                              separators=(',', ':')).encode('utf-8')
+
+        # 每列编码一次：数值列整列交给 orjson（numpy 数组，最短表示），其他列逐个值编码；
+        # 再按行把各列片段拼成 {"列":值,...}
+        cells = []
+        for position, (name, values) in enumerate(self.frame.items()):
+            prefix = (b'{' if position == 0 else b',') + orjson.dumps(str(name)) + b':'
+            cells.append([prefix + part for part in _encode_column(values)])
+        return b'[' + b'},'.join(b''.join(row) for row in zip(*cells)) + b'}]'
+
+    def to_records(self) -> list:
+        """字典列表，缺失值（NaN/NaT/NA）为 None，可空整数列的值为 int。"""
+        frame = self.frame.astype(object)
+        return frame.where(self.frame.notna(), None).to_dict(orient='records')
+
+
+def _encode_column(values: pd.Series) -> list:
+    """把一列编码成每个值的JSON片段列表（需要 orjson）。缺失值（NaN/NaT/NA）编码为 null。"""
+    dtype = values.dtype
+    if pd.api.types.is_integer_dtype(dtype):
+        # 可空整数列（Int64）的 NA 先占位为 0，编码后再换成 null，其余值仍输出为整数
+        missing = values.isna().to_numpy()
+        array = values.to_numpy(dtype='int64', na_value=0)
+    elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        missing = None
+        array = values.to_numpy(dtype='float64', na_value=float('nan'))
+    else:
+        return [b'null' if _is_missing(value) else orjson.dumps(value, default=_flask_default, option=_ORJSON_OPTIONS)
+                for value in values.tolist()]
+    # 数值数组编码为 [a,b,...]，值中不含逗号，可以直接切分；NaN 编码为 null
+    parts = orjson.dumps(array, option=orjson.OPT_SERIALIZE_NUMPY)[1:-1].split(b',')
+    if missing is not None and missing.any():
+        parts = [b'null' if absent else part for part, absent in zip(parts, missing)]
+    return parts
+
+
+def _is_missing(value: Any) -> bool:
+    """单元格是否为缺失值：None、NaT、pd.NA（NaN 由 orjson 编码为 null）。"""
+    return value is None or value is pd.NaT or value is pd.NA
+
+
+def _flask_default(value: Any) -> Any:
+    """orjson/标准库都无法处理的类型交给 Flask 的默认规则（datetime -> HTTP日期、Decimal、dataclass 等）。"""
+    return DefaultJSONProvider.default(value)
+
+
+def dumps(obj: Any) -> bytes:
+    """把对象编码成 UTF-8 JSON 字节串；FrameRecords 按列整表编码后拼入。"""
+    fragments = {}
+
+    def default(value):
+        if isinstance(value, FrameRecords):
+            token = f"__frame_{next(_fragment_ids)}__"
+            fragments[token] = value.to_json_bytes()
+            return token
+        return _flask_default(value)
+
+    if orjson is not None:
+        body = orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+    else:
+        body = json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    for token, fragment in fragments.items():
+        body = body.replace(f'"{token}"'.encode('ascii'), fragment, 1)
+    return body
+
+
+def dumps_lines(items: Iterable[Any]) -> Iterable[bytes]:
+    """NDJSON：每个对象编码为一行。"""
+    for item in items:
+        yield dumps(item) + b'\n'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON 提供者：jsonify 使用 dumps() 直接生成字节串，不排序键、不转义中文。"""
+
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b'\n', mimetype=self.mimetype)
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """从 Accept-Encoding 中选出可用的压缩方式（忽略 q=0 的项）。"""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.partition(';')
+        quality = params.strip().replace(' ', '')
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response, accept_encoding: str):
+    """after_request 钩子：按 Accept-Encoding 压缩足够大的文本/JSON响应；流式响应保持原样以便逐行送达。"""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in _COMPRESSIBLE_MIMETYPES):
+        return response
+
+    encoding = _accepted_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
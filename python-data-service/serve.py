@@ -0,0 +1,152 @@
+"""
+生产环境启动入口 - 多进程、多线程运行股票数据服务
+
+    - Linux/macOS：gunicorn gthread 工作模式，主进程先导入服务并预加载 akshare 等依赖（只加载一次），
+      再 fork 出 STOCK_SERVICE_WORKERS 个工作进程，每个进程 STOCK_SERVICE_THREADS 个线程
+    - Windows 或未安装 gunicorn：waitress 单进程多线程
+    - 两者都未安装：Werkzeug 多线程服务器（关闭调试器和自动重载）
+
+每个工作进程启动后在后台预热常用数据集（warmup.py），GET /ready 在预热结束后返回200。
+
+上游限速和主机并发上限是整个服务的总预算：启动前把实际的工作进程数写入 STOCK_SERVICE_WORKERS，
+各进程按它平分（见 rate_limiter.py、upstream.py），进程数再多也不会成倍放大对上游的请求。
+gunicorn 下各工作进程把运行指标写到共享目录 METRICS_DIR（未设置时使用临时目录），/metrics 合并所有进程的数据（见 metrics.py）。
+
+运行方式: python serve.py
+开发调试仍可使用: python stock_data_service.py
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+HOST = os.getenv('STOCK_SERVICE_HOST', '0.0.0.0')
+PORT = int(os.getenv('STOCK_SERVICE_PORT', '5001'))
+WORKERS = int(os.getenv('STOCK_SERVICE_WORKERS', str(min(4, (os.cpu_count() or 1) + 1))))
+THREADS = int(os.getenv('STOCK_SERVICE_THREADS', '16'))
+# 单个请求的最长处理时间（秒），超时的 gunicorn 工作进程会被重启
+TIMEOUT = int(os.getenv('STOCK_SERVICE_TIMEOUT', '120'))
+
+
+def _set_process_count(count: int) -> None:
+    """在导入服务之前设置，上游限速和并发上限按进程数平分。"""
+    os.environ['STOCK_SERVICE_WORKERS'] = str(count)
+
+
+def _prepare_metrics_dir() -> None:
+    """在导入服务之前设置多进程运行指标的共享目录，并清除上一次运行留下的快照。"""
+    directory = os.getenv('METRICS_DIR') or os.path.join(tempfile.gettempdir(), f'stock-service-metrics-{PORT}')
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    os.environ['METRICS_DIR'] = directory
+
+
+def _preload(background: bool = False):
+    """
+    导入服务并预加载 akshare 等延迟导入的依赖。
+
+    gunicorn 在主进程中同步预加载，fork 出的工作进程直接共享这些模块，启动无需再导入；
+    单进程服务器在后台线程预加载，端口立即可用。
+    """
+    from stock_data_service import app, preload_dependencies  # pylint: disable=import-outside-toplevel
+    preload_dependencies(background=background)
+    return app
+
+
+def _run_gunicorn() -> bool:
+    try:
+        from gunicorn.app.base import BaseApplication  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return False
+
+    _set_process_count(WORKERS)
+    _prepare_metrics_dir()
+    import metrics  # pylint: disable=import-outside-toplevel
+    from warmup import warmup  # pylint: disable=import-outside-toplevel
+    from worker_status import worker_status  # pylint: disable=import-outside-toplevel
+
+    def _post_fork(server, worker):  # pylint: disable=unused-argument
+        # 每个工作进程各自统计负载、写运行指标快照并预热自己的内存缓存
+        worker_status.after_fork()
+        metrics.after_fork()
+        warmup.start()
+
+    class StockDataApplication(BaseApplication):  # pylint: disable=abstract-method
+        def __init__(self, app):
+            self.application = app
+            super().__init__()
+
+        def load_config(self):
+            settings = {
+                'bind': f"{HOST}:{PORT}",
+                'workers': WORKERS,
+                'threads': THREADS,
+                'worker_class': 'gthread',
+                'timeout': TIMEOUT,
+                'graceful_timeout': 30,
+                'keepalive': 5,
+                'preload_app': True,
+                'post_fork': _post_fork,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    worker_status.configure('gunicorn', WORKERS, THREADS)
+    app = _preload()
+    print(f"[{datetime.now()}] 🚀 gunicorn 启动: {HOST}:{PORT}, {WORKERS} 个工作进程 x {THREADS} 个线程")
+    StockDataApplication(app).run()
+    return True
+
+
+def _run_waitress() -> bool:
+    try:
+        from waitress import serve  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return False
+
+    _set_process_count(1)
+    from warmup import warmup  # pylint: disable=import-outside-toplevel
+    from worker_status import worker_status  # pylint: disable=import-outside-toplevel
+
+    worker_status.configure('waitress', 1, THREADS)
+    app = _preload(background=True)
+    warmup.start()
+    print(f"[{datetime.now()}] 🚀 waitress 启动: {HOST}:{PORT}, {THREADS} 个线程")
+    serve(app, host=HOST, port=PORT, threads=THREADS, channel_timeout=TIMEOUT)
+    return True
+
+
+def _run_werkzeug() -> None:
+    _set_process_count(1)
+    from warmup import warmup  # pylint: disable=import-outside-toplevel
+    from worker_status import worker_status  # pylint: disable=import-outside-toplevel
+
+    # 每个请求一个线程，不限数量
+    worker_status.configure('werkzeug', 1, 0)
+    app = _preload(background=True)
+    warmup.start()
+    print(f"[{datetime.now()}] ⚠️ 未安装 gunicorn/waitress，使用 Werkzeug 多线程服务器: {HOST}:{PORT}")
+    app.run(host=HOST, port=PORT, debug=False, use_reloader=False, threaded=True)
+
+
+def main() -> None:
+    if sys.platform != 'win32' and _run_gunicorn():
+        return
+    if _run_waitress():
+        return
+    _run_werkzeug()
+
+
+if __name__ == '__main__':
+    main()
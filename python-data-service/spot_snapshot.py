@@ -0,0 +1,230 @@
+"""
+全市场实时行情快照 - 对 stock_zh_a_spot_em 的结果建立索引
+
+列名只在构建快照时解析一次，股票代码 -> 行号使用哈希索引，
+数值列保存为 NumPy 数组，单只查询为 O(1)，批量查询为一次向量化取值。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from lazy_import import lazy_import
+from trading_calendar import trading_calendar
+
+# numpy/pandas 延迟导入（见 lazy_import.py），导入本模块时不加载
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# 交易时段内快照有效期（秒）；闭市期间取得的快照一直有效到下一个交易时段
+SNAPSHOT_TTL_SECONDS = 60
+# 刷新失败后，在该时间内继续使用旧快照且不再重试（秒）
+RETRY_AFTER_FAILURE_SECONDS = 15
+# 旧快照最长可继续使用的时间（秒）
+MAX_STALE_SECONDS = 600
+
+# 字段名 -> 候选列名（按优先级）
+_FIELD_COLUMNS = {
+    'price': ['最新价', 'price', 'close'],
+    'changePercent': ['涨跌幅', 'changepercent', 'pct_change'],
+    'changeAmount': ['涨跌额', 'change'],
+    'turnoverRate': ['换手率', 'turnoverrate', 'turnover_rate'],
+    'volume': ['成交量', 'volume'],
+    'amount': ['成交额', 'amount'],
+    'volumeRatio': ['量比', 'volume_ratio'],
+    'totalMarketCap': ['总市值'],
+}
+
+
+def normalize_code(code: str) -> str:
+    """去掉 sh/sz/bj 前缀并补齐为6位代码。"""
+    clean = str(code).strip().lower()
+    for prefix in ('sh', 'sz', 'bj'):
+        if clean.startswith(prefix):
+            clean = clean[len(prefix):]
+            break
+    return clean.zfill(6)
+
+
+def _find_code_column(columns: Iterable) -> Optional[str]:
+    for col in columns:
+        col_str = str(col)
+        col_lower = col_str.lower()
+        if ('代码' in col_str or 'code' in col_lower) and '名称' not in col_str and 'name' not in col_lower:
+            return col
+    return None
+
+
+def _find_column(columns: List, candidates: List[str]) -> Optional[str]:
+    lowered = {str(col).lower(): col for col in columns}
+    for candidate in candidates:
+        if candidate in columns:
+            return candidate
+        if candidate.lower() in lowered:
+            return lowered[candidate.lower()]
+    return None
+
+
+def _to_float_array(series: pd.Series) -> np.ndarray:
+    # pandas 3 的字符串列为 str 类型而非 object，按“非数值列”判断
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).str.replace('%', '', regex=False).str.strip()
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype='float64')
+
+
+class SpotSnapshot:
+    """某一时刻的全市场行情，构建后只读，可被多个线程共享。"""
+
+    def __init__(self, df: pd.DataFrame, fetched_at: Optional[float] = None):
+        self.fetched_at = fetched_at or time.time()
+        columns = list(df.columns)
+        code_col = _find_code_column(columns)
+        if code_col is None:
+            raise ValueError(f"实时行情缺少代码列, 可用列: {columns}")
+
+        self.codes = np.array([normalize_code(c) for c in df[code_col].astype(str)], dtype=object)
+        # 同一代码出现多次时保留第一行
+        self._index: Dict[str, int] = {}
+        for pos, code in enumerate(self.codes):
+            self._index.setdefault(code, pos)
+
+        name_col = _find_column(columns, ['名称', 'name'])
+        self.names = df[name_col].astype(str).to_numpy(dtype=object) if name_col is not None else None
+
+        self.columns: Dict[str, str] = {}
+        self.arrays: Dict[str, np.ndarray] = {}
+        for field_name, candidates in _FIELD_COLUMNS.items():
+            col = _find_column(columns, candidates)
+            if col is None and field_name == 'turnoverRate':
+                col = next((c for c in columns if '换手' in str(c)), None)
+            if col is not None:
+                self.columns[field_name] = col
+                self.arrays[field_name] = _to_float_array(df[col])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def position(self, code: str) -> int:
+        return self._index.get(normalize_code(code), -1)
+
+    def value(self, code: str, field_name: str) -> Optional[float]:
+        """单只股票的单个字段，缺失时返回 None。"""
+        arr = self.arrays.get(field_name)
+        pos = self.position(code)
+        if arr is None or pos < 0:
+            return None
+        val = arr[pos]
+        return None if np.isnan(val) else float(val)
+
+    def turnover_rate(self, code: str) -> Optional[float]:
+        return self.value(code, 'turnoverRate')
+
+    def lookup(self, code: str) -> Optional[Dict]:
+        """单只股票的全部字段。"""
+        pos = self.position(code)
+        if pos < 0:
+            return None
+        item = {'code': self.codes[pos]}
+        if self.names is not None:
+            item['name'] = self.names[pos]
+        for field_name, arr in self.arrays.items():
+            val = arr[pos]
+            item[field_name] = None if np.isnan(val) else float(val)
+        return item
+
+    def bulk(self, codes: Iterable[str], fields: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """批量查询：一次性取出所有代码的行号，再对每个字段做一次向量化取值。"""
+        normalized = [normalize_code(c) for c in codes]
+        positions = np.fromiter((self._index.get(c, -1) for c in normalized), dtype=np.int64, count=len(normalized))
+        found = positions >= 0
+        hit_positions = positions[found]
+        hit_codes = [c for c, ok in zip(normalized, found) if ok]
+
+        field_names = list(fields) if fields is not None else list(self.arrays.keys())
+        columns = {}
+        for field_name in field_names:
+            arr = self.arrays.get(field_name)
+            if arr is not None:
+                columns[field_name] = arr.take(hit_positions)
+        names = self.names.take(hit_positions) if self.names is not None else None
+
+        result = {}
+        for i, code in enumerate(hit_codes):
+            item = {'code': code}
+            if names is not None:
+                item['name'] = names[i]
+            for field_name, values in columns.items():
+                val = values[i]
+                item[field_name] = None if np.isnan(val) else float(val)
+            result[code] = item
+        return result
+
+
+class SpotSnapshotCache:
+    """带有效期的快照缓存，同一时间只有一个线程刷新。"""
+
+    def __init__(self, ttl: float = SNAPSHOT_TTL_SECONDS):
+        self.ttl = ttl
+        self._snapshot: Optional[SpotSnapshot] = None
+        self._last_failure = 0.0
+        self._lock = threading.Lock()
+
+    def _default_loader(self) -> pd.DataFrame:
+        import akshare as ak  # pylint: disable=import-outside-toplevel
+        from upstream import ak_call  # pylint: disable=import-outside-toplevel
+        return ak_call(ak.stock_zh_a_spot_em)
+
+    def peek(self) -> Optional[SpotSnapshot]:
+        """返回当前快照（可能已过期），不触发刷新。"""
+        return self._snapshot
+
+    def _is_valid(self, snapshot: Optional[SpotSnapshot]) -> bool:
+        return snapshot is not None and time.time() < trading_calendar.expires_at(snapshot.fetched_at, self.ttl)
+
+    def get(self, loader: Optional[Callable[[], pd.DataFrame]] = None) -> Optional[SpotSnapshot]:
+        """返回有效快照，过期时刷新；刷新失败时在允许范围内继续使用旧快照。"""
+        snapshot = self._snapshot
+        if self._is_valid(snapshot):
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if self._is_valid(snapshot):
+                return snapshot
+            if time.time() - self._last_failure < RETRY_AFTER_FAILURE_SECONDS:
+                return self._usable_stale(snapshot)
+
+            try:
+                print(f"[{datetime.now()}] 正在获取全市场实时行情快照...")
+                df = (loader or self._default_loader)()
+                if df is None or df.empty:
+                    raise ValueError("实时行情返回空数据")
+                snapshot = SpotSnapshot(df)
+                self._snapshot = snapshot
+                print(f"[{datetime.now()}] ✅ 实时行情快照已更新: {len(snapshot)} 只股票, 字段: {list(snapshot.columns)}")
+                return snapshot
+            except Exception as exc:  # pylint: disable=broad-except
+                self._last_failure = time.time()
+                print(f"[{datetime.now()}] ⚠️ 获取实时行情快照失败: {str(exc)[:150]}")
+                return self._usable_stale(snapshot)
+
+    @staticmethod
+    def _usable_stale(snapshot: Optional[SpotSnapshot]) -> Optional[SpotSnapshot]:
+        if snapshot is not None and snapshot.age <= MAX_STALE_SECONDS:
+            return snapshot
+        return None
+
+
+spot_cache = SpotSnapshotCache()
+
+
+def get_spot_snapshot(loader: Optional[Callable[[], pd.DataFrame]] = None) -> Optional[SpotSnapshot]:
+    """获取全市场实时行情快照，失败且无可用旧快照时返回 None。"""
+    return spot_cache.get(loader)
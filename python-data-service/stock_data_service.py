@@ -2,6 +2,8 @@
 股票数据服务 - 使用AKShare获取财务数据
 运行方式: python stock_data_service.py
 """
+from __future__ import annotations
+
 import sys
 import os
 # 设置Windows控制台编码为UTF-8
@@ -12,89 +14,61 @@ if sys.platform == 'win32':
     except:
         pass
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
-import akshare as ak
-import pandas as pd
-import numpy as np
+from lazy_import import lazy_import, preload, status as dependency_status
 import traceback
 import json
 from datetime import datetime, timedelta
 import os
 import warnings
 import time
-from bs4 import BeautifulSoup
-from strategy_hot_volume_breakout import run_strategy
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from bar_store import BAR_UNITS, bar_store, normalize_bars, plain_code, sync_tail
+from circuit_breaker import CircuitOpenError, circuit_breakers
+from fundamental_cache import fundamental_cache
+from batch_engine import run_batch
+from upstream import ak_call, ak_call_async, call_key, host_snapshot
+from provider_health import provider_health
+from rate_limiter import rate_limiters
+from spot_snapshot import get_spot_snapshot, normalize_code, spot_cache
+from swr_cache import StaleWhileRevalidateCache
+from retry_scheduler import RetryPolicy, retry_scheduler
+from article_cache import article_cache
+from industry_directory import industry_directory
+from symbol_master import symbol_master
+from trading_calendar import trading_calendar
+import http_session
+from worker_status import worker_status
+from warmup import warmup
+import metrics
+from serialization import FastJSONProvider, FrameRecords, compress_response, dumps, dumps_lines
+from conditional import ResponseCache, etag_for, frame_fingerprint, not_modified, with_etag
+
+# 重量级依赖延迟导入：导入本模块时不加载，首次使用或预加载阶段（preload_dependencies）才导入
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+ak = lazy_import('akshare')
+bs4 = lazy_import('bs4')
+strategy = lazy_import('strategy_hot_volume_breakout')
 
 # matplotlib 相关代码已移除，不再需要生成图片
 
-# 全局禁用代理以解决连接问题（与测试脚本test_industry_name_em.py保持一致）
-# 首先移除所有代理环境变量（与测试脚本保持一致）
-original_proxies = {}
-for proxy_var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']:
-    original_proxies[proxy_var] = os.environ.get(proxy_var)
-    os.environ.pop(proxy_var, None)
-
-# 然后设置NO_PROXY以禁止所有代理
-os.environ['no_proxy'] = '*'
-os.environ['NO_PROXY'] = '*'
-
 # 禁用urllib3警告
 warnings.filterwarnings('ignore', category=UserWarning)
 
-# 配置AKShare使用无代理环境（更彻底的代理禁用 - 使用monkey patch）
+# 全局禁用代理（启动时设置一次，请求处理中不再修改环境变量）：
+# 所有 requests 调用（包括AKShare内部）经共享会话发出，强制直连、按主机复用长连接
 try:
     import requests
-    from requests.adapters import HTTPAdapter
-    from urllib3.util import Retry
     import urllib3
     
     # 禁用urllib3警告
     urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
     
-    # 保存原始的requests.get和requests.post方法
-    _original_get = requests.get
-    _original_post = requests.post
-    _original_session_init = requests.Session.__init__
-    
-    # Monkey patch: 拦截所有requests调用，强制禁用代理
-    def patched_get(*args, **kwargs):
-        # 强制设置proxies=None，确保不使用任何代理
-        kwargs['proxies'] = {'http': None, 'https': None}
-        kwargs.setdefault('timeout', 30)  # 设置默认超时
-        return _original_get(*args, **kwargs)
-    
-    def patched_post(*args, **kwargs):
-        # 强制设置proxies=None，确保不使用任何代理
-        kwargs['proxies'] = {'http': None, 'https': None}
-        kwargs.setdefault('timeout', 30)  # 设置默认超时
-        return _original_post(*args, **kwargs)
-    
-    # Monkey patch Session类，确保所有Session实例都不使用代理
-    def patched_session_init(self, *args, **kwargs):
-        _original_session_init(self, *args, **kwargs)
-        self.trust_env = False  # 不信任环境变量
-        self.proxies = {'http': None, 'https': None}  # 强制禁用代理
-    
-    # 应用monkey patch
-    requests.get = patched_get
-    requests.post = patched_post
-    requests.Session.__init__ = patched_session_init
-    
-    # 创建自定义session，完全禁用代理
-    def create_no_proxy_session():
-        session = requests.Session()
-        session.trust_env = False  # 不信任环境变量中的代理设置
-        session.proxies = {'http': None, 'https': None}  # 强制禁用代理
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=0.5,  # 增加重试延迟
-            status_forcelist=[429, 500, 502, 503, 504],
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-        return session
+    http_session.install()
     
     # 尝试设置环境变量，确保urllib3也不使用代理
     os.environ['REQUESTS_CA_BUNDLE'] = ''
@@ -103,24 +77,212 @@ except Exception as e:
     pass
 
 app = Flask(__name__)
+
+
+def preload_dependencies(background: bool = False):
+    """预加载阶段：导入 pandas、akshare、bs4 和策略模块（gunicorn 在 fork 前同步调用，单进程服务器在后台线程调用）"""
+    return preload(['numpy', 'pandas', 'akshare', 'bs4', 'strategy_hot_volume_breakout'], background=background)
+
+app.json = FastJSONProvider(app)  # jsonify 使用快速JSON编码（orjson，DataFrame按列整表编码）
 CORS(app)  # 允许跨域请求
 
+@app.before_request
+def _track_request_start():
+    worker_status.begin()
+    if metrics.METRICS_ENABLED:
+        # 按路由模板统计，避免每个股票代码产生一组指标
+        g.metrics_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        g.metrics_started = time.perf_counter()
+        metrics.http_requests_in_flight.inc(route=g.metrics_route)
+
+
+def _finish_request_metrics(status_code: int) -> None:
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    route = g.metrics_route
+    metrics.http_requests_in_flight.dec(route=route)
+    metrics.http_request_duration.observe(time.perf_counter() - started, route=route, method=request.method)
+    metrics.http_requests.inc(route=route, method=request.method, status=str(status_code))
+
+
+@app.after_request
+def _track_request_end(response):
+    worker_status.end(failed=response.status_code >= 500)
+    _finish_request_metrics(response.status_code)
+    return response
+
+
+@app.after_request
+def _compress_response(response):
+    # 大响应按 Accept-Encoding 压缩（brotli/gzip），见 serialization.py
+    return compress_response(response, request.headers.get('Accept-Encoding', ''))
+
+
+@app.teardown_request
+def _track_request_teardown(exc):
+    # 正常情况下已在 after_request 中结束，这里只处理未生成响应的异常
+    if exc is not None:
+        worker_status.end(failed=True)
+        _finish_request_metrics(500)
+
+
 @app.route('/health', methods=['GET'])
 def health():
-    """健康检查"""
-    return jsonify({'status': 'ok', 'service': 'stock-data-service'})
+    """健康检查（包含处理该请求的工作进程的负载和延迟导入依赖的加载情况），不依赖任何重量级模块"""
+    return jsonify({'status': 'ok', 'service': 'stock-data-service', 'worker': worker_status.snapshot(),
+                    'dependencies': dependency_status()})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 文本格式的运行指标：各路由延迟、各上游函数延迟和失败数、重试次数、缓存命中率、进行中的请求数"""
+    if not metrics.METRICS_ENABLED:
+        return jsonify({'success': False, 'error': '指标采集未启用（METRICS_ENABLED=0）'}), 404
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """就绪检查：启动预热结束（或超时）后返回200，否则503；列出各预热数据集的状态和数据年龄"""
+    snapshot = warmup.snapshot()
+    return jsonify(snapshot), (200 if snapshot['ready'] else 503)
+
+@app.route('/api/upstream/health', methods=['GET'])
+def get_upstream_health():
+    """各AKShare数据源的近期成功率和耗时（用于备用数据源排序）、熔断状态、各主机并发占用和限速、当前交易时段及行业目录、股票代码主表状态"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'providers': provider_health.snapshot(),
+            'circuitBreakers': circuit_breakers.snapshot(),
+            'hosts': host_snapshot(),
+            'rateLimits': rate_limiters.snapshot(),
+            'marketSession': trading_calendar.status(),
+            'industryDirectory': industry_directory.status(),
+            'symbolMaster': symbol_master.status(),
+            'updateTime': datetime.now().isoformat()
+        }
+    })
+
+# 分时/盘口缓存：交易时段内 TRADE_CACHE_TTL 秒过期，闭市期间取得的数据一直用到下一个交易时段
+TRADE_CACHE_TTL = float(os.getenv('TRADE_CACHE_TTL', '5'))
+_TRADE_CACHE_MAX_ENTRIES = 2000
+_trade_cache = {}  # (代码, 'minute'/'bidAsk') -> (获取时间, 数据)
+_trade_cache_lock = threading.Lock()
+
+
+def _trade_cache_get(key):
+    with _trade_cache_lock:
+        entry = _trade_cache.get(key)
+    if entry is None or time.time() >= trading_calendar.expires_at(entry[0], TRADE_CACHE_TTL):
+        metrics.observe_cache(f'trade_{key[1]}', 'miss')
+        return None
+    metrics.observe_cache(f'trade_{key[1]}', 'hit')
+    return dict(entry[1], cached=True)
+
+
+def _trade_cache_put(key, value) -> None:
+    now = time.time()
+    with _trade_cache_lock:
+        if len(_trade_cache) >= _TRADE_CACHE_MAX_ENTRIES:
+            expired = [k for k, (fetched_at, _) in _trade_cache.items()
+                       if now >= trading_calendar.expires_at(fetched_at, TRADE_CACHE_TTL)]
+            for k in expired or list(_trade_cache)[:_TRADE_CACHE_MAX_ENTRIES // 10]:
+                _trade_cache.pop(k, None)
+        _trade_cache[key] = (now, value)
+
+
+def _convert_minute_df_to_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """分时数据统一为 time/open/high/low/close/volume 列（整列转换，不逐行构造字典）"""
+    raw_time = df['day'] if 'day' in df.columns else pd.Series(None, index=df.index, dtype=object)
+    parsed_time = pd.to_datetime(raw_time, errors='coerce')
+    # 无法解析的时间保留原始字符串，缺失的时间为空字符串
+    time_str = parsed_time.dt.strftime("%Y-%m-%d %H:%M:%S")
+    time_str = time_str.where(parsed_time.notna(), raw_time.astype(str)).where(raw_time.notna(), '')
+
+    frame = pd.DataFrame({'time': time_str})
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        if col in df.columns:
+            frame[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0).astype(float)
+        else:
+            frame[col] = 0.0
+    return frame.reset_index(drop=True)
+
+
+async def _load_trade_minute(clean_code: str, symbol: str) -> dict:
+    """分时成交数据（最近200条），成功结果写入交易数据缓存"""
+    cached = _trade_cache_get((clean_code, 'minute'))
+    if cached is not None:
+        return cached
+    try:
+        print(f"[{datetime.now()}] 获取分时成交数据...")
+        df_minute = await ak_call_async(ak.stock_zh_a_minute, symbol=symbol, period="1")
+        
+        if df_minute is None or df_minute.empty:
+            return {'success': False, 'error': '返回空数据'}
+        
+        # 转换为标准格式，只返回最近200条
+        minute_frame = _convert_minute_df_to_frame(df_minute.tail(200))
+        
+        block = {
+            'success': True,
+            'count': len(df_minute),
+            'records': FrameRecords(minute_frame)
+        }
+        _trade_cache_put((clean_code, 'minute'), block)
+        print(f"[{datetime.now()}] ✅ 分时数据获取成功: {len(df_minute)} 条")
+        return block
+    except Exception as e:
+        error_msg = str(e)
+        print(f"[{datetime.now()}] ⚠️ 分时数据获取失败: {error_msg}")
+        return {'success': False, 'error': error_msg}
+
+
+async def _load_trade_bid_ask(clean_code: str) -> dict:
+    """买卖盘口数据，成功结果写入交易数据缓存"""
+    cached = _trade_cache_get((clean_code, 'bidAsk'))
+    if cached is not None:
+        return cached
+    try:
+        print(f"[{datetime.now()}] 获取买卖盘口数据...")
+        df_bid_ask = await ak_call_async(ak.stock_bid_ask_em, symbol=clean_code)
+        
+        if df_bid_ask is None or df_bid_ask.empty:
+            return {'success': False, 'error': '返回空数据'}
+        
+        # 转换为标准格式
+        bid_ask_data = {}
+        for _, row in df_bid_ask.iterrows():
+            item = row.get('item', '')
+            value = row.get('value', 0)
+            if pd.notna(value):
+                bid_ask_data[item] = float(value)
+        
+        block = {
+            'success': True,
+            'data': bid_ask_data
+        }
+        _trade_cache_put((clean_code, 'bidAsk'), block)
+        print(f"[{datetime.now()}] ✅ 买卖盘口数据获取成功")
+        return block
+    except Exception as e:
+        error_msg = str(e)
+        print(f"[{datetime.now()}] ⚠️ 买卖盘口数据获取失败: {error_msg}")
+        return {'success': False, 'error': error_msg}
+
 
 @app.route('/api/stock/trade/<stock_code>', methods=['GET'])
-def get_trade_data(stock_code):
+async def get_trade_data(stock_code):
     """
     获取股票交易数据（分时成交、买卖盘口等）
     
+    分时（新浪）和盘口（东方财富）并发获取，各自受对应数据源的并发上限约束。
+    
     Args:
         stock_code: 股票代码
         data_type: 数据类型，可选值: 'minute'(分时), 'bid_ask'(买卖盘口), 'all'(全部)
     
     Returns:
-        JSON格式的交易数据
+        JSON格式的交易数据；命中缓存的部分带有 cached=true
     """
     try:
         data_type = request.args.get('data_type', 'all')  # 默认获取全部
@@ -142,82 +304,13 @@ def get_trade_data(stock_code):
             'data': {}
         }
         
-        # 1. 分时成交数据
+        loaders = {}
         if data_type in ['all', 'minute']:
-            try:
-                print(f"[{datetime.now()}] 获取分时成交数据...")
-                df_minute = ak.stock_zh_a_minute(symbol=symbol, period="1")
-                
-                if df_minute is not None and not df_minute.empty:
-                    # 转换为标准格式
-                    minute_data = []
-                    for _, row in df_minute.iterrows():
-                        # 处理时间字段，确保是datetime对象
-                        time_val = row.get('day', '')
-                        time_str = ''
-                        if pd.notna(time_val):
-                            if isinstance(time_val, str):
-                                try:
-                                    # 尝试将字符串转换为datetime
-                                    from datetime import datetime as dt
-                                    time_val = pd.to_datetime(time_val)
-                                except Exception:
-                                    # 如果转换失败，使用原始字符串
-                                    time_str = str(time_val)
-                            if not time_str:
-                                if hasattr(time_val, 'strftime'):
-                                    time_str = time_val.strftime("%Y-%m-%d %H:%M:%S")
-                                else:
-                                    time_str = str(time_val)
-                        
-                        minute_data.append({
-                            'time': time_str,
-                            'open': float(row.get('open', 0)) if pd.notna(row.get('open', 0)) else 0,
-                            'high': float(row.get('high', 0)) if pd.notna(row.get('high', 0)) else 0,
-                            'low': float(row.get('low', 0)) if pd.notna(row.get('low', 0)) else 0,
-                            'close': float(row.get('close', 0)) if pd.notna(row.get('close', 0)) else 0,
-                            'volume': float(row.get('volume', 0)) if pd.notna(row.get('volume', 0)) else 0
-                        })
-                    
-                    result['data']['minute'] = {
-                        'success': True,
-                        'count': len(minute_data),
-                        'records': minute_data[-200:] if len(minute_data) > 200 else minute_data  # 只返回最近200条
-                    }
-                    print(f"[{datetime.now()}] ✅ 分时数据获取成功: {len(minute_data)} 条")
-                else:
-                    result['data']['minute'] = {'success': False, 'error': '返回空数据'}
-            except Exception as e:
-                error_msg = str(e)
-                print(f"[{datetime.now()}] ⚠️ 分时数据获取失败: {error_msg}")
-                result['data']['minute'] = {'success': False, 'error': error_msg}
-        
-        # 2. 买卖盘口数据
+            loaders['minute'] = _load_trade_minute(clean_code, symbol)
         if data_type in ['all', 'bid_ask']:
-            try:
-                print(f"[{datetime.now()}] 获取买卖盘口数据...")
-                df_bid_ask = ak.stock_bid_ask_em(symbol=clean_code)
-                
-                if df_bid_ask is not None and not df_bid_ask.empty:
-                    # 转换为标准格式
-                    bid_ask_data = {}
-                    for _, row in df_bid_ask.iterrows():
-                        item = row.get('item', '')
-                        value = row.get('value', 0)
-                        if pd.notna(value):
-                            bid_ask_data[item] = float(value)
-                    
-                    result['data']['bidAsk'] = {
-                        'success': True,
-                        'data': bid_ask_data
-                    }
-                    print(f"[{datetime.now()}] ✅ 买卖盘口数据获取成功")
-                else:
-                    result['data']['bidAsk'] = {'success': False, 'error': '返回空数据'}
-            except Exception as e:
-                error_msg = str(e)
-                print(f"[{datetime.now()}] ⚠️ 买卖盘口数据获取失败: {error_msg}")
-                result['data']['bidAsk'] = {'success': False, 'error': error_msg}
+            loaders['bidAsk'] = _load_trade_bid_ask(clean_code)
+        blocks = await asyncio.gather(*loaders.values())
+        result['data'] = dict(zip(loaders.keys(), blocks))
         
         return jsonify({'success': True, 'data': result})
         
@@ -242,11 +335,85 @@ def _normalize_stock_code(stock_code: str) -> str:
     return clean_code.zfill(6)
 
 
-def _fetch_news_article_content(url: str) -> str:
-    """根据新闻链接抓取正文内容，返回纯文本"""
+# 相同参数已有后台重试任务时，请求线程等待它的最长时间（秒）；第一次尝试在请求线程内执行，失败即返回降级结果
+HANDLER_RETRY_WAIT = float(os.getenv('HANDLER_RETRY_WAIT', '8'))
+
+
+def _call_with_retry(func, description: str, policy: RetryPolicy, timeout: float = HANDLER_RETRY_WAIT,
+                     require_data: bool = True, wait_retries: bool = False, **kwargs):
+    """经重试调度器调用AKShare函数，require_data 为 True 时空数据也视为失败并重试。
+
+    默认第一次尝试在请求线程内执行：失败后立即抛出 RetryPending（FutureTimeoutError 的子类），由调用方返回降级结果，
+    退避等待和重试在调度器的事件循环上进行，不占用请求线程；后台线程（如SWR刷新）传 wait_retries=True
+    等待所有重试。相同参数的并发请求共享同一个重试任务，因此返回的是结果的副本。
+
+    Raises:
+        concurrent.futures.TimeoutError: timeout 内未拿到结果，或第一次尝试已失败（RetryPending）。
+        CircuitOpenError: 上游已熔断。
+        最后一次尝试的异常。
+    """
+    def attempt():
+        df = ak_call(func, **kwargs)
+        if require_data and (df is None or df.empty):
+            raise ValueError(f"{func.__name__} 返回数据为空")
+        return df
+
+    base_key = call_key(func, (), kwargs)
+    key = (base_key, require_data) if base_key is not None else None
+    result = retry_scheduler.call(attempt, description, policy, timeout=timeout, key=key, name=func.__name__,
+                                  wait_retries=wait_retries)
+    return result.copy() if result is not None else None
+
+
+def _extract_article_text(html: str) -> str:
+    """从新闻页面HTML中提取正文纯文本"""
+    soup = bs4.BeautifulSoup(html, "html.parser")
+
+    # 常见的正文容器选择器
+    selectors = [
+        "div#ContentBody",
+        "div#artibody",
+        "div.article-content",
+        "div.article-body",
+        "div#newsContent",
+        "div.article-infor",
+        "div.txtinfos",
+    ]
+
+    text_content = ""
+    for selector in selectors:
+        node = soup.select_one(selector)
+        if node:
+            paragraphs = [p.get_text(strip=True) for p in node.find_all(['p', 'div', 'span']) if p.get_text(strip=True)]
+            text_content = "\n".join(paragraphs)
+            if text_content:
+                break
+
+    if not text_content:
+        paragraphs = [p.get_text(strip=True) for p in soup.find_all('p') if p.get_text(strip=True)]
+        text_content = "\n".join(paragraphs)
+
+    if not text_content:
+        raw_text = soup.get_text(separator='\n')
+        lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
+        text_content = "\n".join(lines[:200])
+
+    return text_content.strip()
+
+
+def _fetch_news_article_content(url: str, session=None, timeout: float = 15) -> str:
+    """根据新闻链接抓取正文内容，返回纯文本
+
+    正文按URL缓存：校验期内直接返回缓存，过期后携带 ETag/Last-Modified 做条件请求。
+    传入 session 时复用其连接池。
+    """
     if not url:
         return ""
 
+    cached = article_cache.get(url)
+    if cached is not None and not cached.needs_revalidation:
+        return cached.content
+
     try:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -255,51 +422,83 @@ def _fetch_news_article_content(url: str) -> str:
             "Accept-Language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
             "Connection": "keep-alive",
         }
-
-        response = requests.get(url, headers=headers, timeout=15, verify=False)
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        response = (session or requests).get(url, headers=headers, timeout=timeout, verify=False)
+        if response.status_code == 304 and cached is not None:
+            article_cache.mark_validated(url)
+            return cached.content
         if response.status_code != 200:
             print(f"[{datetime.now()}] ⚠️ 抓取新闻正文失败，状态码: {response.status_code}, URL: {url}")
-            return ""
+            return cached.content if cached is not None else ""
 
         # 尝试使用页面自带编码，否则回退到apparent_encoding
         if not response.encoding or response.encoding.lower() in ("utf-8", "utf8", "" ):
             response.encoding = response.apparent_encoding or "utf-8"
 
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # 常见的正文容器选择器
-        selectors = [
-            "div#ContentBody",
-            "div#artibody",
-            "div.article-content",
-            "div.article-body",
-            "div#newsContent",
-            "div.article-infor",
-            "div.txtinfos",
-        ]
-
-        text_content = ""
-        for selector in selectors:
-            node = soup.select_one(selector)
-            if node:
-                paragraphs = [p.get_text(strip=True) for p in node.find_all(['p', 'div', 'span']) if p.get_text(strip=True)]
-                text_content = "\n".join(paragraphs)
-                if text_content:
-                    break
-
-        if not text_content:
-            paragraphs = [p.get_text(strip=True) for p in soup.find_all('p') if p.get_text(strip=True)]
-            text_content = "\n".join(paragraphs)
-
-        if not text_content:
-            raw_text = soup.get_text(separator='\n')
-            lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
-            text_content = "\n".join(lines[:200])
-
-        return text_content.strip()
+        text_content = _extract_article_text(response.text)
+        if text_content:
+            article_cache.put(url, text_content,
+                              etag=response.headers.get("ETag"),
+                              last_modified=response.headers.get("Last-Modified"))
+        return text_content
     except Exception as e:
         print(f"[{datetime.now()}] ⚠️ 抓取新闻正文发生异常: {e}. URL: {url}")
-        return ""
+        return cached.content if cached is not None else ""
+
+
+# 新闻正文并发抓取：线程数上限和整体截止时间（秒），超时的条目回退为摘要
+NEWS_FETCH_WORKERS = int(os.getenv('NEWS_FETCH_WORKERS', '8'))
+NEWS_FETCH_DEADLINE = float(os.getenv('NEWS_FETCH_DEADLINE', '8'))
+
+_news_executor = ThreadPoolExecutor(max_workers=NEWS_FETCH_WORKERS, thread_name_prefix='news-fetch')
+_news_session = None
+_news_session_lock = threading.Lock()
+
+
+def _get_news_session():
+    """新闻抓取共用的连接池会话（不做自动重试，避免超出整体截止时间）"""
+    global _news_session
+    if _news_session is None:
+        with _news_session_lock:
+            if _news_session is None:
+                _news_session = http_session.create_session(retries=0, pool_maxsize=NEWS_FETCH_WORKERS)
+    return _news_session
+
+
+def _fetch_news_articles_concurrently(urls, deadline: float = NEWS_FETCH_DEADLINE) -> dict:
+    """并发下载并解析多篇新闻正文，返回 {url: 正文}
+
+    总耗时不超过 deadline；届时仍未完成的URL不出现在结果中（由调用方回退为摘要），
+    已发出的请求会在后台继续完成并写入正文缓存，供下次请求使用。
+    """
+    unique_urls = list(dict.fromkeys(url for url in urls if url))
+    if not unique_urls:
+        return {}
+
+    session = _get_news_session()
+    per_request_timeout = max(1.0, min(15.0, deadline))
+    futures = {
+        _news_executor.submit(_fetch_news_article_content, url, session, per_request_timeout): url
+        for url in unique_urls
+    }
+    done, not_done = wait(futures, timeout=deadline)
+
+    contents = {}
+    for future in done:
+        try:
+            contents[futures[future]] = future.result()
+        except Exception as e:
+            print(f"[{datetime.now()}] ⚠️ 新闻正文抓取异常: {e}. URL: {futures[future]}")
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        print(f"[{datetime.now()}] ⚠️ {len(not_done)} 篇新闻正文在 {deadline:.1f}s 内未完成，使用摘要代替")
+    return contents
 
 
 @app.route('/api/news/stock/<stock_code>', methods=['GET'])
@@ -313,59 +512,33 @@ def get_stock_news(stock_code):
 
         print(f"[{datetime.now()}] 获取个股新闻: 输入={stock_code}, 标准化={clean_code}")
 
-        # 添加重试机制和错误处理
-        max_retries = 3
-        df_news = None
-        last_error = None
-        
-        for attempt in range(max_retries):
-            try:
-                df_news = ak.stock_news_em(symbol=clean_code)
-                break  # 成功获取数据，退出重试循环
-            except json.JSONDecodeError as json_err:
-                last_error = json_err
-                error_msg = str(json_err)
-                print(f"[{datetime.now()}] ⚠️ [尝试 {attempt + 1}/{max_retries}] AKShare stock_news_em JSON解析失败: {error_msg}")
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 2  # 递增等待时间：2秒、4秒、6秒
-                    print(f"[{datetime.now()}] 等待 {wait_time} 秒后重试...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"[{datetime.now()}] ❌ 所有重试均失败，返回空结果")
-                    # 最后一次重试失败，返回空结果而不是抛出异常
-                    return jsonify({
-                        'success': True,
-                        'data': {
-                            'stockCode': stock_code,
-                            'normalizedCode': clean_code,
-                            'count': 0,
-                            'fetchedAt': datetime.now().isoformat(),
-                            'items': [],
-                            'warning': '数据源暂时不可用，请稍后重试'
-                        }
-                    })
-            except Exception as e:
-                last_error = e
-                error_msg = str(e)
-                error_type = type(e).__name__
-                print(f"[{datetime.now()}] ⚠️ [尝试 {attempt + 1}/{max_retries}] AKShare stock_news_em 调用失败: {error_type}: {error_msg}")
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 2
-                    print(f"[{datetime.now()}] 等待 {wait_time} 秒后重试...")
-                    time.sleep(wait_time)
-                else:
-                    print(f"[{datetime.now()}] ❌ 所有重试均失败，返回空结果")
-                    return jsonify({
-                        'success': True,
-                        'data': {
-                            'stockCode': stock_code,
-                            'normalizedCode': clean_code,
-                            'count': 0,
-                            'fetchedAt': datetime.now().isoformat(),
-                            'items': [],
-                            'warning': f'获取新闻数据失败: {error_type}'
-                        }
-                    })
+        def empty_news_response(warning):
+            return jsonify({
+                'success': True,
+                'data': {
+                    'stockCode': stock_code,
+                    'normalizedCode': clean_code,
+                    'count': 0,
+                    'fetchedAt': datetime.now().isoformat(),
+                    'items': [],
+                    'warning': warning
+                }
+            })
+
+        # 失败后分别等待2秒、4秒再试，等待由重试调度器在后台完成
+        try:
+            df_news = _call_with_retry(ak.stock_news_em, "[新闻接口] stock_news_em",
+                                       RetryPolicy(retries=3, base_delay=2.0), require_data=False, symbol=clean_code)
+        except FutureTimeoutError:
+            print(f"[{datetime.now()}] ⚠️ [新闻接口] 未能立即获取到新闻，后台继续重试")
+            return empty_news_response('数据源响应较慢，正在后台重试，请稍后刷新')
+        except CircuitOpenError as circuit_err:
+            print(f"[{datetime.now()}] ⚠️ {circuit_err}，返回空结果")
+            return empty_news_response('数据源暂时不可用，请稍后重试')
+        except json.JSONDecodeError:
+            return empty_news_response('数据源暂时不可用，请稍后重试')
+        except Exception as e:
+            return empty_news_response(f'获取新闻数据失败: {type(e).__name__}')
 
         if df_news is None or df_news.empty:
             print(f"[{datetime.now()}] ⚠️ AKShare stock_news_em 返回空数据: {clean_code}")
@@ -381,6 +554,9 @@ def get_stock_news(stock_code):
             df_news = df_news.sort_values(by=df_news.columns[0], ascending=False)
 
         top_news = df_news.head(10)
+        article_contents = _fetch_news_articles_concurrently(
+            str(row.get('新闻链接', '') or '').strip() for _, row in top_news.iterrows()
+        )
 
         items = []
         for _, row in top_news.iterrows():
@@ -396,7 +572,7 @@ def get_stock_news(stock_code):
             else:
                 publish_time_str = str(publish_time) if publish_time is not None else ''
 
-            full_content = _fetch_news_article_content(url) if url else ''
+            full_content = article_contents.get(url, '') if url else ''
 
             items.append({
                 'keywords': keywords,
@@ -444,10 +620,10 @@ def test_history_api(stock_code):
         
         # 方法1
         try:
-            df1 = ak.stock_zh_a_hist_em(symbol=clean_code,
-                                      start_date=start_date.strftime("%Y%m%d"),
-                                      end_date=end_date.strftime("%Y%m%d"),
-                                      adjust="qfq")
+            df1 = ak_call(ak.stock_zh_a_hist_em, symbol=clean_code,
+                          start_date=start_date.strftime("%Y%m%d"),
+                          end_date=end_date.strftime("%Y%m%d"),
+                          adjust="qfq")
             results.append({
                 'method': 'stock_zh_a_hist_em (qfq)',
                 'success': df1 is not None and not df1.empty,
@@ -463,9 +639,9 @@ def test_history_api(stock_code):
         
         # 方法2
         try:
-            df2 = ak.stock_zh_a_hist_em(symbol=clean_code,
-                                      start_date=start_date.strftime("%Y%m%d"),
-                                      end_date=end_date.strftime("%Y%m%d"))
+            df2 = ak_call(ak.stock_zh_a_hist_em, symbol=clean_code,
+                          start_date=start_date.strftime("%Y%m%d"),
+                          end_date=end_date.strftime("%Y%m%d"))
             results.append({
                 'method': 'stock_zh_a_hist_em (no adjust)',
                 'success': df2 is not None and not df2.empty,
@@ -486,10 +662,10 @@ def test_history_api(stock_code):
             symbol = f"sz{clean_code}"
         
         try:
-            df3 = ak.stock_zh_a_hist(symbol=symbol, period="daily", 
-                                   start_date=start_date.strftime("%Y%m%d"),
-                                   end_date=end_date.strftime("%Y%m%d"),
-                                   adjust="qfq")
+            df3 = ak_call(ak.stock_zh_a_hist, symbol=symbol, period="daily",
+                          start_date=start_date.strftime("%Y%m%d"),
+                          end_date=end_date.strftime("%Y%m%d"),
+                          adjust="qfq")
             results.append({
                 'method': 'stock_zh_a_hist',
                 'success': df3 is not None and not df3.empty,
@@ -520,42 +696,49 @@ def test_history_api(stock_code):
             'trace': traceback.format_exc()
         }), 500
 
-@app.route('/api/stock/fundamental/<stock_code>', methods=['GET'])
-def get_fundamental(stock_code):
+def _load_fundamental(stock_code):
     """
-    获取股票基本面数据
+    获取股票基本面数据（单个接口和批量接口共用）
     
     Args:
         stock_code: 股票代码，如 000001, 600000
     
     Returns:
-        JSON格式的财务数据
+        (响应体dict, HTTP状态码)
     """
     try:
         print(f"[{datetime.now()}] 请求股票基本面数据: {stock_code}")
         
+        # 财务摘要只在新报告披露后变化，优先使用按披露日历过期的缓存
+        cached = fundamental_cache.get(stock_code.strip().zfill(6))
+        if cached is not None:
+            print(f"[{datetime.now()}] ✅ 命中基本面缓存: {stock_code} (报告期: {cached.get('reportDate')})")
+            return {'success': True, 'data': {**cached, 'stockCode': stock_code}}, 200
+        
         # 方法1: 使用stock_financial_abstract获取财务摘要（优先方法，稳定可用）
         try:
             clean_code = stock_code.strip().zfill(6)
             print(f"[{datetime.now()}] 方法1: 使用stock_financial_abstract，股票代码: {clean_code}")
             
             # 获取财务摘要数据（返回格式：行是指标，列是日期）
-            df = ak.stock_financial_abstract(symbol=clean_code)
+            df = ak_call(ak.stock_financial_abstract, symbol=clean_code)
             
             if df is None or df.empty:
                 print(f"[{datetime.now()}] ⚠️ 方法1: AKShare返回空数据")
                 raise ValueError(f"AKShare返回空数据，股票代码 {clean_code} 可能没有财务数据")
             
-            # 获取股票基本信息
-            try:
-                df_info = ak.stock_individual_info_em(symbol=clean_code)
-                stock_name = '未知'
-                if df_info is not None and not df_info.empty:
-                    name_row = df_info[df_info['item'] == '股票简称']
-                    if not name_row.empty:
-                        stock_name = name_row.iloc[0]['value']
-            except:
-                stock_name = '未知'
+            # 股票简称从本地代码主表获取，主表中没有时才查询股票基本信息
+            stock_name = symbol_master.name_of(clean_code)
+            if not stock_name:
+                try:
+                    df_info = ak_call(ak.stock_individual_info_em, symbol=clean_code)
+                    stock_name = '未知'
+                    if df_info is not None and not df_info.empty:
+                        name_row = df_info[df_info['item'] == '股票简称']
+                        if not name_row.empty:
+                            stock_name = name_row.iloc[0]['value']
+                except:
+                    stock_name = '未知'
             
             # 找到最新的报告期（第一列是'选项'，第二列是'指标'，后面是日期列）
             date_columns = [col for col in df.columns if col not in ['选项', '指标']]
@@ -633,7 +816,8 @@ def get_fundamental(stock_code):
                     pass
             
             print(f"[{datetime.now()}] ✅ 成功获取数据: {stock_code} ({stock_name})")
-            return jsonify({'success': True, 'data': result})
+            fundamental_cache.put(clean_code, result)
+            return {'success': True, 'data': result}, 200
         except Exception as e1:
             print(f"[{datetime.now()}] ⚠️ 方法1失败: {str(e1)}")
             print(f"[{datetime.now()}] 错误详情: {traceback.format_exc()}")
@@ -649,11 +833,11 @@ def get_fundamental(stock_code):
             try:
                 # 尝试新版本函数名
                 if hasattr(ak, 'stock_profit_em'):
-                    df_profit = ak.stock_profit_em(symbol=clean_code)
+                    df_profit = ak_call(ak.stock_profit_em, symbol=clean_code)
                 elif hasattr(ak, 'stock_lrb_em'):
-                    df_profit = ak.stock_lrb_em(symbol=clean_code)
+                    df_profit = ak_call(ak.stock_lrb_em, symbol=clean_code)
                 elif hasattr(ak, 'stock_profit_sheet_by_report_em'):
-                    df_profit = ak.stock_profit_sheet_by_report_em(symbol=clean_code)
+                    df_profit = ak_call(ak.stock_profit_sheet_by_report_em, symbol=clean_code)
             except Exception as e:
                 print(f"[{datetime.now()}] ⚠️ 方法2: 无法找到利润表函数: {str(e)}")
             
@@ -674,7 +858,7 @@ def get_fundamental(stock_code):
                 }
                 
                 print(f"[{datetime.now()}] ✅ 从利润表获取数据: {stock_code}")
-                return jsonify({'success': True, 'data': result})
+                return {'success': True, 'data': result}, 200
         except ValueError as e2:
             # 这是预期的错误（数据不可用），不需要详细堆栈
             print(f"[{datetime.now()}] ⚠️ 方法2失败: {str(e2)}")
@@ -692,11 +876,11 @@ def get_fundamental(stock_code):
             try:
                 # 尝试不同的资产负债表函数名
                 if hasattr(ak, 'stock_balance_sheet_by_report_em'):
-                    df_balance = ak.stock_balance_sheet_by_report_em(symbol=clean_code)
+                    df_balance = ak_call(ak.stock_balance_sheet_by_report_em, symbol=clean_code)
                 elif hasattr(ak, 'stock_zcfz_em'):
-                    df_balance = ak.stock_zcfz_em(symbol=clean_code)
+                    df_balance = ak_call(ak.stock_zcfz_em, symbol=clean_code)
                 elif hasattr(ak, 'stock_balance_sheet_em'):
-                    df_balance = ak.stock_balance_sheet_em(symbol=clean_code)
+                    df_balance = ak_call(ak.stock_balance_sheet_em, symbol=clean_code)
             except Exception as e:
                 print(f"[{datetime.now()}] ⚠️ 方法3: 无法找到资产负债表函数: {str(e)}")
             
@@ -716,7 +900,7 @@ def get_fundamental(stock_code):
                 }
                 
                 print(f"[{datetime.now()}] ✅ 从资产负债表获取部分数据: {stock_code}")
-                return jsonify({'success': True, 'data': result})
+                return {'success': True, 'data': result}, 200
         except ValueError as e3:
             # 这是预期的错误（数据不可用），不需要详细堆栈
             print(f"[{datetime.now()}] ⚠️ 方法3失败: {str(e3)}")
@@ -739,18 +923,32 @@ def get_fundamental(stock_code):
             'note': '这不是系统错误，而是AKShare数据源的限制。系统会自动回退到其他数据源。'
         }
         print(f"[{datetime.now()}] ❌ 所有方法都失败，返回404: {stock_code}")
-        return jsonify(error_response), 404
+        return error_response, 404
         
     except Exception as e:
         error_msg = str(e)
         error_trace = traceback.format_exc()
         print(f"[{datetime.now()}] ❌ 获取数据失败: {error_msg}")
         print(error_trace)
-        return jsonify({
+        return {
             'success': False,
             'error': error_msg,
             'trace': error_trace
-        }), 500
+        }, 500
+
+@app.route('/api/stock/fundamental/<stock_code>', methods=['GET'])
+def get_fundamental(stock_code):
+    """
+    获取股票基本面数据
+    
+    Args:
+        stock_code: 股票代码，如 000001, 600000
+    
+    Returns:
+        JSON格式的财务数据
+    """
+    payload, status = _load_fundamental(stock_code)
+    return jsonify(payload), status
 
 def _normalize_stock_identifier(stock_code: str):
     clean_code = stock_code.strip().zfill(6)
@@ -784,6 +982,36 @@ def _fetch_history_dataframe_with_fallback(stock_code: str, months: int, allow_e
     end_date = datetime.now()
     target_start_date = end_date - timedelta(days=months * 30)
 
+    # 本地日线存储已覆盖目标区间时，只增量同步尾部缺失的交易日，再从本地读取
+    try:
+        if bar_store.covers(symbol, target_start_date):
+            method = "local_bar_store"
+            if not bar_store.is_fresh(symbol, end_date):
+                added = sync_tail(symbol, now=end_date)
+                method = f"local_bar_store (+{added} 增量)"
+            df_local = bar_store.read(symbol, target_start_date, end_date)
+            if df_local is not None and not df_local.empty:
+                print(f"[{datetime.now()}] ✅ 命中本地日线存储: {symbol}, {len(df_local)} 条")
+                metrics.observe_cache('bar_store', 'hit')
+                return df_local, method, target_start_date, end_date
+    except Exception as exc:
+        print(f"[{datetime.now()}] ⚠️ 本地日线存储读取/增量同步失败，回退到全量拉取: {str(exc)}")
+
+    metrics.observe_cache('bar_store', 'miss')
+    return _fetch_history_dataframe_from_upstream(clean_code, symbol, months, allow_extended,
+                                                  target_start_date, end_date)
+
+
+def _store_history_dataframe(symbol: str, df_full: pd.DataFrame, coverage_start, source: str):
+    """把上游返回的日线写入本地存储，失败不影响本次请求"""
+    try:
+        bar_store.merge(symbol, df_full, coverage_start=coverage_start, source=source)
+    except Exception as exc:
+        print(f"[{datetime.now()}] ⚠️ 写入本地日线存储失败 {symbol}: {str(exc)}")
+
+
+def _fetch_history_dataframe_from_upstream(clean_code: str, symbol: str, months: int, allow_extended: bool,
+                                           target_start_date: datetime, end_date: datetime):
     adjust_options = ['qfq', 'hfq', '']
     months_candidates = [months]
     if allow_extended and months < 6:
@@ -794,142 +1022,144 @@ def _fetch_history_dataframe_with_fallback(stock_code: str, months: int, allow_e
         adjust_label = adjust_value if adjust_value else '无复权'
         print(f"[{datetime.now()}] 尝试{source}: {symbol}, 月数: {months_span}, 复权: {adjust_label}")
 
-    # 优先尝试 stock_zh_a_daily（一次性获取全量日线数据，再按时间过滤）
-    try:
-        print(f"[{datetime.now()}] 尝试 stock_zh_a_daily: {symbol}")
-        df_candidate = ak.stock_zh_a_daily(symbol=symbol)
-        if df_candidate is not None and not df_candidate.empty:
-            df_filtered, _ = _filter_dataframe_by_date_range(df_candidate, target_start_date, end_date)
-            if df_filtered is not None and not df_filtered.empty:
-                return df_filtered, "stock_zh_a_daily", target_start_date, end_date
+    def try_daily():
+        # stock_zh_a_daily（一次性获取全量日线数据，再按时间过滤）
+        try:
+            print(f"[{datetime.now()}] 尝试 stock_zh_a_daily: {symbol}")
+            df_candidate = ak_call(ak.stock_zh_a_daily, symbol=symbol)
+            if df_candidate is not None and not df_candidate.empty:
+                # 全量历史，从上市首日起完整覆盖
+                _store_history_dataframe(symbol, df_candidate, None, "stock_zh_a_daily")
+                df_filtered, _ = _filter_dataframe_by_date_range(df_candidate, target_start_date, end_date)
+                if df_filtered is not None and not df_filtered.empty:
+                    return df_filtered, "stock_zh_a_daily", target_start_date, end_date
+                else:
+                    print(f"[{datetime.now()}] stock_zh_a_daily 返回数据，但过滤后为空")
             else:
-                print(f"[{datetime.now()}] stock_zh_a_daily 返回数据，但过滤后为空")
-        else:
-            print(f"[{datetime.now()}] stock_zh_a_daily 返回空数据")
-    except Exception as exc:
-        print(f"[{datetime.now()}] ⚠️ stock_zh_a_daily 调用失败: {str(exc)}")
-        print(traceback.format_exc()[:500])
-
-    # 如果日线接口不可用或无数据，回退到 stock_zh_a_hist，涵盖前复权和后复权
-    for months_span in months_candidates:
-        attempt_start = end_date - timedelta(days=months_span * 30)
-        for adjust in adjust_options:
-            log_attempt("stock_zh_a_hist", months_span, adjust)
+                print(f"[{datetime.now()}] stock_zh_a_daily 返回空数据")
+        except Exception as exc:
+            print(f"[{datetime.now()}] ⚠️ stock_zh_a_daily 调用失败: {str(exc)}")
+            print(traceback.format_exc()[:500])
+        return None
+
+    def try_hist():
+        # stock_zh_a_hist，涵盖前复权和后复权
+        for months_span in months_candidates:
+            attempt_start = end_date - timedelta(days=months_span * 30)
+            for adjust in adjust_options:
+                log_attempt("stock_zh_a_hist", months_span, adjust)
+                try:
+                    df_candidate = ak_call(
+                        ak.stock_zh_a_hist,
+                        symbol=plain_code(symbol),
+                        period="daily",
+                        start_date=attempt_start.strftime("%Y%m%d"),
+                        end_date=end_date.strftime("%Y%m%d"),
+                        adjust=adjust or ""
+                    )
+                    if df_candidate is not None and not df_candidate.empty:
+                        # 本地存储只保存不复权日线（增量同步也按不复权拉取），复权结果只用于本次响应
+                        if not adjust:
+                            _store_history_dataframe(symbol, df_candidate, attempt_start, "stock_zh_a_hist")
+                        df_filtered, date_col = _filter_dataframe_by_date_range(df_candidate, target_start_date, end_date)
+                        if df_filtered is not None and not df_filtered.empty:
+                            method = f"stock_zh_a_hist ({months_span}个月, {adjust or '无复权'})"
+                            if months_span != months:
+                                method += " -> 过滤至目标区间"
+                            return df_filtered, method, target_start_date, end_date
+                        else:
+                            print(f"[{datetime.now()}] stock_zh_a_hist 返回数据，但过滤后为空 (复权: {adjust or '无复权'})")
+                except Exception as exc:
+                    print(f"[{datetime.now()}] ⚠️ stock_zh_a_hist 调用失败: {str(exc)}")
+                    print(traceback.format_exc()[:500])
+        return None
+
+    def try_hist_tx():
+        # 腾讯历史数据接口
+        months_for_tx = months_candidates if months_candidates else [months]
+        for months_span in months_for_tx:
+            attempt_start = end_date - timedelta(days=months_span * 30)
             try:
-                df_candidate = ak.stock_zh_a_hist(
+                print(f"[{datetime.now()}] 尝试 stock_zh_a_hist_tx: {symbol}, 月数: {months_span}")
+                df_candidate = ak_call(
+                    ak.stock_zh_a_hist_tx,
                     symbol=symbol,
-                    period="daily",
                     start_date=attempt_start.strftime("%Y%m%d"),
-                    end_date=end_date.strftime("%Y%m%d"),
-                    adjust=adjust or ""
+                    end_date=end_date.strftime("%Y%m%d")
                 )
                 if df_candidate is not None and not df_candidate.empty:
-                    df_filtered, date_col = _filter_dataframe_by_date_range(df_candidate, target_start_date, end_date)
+                    _store_history_dataframe(symbol, df_candidate, attempt_start, "stock_zh_a_hist_tx")
+                    df_filtered, _ = _filter_dataframe_by_date_range(df_candidate, target_start_date, end_date)
                     if df_filtered is not None and not df_filtered.empty:
-                        method = f"stock_zh_a_hist ({months_span}个月, {adjust or '无复权'})"
+                        method = f"stock_zh_a_hist_tx ({months_span}个月)"
                         if months_span != months:
                             method += " -> 过滤至目标区间"
                         return df_filtered, method, target_start_date, end_date
                     else:
-                        print(f"[{datetime.now()}] stock_zh_a_hist 返回数据，但过滤后为空 (复权: {adjust or '无复权'})")
+                        print(f"[{datetime.now()}] stock_zh_a_hist_tx 过滤后为空")
             except Exception as exc:
-                print(f"[{datetime.now()}] ⚠️ stock_zh_a_hist 调用失败: {str(exc)}")
+                print(f"[{datetime.now()}] ⚠️ stock_zh_a_hist_tx 调用失败: {str(exc)}")
                 print(traceback.format_exc()[:500])
+        return None
 
-    # 尝试腾讯历史数据接口
-    months_for_tx = months_candidates if months_candidates else [months]
-    for months_span in months_for_tx:
-        attempt_start = end_date - timedelta(days=months_span * 30)
-        try:
-            print(f"[{datetime.now()}] 尝试 stock_zh_a_hist_tx: {symbol}, 月数: {months_span}")
-            df_candidate = ak.stock_zh_a_hist_tx(
-                symbol=symbol,
-                start_date=attempt_start.strftime("%Y%m%d"),
-                end_date=end_date.strftime("%Y%m%d")
-            )
-            if df_candidate is not None and not df_candidate.empty:
-                df_filtered, _ = _filter_dataframe_by_date_range(df_candidate, target_start_date, end_date)
-                if df_filtered is not None and not df_filtered.empty:
-                    method = f"stock_zh_a_hist_tx ({months_span}个月)"
-                    if months_span != months:
-                        method += " -> 过滤至目标区间"
-                    return df_filtered, method, target_start_date, end_date
-                else:
-                    print(f"[{datetime.now()}] stock_zh_a_hist_tx 过滤后为空")
-        except Exception as exc:
-            print(f"[{datetime.now()}] ⚠️ stock_zh_a_hist_tx 调用失败: {str(exc)}")
-            print(traceback.format_exc()[:500])
+    # 默认顺序：stock_zh_a_daily -> stock_zh_a_hist -> stock_zh_a_hist_tx，按各数据源近期健康度动态调整
+    sources = {
+        'stock_zh_a_daily': try_daily,
+        'stock_zh_a_hist': try_hist,
+        'stock_zh_a_hist_tx': try_hist_tx,
+    }
+    for source_name in provider_health.order(sources):
+        result = sources[source_name]()
+        if result is not None:
+            return result
 
     raise ValueError(f"所有AKShare方法都失败，无法获取股票 {clean_code} 的历史数据")
 
 
-def _convert_history_df_to_records(df: pd.DataFrame):
-    records = []
-    if df is None or df.empty:
-        return records
-
-    for _, row in df.iterrows():
-        date_val = None
-        for col_name in ['日期', 'date', 'Date', '交易日期']:
-            if col_name in row.index and pd.notna(row[col_name]):
-                value = row[col_name]
-                if isinstance(value, str):
-                    date_val = value
-                elif hasattr(value, 'strftime'):
-                    date_val = value.strftime("%Y-%m-%d")
-                else:
-                    date_val = str(value)
-                break
-
-        if not date_val:
-            continue
-
-        def extract_float(columns, default=0.0):
-            for col in columns:
-                if col in row.index and pd.notna(row[col]):
-                    try:
-                        return float(row[col])
-                    except Exception:
-                        continue
-            return default
-
-        open_val = extract_float(['开盘', 'open', 'Open', '开盘价'])
-        close_val = extract_float(['收盘', 'close', 'Close', '收盘价'])
-        high_val = extract_float(['最高', 'high', 'High', '最高价'], default=close_val if close_val > 0 else 0.0)
-        low_val = extract_float(['最低', 'low', 'Low', '最低价'], default=close_val if close_val > 0 else 0.0)
-        volume_val = extract_float(['成交量', 'volume', 'Volume'])
-        turnover_val = extract_float(['成交额', 'amount', 'Amount', '成交金额', 'turnover'])
-
-        if close_val <= 0:
-            continue
-
-        records.append({
-            'tradeDate': date_val,
-            'open': open_val,
-            'close': close_val,
-            'high': high_val if high_val > 0 else close_val,
-            'low': low_val if low_val > 0 else close_val,
-            'volume': volume_val,
-            'turnover': turnover_val
-        })
+def _convert_history_df_to_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """把各数据源的日线统一为 tradeDate/open/close/high/low/volume/turnover 列，丢弃无日期或收盘价无效的行
 
-    return records
+    口径与本地日线存储一致（见 bar_store.normalize_bars）：成交量为股，成交额为元，不受数据来源影响。
+    """
+    columns = ['tradeDate', 'open', 'close', 'high', 'low', 'volume', 'turnover']
+    if df is None or df.empty:
+        return pd.DataFrame(columns=columns)
+    try:
+        bars = normalize_bars(df)
+    except ValueError:
+        return pd.DataFrame(columns=columns)
+
+    close = bars['close']
+    high = bars['high'].fillna(0.0)
+    low = bars['low'].fillna(0.0)
+    frame = pd.DataFrame({
+        'tradeDate': bars['date'].dt.strftime("%Y-%m-%d"),
+        'open': bars['open'].fillna(0.0),
+        'close': close,
+        'high': high.where(high > 0, close),
+        'low': low.where(low > 0, close),
+        'volume': bars['volume'].fillna(0.0),
+        'turnover': bars['turnover'].fillna(0.0)
+    }, columns=columns)
+    return frame.reset_index(drop=True)
 
 
 def _build_history_payload(stock_code: str, months: int, allow_extended: bool = True):
     df, method_used, start_date, end_date = _fetch_history_dataframe_with_fallback(stock_code, months, allow_extended)
-    records = _convert_history_df_to_records(df)
+    frame = _convert_history_df_to_frame(df)
 
-    if not records:
+    if frame.empty:
         raise ValueError("数据转换失败，无法解析AKShare返回的数据格式")
 
+    # data 序列化时按列整表编码；服务内部直接使用 data.frame
     return {
         'stockCode': stock_code,
         'startDate': start_date.strftime("%Y-%m-%d"),
         'endDate': end_date.strftime("%Y-%m-%d"),
-        'totalRecords': len(records),
+        'totalRecords': len(frame),
         'method': method_used,
-        'data': records
+        'units': dict(BAR_UNITS),
+        'data': FrameRecords(frame)
     }
 
 
@@ -1024,6 +1254,11 @@ def _generate_chart_highlights(df: pd.DataFrame):
         return None
 
 
+# 分析结果按版本（日线指纹）缓存，键即 ETag，不需要过期时间
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '256'))
+_analysis_cache = ResponseCache('analysis', max_entries=ANALYSIS_CACHE_MAX_ENTRIES)
+
+
 @app.route('/api/stock/analyze/<stock_code>', methods=['GET'])
 def analyze_stock_data(stock_code):
     """
@@ -1065,8 +1300,18 @@ def analyze_stock_data(stock_code):
                 'details': error_msg
             }), 500
         
-        # 转换为DataFrame进行分析
-        df = pd.DataFrame(history_records)
+        # 分析结果只取决于日线内容：以日线指纹为版本，未变化时返回 304 或直接复用上次的分析结果
+        etag = etag_for('analyze', stock_code, months, frame_fingerprint(history_records.frame))
+        unchanged = not_modified(etag)
+        if unchanged is not None:
+            return unchanged
+        cached_analysis = _analysis_cache.get(etag)
+        if cached_analysis is not None:
+            print(f"[{datetime.now()}] ✅ 日线未变化，复用分析结果: {stock_code}")
+            return with_etag(jsonify({'success': True, 'data': cached_analysis.value}), etag)
+        
+        # 历史数据已是DataFrame，复制一份进行分析
+        df = history_records.frame.copy()
         df['tradeDate'] = pd.to_datetime(df['tradeDate'])
         df = df.sort_values('tradeDate').reset_index(drop=True)
         
@@ -1092,6 +1337,8 @@ def analyze_stock_data(stock_code):
             'analysisDate': datetime.now().isoformat(),
             'period': f"{months}个月",
             'totalRecords': len(df),
+            # 成交量为股、成交额为元，与数据来源（本地存储或哪个上游接口）无关
+            'units': dict(BAR_UNITS),
             'indicators': {},
             'trends': {},
             'statistics': {},
@@ -1306,9 +1553,10 @@ def analyze_stock_data(stock_code):
             insights.append("股价波动较小，相对稳定")
         
         analysis_result['insights'] = insights
+        _analysis_cache.put(etag, analysis_result, etag)
         
         print(f"[{datetime.now()}] ✅ 完成数据分析: {stock_code}")
-        return jsonify({'success': True, 'data': analysis_result})
+        return with_etag(jsonify({'success': True, 'data': analysis_result}), etag)
         
     except Exception as e:
         error_msg = str(e)
@@ -1332,6 +1580,129 @@ def analyze_stock_data(stock_code):
         
         return jsonify(error_response), 500
 
+def _industry_market_data_from_row(row):
+    """从板块行情行提取市场数据，并生成行业趋势描述"""
+    latest_price = row.get('最新价', row.get('现价', None))
+    change_amount = row.get('涨跌额', None)
+    change_percent = row.get('涨跌幅', None)
+    total_market_cap = row.get('总市值', None)
+    turnover_rate = row.get('换手率', None)
+    rising_count = row.get('上涨家数', None)
+    falling_count = row.get('下跌家数', None)
+    leader_stock = row.get('领涨股票', row.get('领涨股', None))
+    leader_change_percent = row.get('领涨股票-涨跌幅', row.get('领涨股涨跌幅', None))
+    
+    market_data = {
+        'latestPrice': float(latest_price) if pd.notna(latest_price) else None,
+        'changeAmount': float(change_amount) if pd.notna(change_amount) else None,
+        'changePercent': float(change_percent) if pd.notna(change_percent) else None,
+        'totalMarketCap': float(total_market_cap) if pd.notna(total_market_cap) else None,
+        'turnoverRate': float(turnover_rate) if pd.notna(turnover_rate) else None,
+        'risingCount': int(rising_count) if pd.notna(rising_count) else None,
+        'fallingCount': int(falling_count) if pd.notna(falling_count) else None,
+        'leaderStock': str(leader_stock) if pd.notna(leader_stock) else None,
+        'leaderChangePercent': float(leader_change_percent) if pd.notna(leader_change_percent) else None
+    }
+    
+    # 构建行业趋势描述
+    trend_parts = []
+    if market_data.get('changePercent') is not None:
+        trend_parts.append(f"行业板块涨跌幅：{market_data['changePercent']:.2f}%")
+    if market_data.get('totalMarketCap') is not None:
+        market_cap_billion = market_data['totalMarketCap'] / 1000000000
+        trend_parts.append(f"总市值：{market_cap_billion:.2f}亿元")
+    if market_data.get('risingCount') is not None and market_data.get('fallingCount') is not None:
+        trend_parts.append(f"上涨家数：{market_data['risingCount']}，下跌家数：{market_data['fallingCount']}")
+    if market_data.get('leaderStock'):
+        leader_info = f"领涨股票：{market_data['leaderStock']}"
+        if market_data.get('leaderChangePercent') is not None:
+            leader_info += f"（涨跌幅：{market_data['leaderChangePercent']:.2f}%）"
+        trend_parts.append(leader_info)
+    
+    return market_data, "；".join(trend_parts)
+
+
+def _industry_constituent_quotes(board_code: str, limit: int = 20):
+    """板块成分股（最多 limit 只）及其最新价、涨跌幅
+
+    成分股列表来自行业目录缓存；价格优先取全市场实时行情快照，快照不可用时使用成分股缓存中的价格。
+    """
+    stocks = industry_directory.constituents(board_code)[:limit]
+    if not stocks:
+        return []
+    snapshot = get_spot_snapshot()
+    quotes = snapshot.bulk([s['code'] for s in stocks], ['price', 'changePercent']) if snapshot is not None else {}
+    
+    result = []
+    for stock in stocks:
+        quote = quotes.get(stock['code'], {})
+        price = quote.get('price', stock.get('price'))
+        change = quote.get('changePercent', stock.get('changePercent'))
+        if price is None or change is None:
+            continue
+        result.append({
+            'code': stock['code'],
+            'name': stock['name'],
+            'price': float(price),
+            'changePercent': float(change)
+        })
+    return result
+
+
+# 行业详情（板块实时行情 + 成分股价格）缓存：交易时段内 INDUSTRY_CACHE_TTL 秒，闭市期间用到下一个交易时段
+INDUSTRY_CACHE_TTL = float(os.getenv('INDUSTRY_CACHE_TTL', '30'))
+_industry_cache = ResponseCache('industry', ttl=INDUSTRY_CACHE_TTL, max_entries=2000, expiry=trading_calendar.expires_at)
+
+
+def _industry_from_individual_info(clean_code: str):
+    """从 stock_individual_info_em 的股票基本信息中取所属行业，只尝试2次，失败时返回 None。"""
+    try:
+        df_info = None
+        try:
+            df_info = _call_with_retry(ak.stock_individual_info_em, "[行业接口] stock_individual_info_em",
+                                       RetryPolicy(retries=2, base_delay=0.5), symbol=clean_code)
+        except FutureTimeoutError:
+            print(f"[{datetime.now()}] ⚠️ [行业接口] 获取股票信息超时")
+        except CircuitOpenError as e:
+            print(f"[{datetime.now()}] ⚠️ [行业接口] {e}")
+        except Exception as e:
+            print(f"[{datetime.now()}] ⚠️ [行业接口] 获取股票信息最终失败 ({type(e).__name__})")
+            print(f"  错误详情: {str(e)[:200]}")
+        if df_info is not None and not df_info.empty:
+            # 提取行业信息
+            industry_fields = ['所属行业', '行业', '行业分类', '板块']
+            for field in industry_fields:
+                industry_row = df_info[df_info['item'] == field]
+                if not industry_row.empty:
+                    industry_name = str(industry_row.iloc[0]['value']).strip()
+                    print(f"[{datetime.now()}] ✅ 从股票信息获取到行业: {industry_name}")
+                    return industry_name or None
+    except Exception as e:
+        print(f"[{datetime.now()}] ⚠️ [行业接口] 获取股票信息异常: {str(e)[:100]}")
+    return None
+
+
+def _resolve_industry_name(clean_code: str):
+    """股票所属行业名称。
+
+    优先查行业目录的反向索引，其次查股票代码主表（均为字典命中，无网络请求）；主表没有行业（如沪市股票）
+    或行业名称（如证监会行业分类）在行业目录中找不到对应板块时，才查询股票基本信息。
+    """
+    industry_name = industry_directory.industry_of(clean_code)
+    if industry_name:
+        print(f"[{datetime.now()}] ✅ 从行业目录获取到行业: {industry_name}")
+        return industry_name
+    symbol_record = symbol_master.get(clean_code)
+    master_industry = symbol_record.get('industry') if symbol_record is not None else None
+    if master_industry and industry_directory.resolve_board(master_industry):
+        print(f"[{datetime.now()}] ✅ 从股票代码主表获取到行业: {master_industry}")
+        return master_industry
+    if master_industry:
+        print(f"[{datetime.now()}] ⚠️ 股票代码主表的行业 {master_industry} 没有对应的行业板块，查询股票基本信息")
+    # 股票基本信息也没有时保留主表的行业名称
+    return _industry_from_individual_info(clean_code) or master_industry
+
+
 @app.route('/api/stock/industry/<stock_code>', methods=['GET'])
 def get_industry_info(stock_code):
     """
@@ -1343,423 +1714,108 @@ def get_industry_info(stock_code):
     Returns:
         JSON格式的行业数据
     """
-    # 在函数开始时保存原始代理设置（确保在异常处理中也能访问）
-    original_http_proxy = os.environ.get('HTTP_PROXY')
-    original_https_proxy = os.environ.get('HTTPS_PROXY')
-    original_http_proxy_lower = os.environ.get('http_proxy')
-    original_https_proxy_lower = os.environ.get('https_proxy')
-    
     try:
         print(f"[{datetime.now()}] 请求股票行业详情: {stock_code}")
         
         clean_code = stock_code.strip().zfill(6)
         
-        # 临时移除代理环境变量（在整个函数执行期间禁用代理，与测试脚本保持一致）
-        print(f"[{datetime.now()}] 🔧 [行业接口] 再次确认禁用代理设置...")
-        for proxy_var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']:
-            original_value = os.environ.get(proxy_var)
-            if original_value:
-                print(f"[{datetime.now()}]   - 移除代理: {proxy_var} = {original_value[:50]}...")
-            os.environ.pop(proxy_var, None)
+        # 短时间内的重复请求直接使用缓存的结果，客户端带着同一 ETag 时返回 304
+        cached = _industry_cache.get(stock_code)
+        if cached is not None:
+            unchanged = not_modified(cached.etag)
+            if unchanged is not None:
+                return unchanged
+            print(f"[{datetime.now()}] ✅ 使用缓存的行业信息: {stock_code}（缓存时长 {time.time() - cached.fetched_at:.1f}秒）")
+            return with_etag(jsonify({'success': True, 'data': cached.value}), cached.etag)
         
-        # 确保NO_PROXY设置正确
-        os.environ['NO_PROXY'] = '*'
-        os.environ['no_proxy'] = '*'
-        
-        # 先尝试从股票基本信息获取行业名称（可选步骤）
-        industry_name_from_info = None
-        try:
-            df_info = None
-            max_retries = 2  # 减少重试次数，因为如果失败我们可以用反向查找
-            for attempt in range(max_retries):
-                try:
-                    df_info = ak.stock_individual_info_em(symbol=clean_code)
-                    if df_info is not None and not df_info.empty:
-                        # 提取行业信息
-                        industry_fields = ['所属行业', '行业', '行业分类', '板块']
-                        for field in industry_fields:
-                            industry_row = df_info[df_info['item'] == field]
-                            if not industry_row.empty:
-                                industry_name_from_info = str(industry_row.iloc[0]['value']).strip()
-                                print(f"[{datetime.now()}] ✅ 从股票信息获取到行业: {industry_name_from_info}")
-                                break
-                        break
-                except Exception as e:
-                    error_type = type(e).__name__
-                    error_msg = str(e)
-                    if attempt < max_retries - 1:
-                        print(f"[{datetime.now()}] ⚠️ [行业接口] 获取股票信息失败 (尝试 {attempt + 1}/{max_retries}): {error_type} - {error_msg[:100]}，将使用反向查找...")
-                        time.sleep(0.5)
-                    else:
-                        print(f"[{datetime.now()}] ⚠️ [行业接口] 获取股票信息最终失败 ({error_type})，将使用反向查找")
-                        print(f"  错误详情: {error_msg[:200]}")
-        except Exception as e:
-            print(f"[{datetime.now()}] ⚠️ [行业接口] 获取股票信息异常: {str(e)[:100]}，将使用反向查找")
-        
-        # 注意：不在此处恢复代理，因为后续还需要调用AKShare函数获取行业板块数据
-        # 代理将在函数结束时统一恢复
+        industry_name_from_info = _resolve_industry_name(clean_code)
         
         # 初始化行业信息
         industry_name = industry_name_from_info if industry_name_from_info else '未知'
         industry_code = ''
         
-        # 使用 stock_board_industry_spot_em 根据行业名称获取行业板块实时行情
         industry_stocks = []
         industry_performance = {}
         industry_trends = ''
         industry_market_data = {}  # 行业板块市场数据（必须在此初始化，避免后续使用时变量未定义错误）
         
-        # 如果获取到了行业名称，使用 stock_board_industry_spot_em 获取实时行情
         if industry_name and industry_name != '未知':
             try:
-                # 临时移除代理环境变量（再次确保，与测试脚本保持一致）
-                print(f"[{datetime.now()}] 🔧 [行业接口] 禁用代理设置...")
-                for proxy_var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']:
-                    original_value = os.environ.get(proxy_var)
-                    if original_value:
-                        print(f"[{datetime.now()}]   - 移除代理: {proxy_var} = {original_value[:50]}...")
-                    os.environ.pop(proxy_var, None)
-                
-                # 确保NO_PROXY设置正确（禁止所有代理）
-                os.environ['NO_PROXY'] = '*'
-                os.environ['no_proxy'] = '*'
-                print(f"[{datetime.now()}] ✅ [行业接口] 代理已禁用，NO_PROXY=*")
-                
-                # 在调用AKShare之前，再次确保禁用代理
-                import urllib3
-                urllib3.disable_warnings()
+                # 板块代码从行业目录中查找（先精确匹配，再包含匹配）
+                board = industry_directory.resolve_board(industry_name)
+                if board:
+                    industry_name, industry_code = board['name'], board['code']
                 
-                # 使用 stock_board_industry_spot_em 获取行业板块实时行情（带重试）
+                # 只有板块实时行情需要访问网络
                 df_industry_spot = None
-                for attempt in range(3):
-                    try:
-                        # 每次重试前增加延迟，避免请求过快
-                        if attempt > 0:
-                            delay = 1.0 * attempt  # 第2次重试延迟1秒，第3次延迟2秒
-                            print(f"[{datetime.now()}] ⏳ [行业接口] 等待{delay:.1f}秒后重试...")
-                            time.sleep(delay)
-                        
-                        print(f"[{datetime.now()}] 📡 [行业接口] 尝试调用 stock_board_industry_spot_em(symbol='{industry_name}') (尝试 {attempt + 1}/3)...")
-                        start_time = time.time()
-                        
-                        # 调用AKShare接口获取行业板块实时行情
-                        df_industry_spot = ak.stock_board_industry_spot_em(symbol=industry_name)
-                        elapsed_time = time.time() - start_time
-                        
-                        if df_industry_spot is not None and not df_industry_spot.empty:
-                            print(f"[{datetime.now()}] ✅ [行业接口] 成功获取行业板块实时行情，耗时: {elapsed_time:.2f}秒")
-                            break
-                        else:
-                            print(f"[{datetime.now()}] ⚠️ [行业接口] 返回数据为空")
-                            time.sleep(0.5)
-                    except Exception as e:
-                        error_type = type(e).__name__
-                        error_msg = str(e)
-                        elapsed_time = time.time() - start_time if 'start_time' in locals() else 0
-                        
-                        print(f"[{datetime.now()}] ❌ [行业接口] 获取行业板块实时行情失败 (尝试 {attempt + 1}/3)")
-                        print(f"    错误类型: {error_type}")
-                        print(f"    错误消息: {error_msg[:200]}")
-                        print(f"    耗时: {elapsed_time:.2f}秒")
-                        
-                        if attempt < 2:
-                            time.sleep(1)
-                        else:
-                            print(f"[{datetime.now()}] ❌ [行业接口] 获取行业板块实时行情最终失败")
-                            df_industry_spot = None
-                            break
+                print(f"[{datetime.now()}] 📡 [行业接口] 调用 stock_board_industry_spot_em(symbol='{industry_name}')...")
+                start_time = time.time()
+                try:
+                    # 失败后分别等待1秒、2秒再试
+                    df_industry_spot = _call_with_retry(ak.stock_board_industry_spot_em,
+                                                        "[行业接口] stock_board_industry_spot_em",
+                                                        RetryPolicy(retries=3, base_delay=1.0), symbol=industry_name)
+                    print(f"[{datetime.now()}] ✅ [行业接口] 成功获取行业板块实时行情，耗时: {time.time() - start_time:.2f}秒")
+                except FutureTimeoutError:
+                    print(f"[{datetime.now()}] ⚠️ [行业接口] 未能立即获取行业板块实时行情，后台继续重试")
+                except CircuitOpenError as e:
+                    print(f"[{datetime.now()}] ⚠️ [行业接口] {e}")
+                except Exception as e:
+                    print(f"[{datetime.now()}] ❌ [行业接口] 获取行业板块实时行情最终失败")
+                    print(f"    错误类型: {type(e).__name__}")
+                    print(f"    错误消息: {str(e)[:200]}")
+                    print(f"    耗时: {time.time() - start_time:.2f}秒")
                 
-                # 如果成功获取到行业板块实时行情数据，解析数据
+                matched_row = None
                 if df_industry_spot is not None and not df_industry_spot.empty:
+                    # stock_board_industry_spot_em 返回的是行业板块的实时行情数据
+                    matched_row = df_industry_spot.iloc[0]
+                    if not industry_code and '板块代码' in df_industry_spot.columns:
+                        industry_code = str(matched_row.get('板块代码', '')).strip()
+                else:
+                    # 实时行情获取不到时，使用行业目录缓存的板块列表行情（stock_board_industry_name_em），
+                    # 不在请求线程中拉取；缓存过期时目录在后台刷新，每个周期最多一次
+                    print(f"[{datetime.now()}] ⚠️ 无法获取行业板块实时行情数据，回退到缓存的板块列表行情")
+                    matched_row = industry_directory.board_quote(industry_name)
+                    if matched_row is None:
+                        print(f"[{datetime.now()}] ⚠️ [行业接口-回退] 暂无该行业的板块行情缓存: {industry_name}")
+                    elif not industry_code:
+                        industry_code = str(matched_row.get('板块代码', '')).strip()
+                
+                if matched_row is not None:
                     try:
-                        # stock_board_industry_spot_em 返回的是行业板块的实时行情数据
-                        # 通常包含：板块名称、板块代码、最新价、涨跌幅、涨跌额、总市值、换手率、上涨家数、下跌家数、领涨股票等信息
-                        
-                        # 提取行业板块代码（如果存在）
-                        if '板块代码' in df_industry_spot.columns:
-                            industry_code = str(df_industry_spot.iloc[0].get('板块代码', '')).strip()
-                        
-                        # 提取行业板块的实时行情数据
-                        matched_row = df_industry_spot.iloc[0]
-                        
-                        # 提取行业板块的市场数据
-                        latest_price = matched_row.get('最新价', matched_row.get('现价', None))
-                        change_amount = matched_row.get('涨跌额', None)
-                        change_percent = matched_row.get('涨跌幅', None)
-                        total_market_cap = matched_row.get('总市值', None)
-                        turnover_rate = matched_row.get('换手率', None)
-                        rising_count = matched_row.get('上涨家数', None)
-                        falling_count = matched_row.get('下跌家数', None)
-                        leader_stock = matched_row.get('领涨股票', matched_row.get('领涨股', None))
-                        leader_change_percent = matched_row.get('领涨股票-涨跌幅', matched_row.get('领涨股涨跌幅', None))
-                        
-                        industry_market_data = {
-                            'latestPrice': float(latest_price) if pd.notna(latest_price) else None,
-                            'changeAmount': float(change_amount) if pd.notna(change_amount) else None,
-                            'changePercent': float(change_percent) if pd.notna(change_percent) else None,
-                            'totalMarketCap': float(total_market_cap) if pd.notna(total_market_cap) else None,
-                            'turnoverRate': float(turnover_rate) if pd.notna(turnover_rate) else None,
-                            'risingCount': int(rising_count) if pd.notna(rising_count) else None,
-                            'fallingCount': int(falling_count) if pd.notna(falling_count) else None,
-                            'leaderStock': str(leader_stock) if pd.notna(leader_stock) else None,
-                            'leaderChangePercent': float(leader_change_percent) if pd.notna(leader_change_percent) else None
-                        }
-                        
-                        # 构建行业趋势描述
-                        trend_parts = []
-                        if industry_market_data.get('changePercent') is not None:
-                            trend_parts.append(f"行业板块涨跌幅：{industry_market_data['changePercent']:.2f}%")
-                        if industry_market_data.get('totalMarketCap') is not None:
-                            market_cap_billion = industry_market_data['totalMarketCap'] / 1000000000
-                            trend_parts.append(f"总市值：{market_cap_billion:.2f}亿元")
-                        if industry_market_data.get('risingCount') is not None and industry_market_data.get('fallingCount') is not None:
-                            trend_parts.append(f"上涨家数：{industry_market_data['risingCount']}，下跌家数：{industry_market_data['fallingCount']}")
-                        if industry_market_data.get('leaderStock'):
-                            leader_info = f"领涨股票：{industry_market_data['leaderStock']}"
-                            if industry_market_data.get('leaderChangePercent') is not None:
-                                leader_info += f"（涨跌幅：{industry_market_data['leaderChangePercent']:.2f}%）"
-                            trend_parts.append(leader_info)
-                        
-                        if trend_parts:
-                            industry_trends = "；".join(trend_parts)
-                        
-                        print(f"[{datetime.now()}] ✅ 成功提取行业板块实时行情数据: {industry_name}")
-                        
-                        # 如果获取到了行业代码，可以获取行业成分股
-                        if industry_code:
-                            try:
-                                # 获取行业成分股（带重试和延迟）
-                                df_industry_stocks = None
-                                for retry in range(3):
-                                    try:
-                                        time.sleep(0.3)  # 添加延迟
-                                        df_industry_stocks = ak.stock_board_industry_cons_em(symbol=industry_code)
-                                        if df_industry_stocks is not None and not df_industry_stocks.empty:
-                                            break
-                                    except Exception as e:
-                                        if retry < 2:
-                                            print(f"[{datetime.now()}] ⚠️ 获取行业成分股失败 (尝试 {retry + 1}/3): {str(e)[:80]}，重试中...")
-                                            time.sleep(1)
-                                        else:
-                                            raise
-                                if df_industry_stocks is not None and not df_industry_stocks.empty:
-                                    # 转换成分股列表
-                                    for idx, row in df_industry_stocks.head(20).iterrows():  # 最多20只
-                                        stock_code_industry = str(row.get('代码', '')).zfill(6)
-                                        stock_name_industry = str(row.get('名称', ''))
-                                        stock_price = row.get('最新价', 0)
-                                        stock_change = row.get('涨跌幅', 0)
-                                        
-                                        if pd.notna(stock_price) and pd.notna(stock_change):
-                                            industry_stocks.append({
-                                                'code': stock_code_industry,
-                                                'name': stock_name_industry,
-                                                'price': float(stock_price) if pd.notna(stock_price) else 0,
-                                                'changePercent': float(stock_change) if pd.notna(stock_change) else 0
-                                            })
-                                    
-                                    # 计算行业平均表现指标
-                                    if len(industry_stocks) > 0:
-                                        prices = [s['price'] for s in industry_stocks if s['price'] > 0]
-                                        changes = [s['changePercent'] for s in industry_stocks if s['changePercent'] != 0]
-                                        
-                                        if prices and changes:
-                                            industry_performance = {
-                                                'avgPE': None,  # PE需要从个股数据中计算，暂时不提供
-                                                'avgPB': None,  # PB需要从个股数据中计算，暂时不提供
-                                                'avgROE': None,  # ROE需要从财务数据中获取，暂时不提供
-                                                'totalMarketCap': None,  # 总市值需要计算所有个股市值，暂时不提供
-                                                'avgChangePercent': round(sum(changes) / len(changes), 2) if changes else 0,
-                                                'stockCount': len(industry_stocks),  # 额外字段，股票数量
-                                                'avgPrice': round(sum(prices) / len(prices), 2) if prices else 0  # 额外字段，平均价格
-                                            }
-                                    
-                                    print(f"[{datetime.now()}] ✅ 成功获取行业成分股: {industry_name} ({industry_code})，共{len(industry_stocks)}只股票")
-                            except Exception as e:
-                                print(f"[{datetime.now()}] ⚠️ 获取行业成分股失败: {str(e)}")
+                        industry_market_data, industry_trends = _industry_market_data_from_row(matched_row)
+                        print(f"[{datetime.now()}] ✅ 成功提取行业板块行情数据: {industry_name}")
                     except Exception as e:
-                        print(f"[{datetime.now()}] ⚠️ 解析行业板块实时行情数据失败: {str(e)}")
-                else:
-                    # 如果 stock_board_industry_spot_em 获取不到数据，回退到使用 stock_board_industry_name_em
-                    print(f"[{datetime.now()}] ⚠️ 无法获取行业板块实时行情数据，回退到使用 stock_board_industry_name_em")
-                    
+                        print(f"[{datetime.now()}] ⚠️ 解析行业板块行情数据失败: {str(e)}")
+                
+                # 成分股来自行业目录缓存，价格来自全市场实时行情快照
+                if industry_code:
                     try:
-                        # 获取所有行业板块列表（带重试）
-                        df_industry_board = None
-                        for attempt in range(3):
-                            try:
-                                if attempt > 0:
-                                    delay = 1.0 * attempt
-                                    print(f"[{datetime.now()}] ⏳ [行业接口-回退] 等待{delay:.1f}秒后重试...")
-                                    time.sleep(delay)
-                                
-                                print(f"[{datetime.now()}] 📡 [行业接口-回退] 尝试调用 stock_board_industry_name_em() (尝试 {attempt + 1}/3)...")
-                                start_time = time.time()
-                                
-                                df_industry_board = ak.stock_board_industry_name_em()
-                                elapsed_time = time.time() - start_time
-                                
-                                if df_industry_board is not None and not df_industry_board.empty:
-                                    print(f"[{datetime.now()}] ✅ [行业接口-回退] 成功获取行业板块列表，耗时: {elapsed_time:.2f}秒，共{len(df_industry_board)}个行业")
-                                    break
-                                else:
-                                    print(f"[{datetime.now()}] ⚠️ [行业接口-回退] 返回数据为空")
-                                    time.sleep(0.5)
-                            except Exception as e:
-                                error_type = type(e).__name__
-                                error_msg = str(e)
-                                elapsed_time = time.time() - start_time if 'start_time' in locals() else 0
-                                
-                                print(f"[{datetime.now()}] ❌ [行业接口-回退] 获取行业板块列表失败 (尝试 {attempt + 1}/3)")
-                                print(f"    错误类型: {error_type}")
-                                print(f"    错误消息: {error_msg[:200]}")
-                                print(f"    耗时: {elapsed_time:.2f}秒")
-                                
-                                if attempt < 2:
-                                    time.sleep(1)
-                                else:
-                                    print(f"[{datetime.now()}] ❌ [行业接口-回退] 获取行业板块列表最终失败")
-                                    df_industry_board = None
-                                    break
-                        
-                        # 如果成功获取到行业板块列表，查找匹配的行业
-                        if df_industry_board is not None and not df_industry_board.empty:
-                            matched_industry = None
-                            
-                            # 先尝试精确匹配
-                            if industry_name and industry_name != '未知':
-                                matched_industry = df_industry_board[df_industry_board['板块名称'] == industry_name]
+                        industry_stocks = _industry_constituent_quotes(industry_code)
+                        if industry_stocks:
+                            prices = [s['price'] for s in industry_stocks if s['price'] > 0]
+                            changes = [s['changePercent'] for s in industry_stocks if s['changePercent'] != 0]
                             
-                            # 如果精确匹配失败，尝试包含匹配
-                            if (matched_industry is None or matched_industry.empty) and industry_name and industry_name != '未知':
-                                matched_industry = df_industry_board[df_industry_board['板块名称'].str.contains(industry_name, na=False)]
-                            
-                            if matched_industry is not None and not matched_industry.empty:
-                                matched_row = matched_industry.iloc[0]
-                                industry_code = matched_row.get('板块代码', '')
-                                if not industry_name or industry_name == '未知':
-                                    industry_name = matched_row.get('板块名称', '未知')
-                                
-                                # 提取行业板块的市场数据
-                                try:
-                                    latest_price = matched_row.get('最新价', None)
-                                    change_amount = matched_row.get('涨跌额', None)
-                                    change_percent = matched_row.get('涨跌幅', None)
-                                    total_market_cap = matched_row.get('总市值', None)
-                                    turnover_rate = matched_row.get('换手率', None)
-                                    rising_count = matched_row.get('上涨家数', None)
-                                    falling_count = matched_row.get('下跌家数', None)
-                                    leader_stock = matched_row.get('领涨股票', None)
-                                    leader_change_percent = matched_row.get('领涨股票-涨跌幅', None)
-                                    
-                                    industry_market_data = {
-                                        'latestPrice': float(latest_price) if pd.notna(latest_price) else None,
-                                        'changeAmount': float(change_amount) if pd.notna(change_amount) else None,
-                                        'changePercent': float(change_percent) if pd.notna(change_percent) else None,
-                                        'totalMarketCap': float(total_market_cap) if pd.notna(total_market_cap) else None,
-                                        'turnoverRate': float(turnover_rate) if pd.notna(turnover_rate) else None,
-                                        'risingCount': int(rising_count) if pd.notna(rising_count) else None,
-                                        'fallingCount': int(falling_count) if pd.notna(falling_count) else None,
-                                        'leaderStock': str(leader_stock) if pd.notna(leader_stock) else None,
-                                        'leaderChangePercent': float(leader_change_percent) if pd.notna(leader_change_percent) else None
-                                    }
-                                    
-                                    # 构建行业趋势描述
-                                    trend_parts = []
-                                    if industry_market_data.get('changePercent') is not None:
-                                        trend_parts.append(f"行业板块涨跌幅：{industry_market_data['changePercent']:.2f}%")
-                                    if industry_market_data.get('totalMarketCap') is not None:
-                                        market_cap_billion = industry_market_data['totalMarketCap'] / 1000000000
-                                        trend_parts.append(f"总市值：{market_cap_billion:.2f}亿元")
-                                    if industry_market_data.get('risingCount') is not None and industry_market_data.get('fallingCount') is not None:
-                                        trend_parts.append(f"上涨家数：{industry_market_data['risingCount']}，下跌家数：{industry_market_data['fallingCount']}")
-                                    if industry_market_data.get('leaderStock'):
-                                        leader_info = f"领涨股票：{industry_market_data['leaderStock']}"
-                                        if industry_market_data.get('leaderChangePercent') is not None:
-                                            leader_info += f"（涨跌幅：{industry_market_data['leaderChangePercent']:.2f}%）"
-                                        trend_parts.append(leader_info)
-                                    
-                                    if trend_parts:
-                                        industry_trends = "；".join(trend_parts)
-                                    
-                                    print(f"[{datetime.now()}] ✅ [行业接口-回退] 成功提取行业板块数据: {industry_name}")
-                                except Exception as e:
-                                    print(f"[{datetime.now()}] ⚠️ [行业接口-回退] 提取行业板块市场数据失败: {str(e)}")
-                                
-                                # 如果获取到了行业代码，可以获取行业成分股
-                                if industry_code:
-                                    try:
-                                        # 获取行业成分股（带重试和延迟）
-                                        df_industry_stocks = None
-                                        for retry in range(3):
-                                            try:
-                                                time.sleep(0.3)  # 添加延迟
-                                                df_industry_stocks = ak.stock_board_industry_cons_em(symbol=industry_code)
-                                                if df_industry_stocks is not None and not df_industry_stocks.empty:
-                                                    break
-                                            except Exception as e:
-                                                if retry < 2:
-                                                    print(f"[{datetime.now()}] ⚠️ [行业接口-回退] 获取行业成分股失败 (尝试 {retry + 1}/3): {str(e)[:80]}，重试中...")
-                                                    time.sleep(1)
-                                                else:
-                                                    raise
-                                        if df_industry_stocks is not None and not df_industry_stocks.empty:
-                                            # 转换成分股列表
-                                            for idx, row in df_industry_stocks.head(20).iterrows():  # 最多20只
-                                                stock_code_industry = str(row.get('代码', '')).zfill(6)
-                                                stock_name_industry = str(row.get('名称', ''))
-                                                stock_price = row.get('最新价', 0)
-                                                stock_change = row.get('涨跌幅', 0)
-                                                
-                                                if pd.notna(stock_price) and pd.notna(stock_change):
-                                                    industry_stocks.append({
-                                                        'code': stock_code_industry,
-                                                        'name': stock_name_industry,
-                                                        'price': float(stock_price) if pd.notna(stock_price) else 0,
-                                                        'changePercent': float(stock_change) if pd.notna(stock_change) else 0
-                                                    })
-                                            
-                                            # 计算行业平均表现指标
-                                            if len(industry_stocks) > 0:
-                                                prices = [s['price'] for s in industry_stocks if s['price'] > 0]
-                                                changes = [s['changePercent'] for s in industry_stocks if s['changePercent'] != 0]
-                                                
-                                                if prices and changes:
-                                                    industry_performance = {
-                                                        'avgPE': None,
-                                                        'avgPB': None,
-                                                        'avgROE': None,
-                                                        'totalMarketCap': None,
-                                                        'avgChangePercent': round(sum(changes) / len(changes), 2) if changes else 0,
-                                                        'stockCount': len(industry_stocks),
-                                                        'avgPrice': round(sum(prices) / len(prices), 2) if prices else 0
-                                                    }
-                                            
-                                            print(f"[{datetime.now()}] ✅ [行业接口-回退] 成功获取行业成分股: {industry_name} ({industry_code})，共{len(industry_stocks)}只股票")
-                                    except Exception as e:
-                                        print(f"[{datetime.now()}] ⚠️ [行业接口-回退] 获取行业成分股失败: {str(e)}")
-                            else:
-                                print(f"[{datetime.now()}] ⚠️ [行业接口-回退] 未找到匹配的行业: {industry_name}")
+                            if prices and changes:
+                                industry_performance = {
+                                    'avgPE': None,  # PE需要从个股数据中计算，暂时不提供
+                                    'avgPB': None,  # PB需要从个股数据中计算，暂时不提供
+                                    'avgROE': None,  # ROE需要从财务数据中获取，暂时不提供
+                                    'totalMarketCap': None,  # 总市值需要计算所有个股市值，暂时不提供
+                                    'avgChangePercent': round(sum(changes) / len(changes), 2) if changes else 0,
+                                    'stockCount': len(industry_stocks),  # 额外字段，股票数量
+                                    'avgPrice': round(sum(prices) / len(prices), 2) if prices else 0  # 额外字段，平均价格
+                                }
+                        print(f"[{datetime.now()}] ✅ 成功获取行业成分股: {industry_name} ({industry_code})，共{len(industry_stocks)}只股票")
                     except Exception as e:
-                        error_type = type(e).__name__
-                        error_msg = str(e)
-                        print(f"[{datetime.now()}] ⚠️ [行业接口-回退] 回退逻辑执行异常: {error_type}")
-                        print(f"  错误消息: {error_msg[:300]}")
-                        try:
-                            import traceback
-                            print(f"  完整堆栈: {traceback.format_exc()[:500]}")
-                        except:
-                            pass
+                        print(f"[{datetime.now()}] ⚠️ 获取行业成分股失败: {str(e)}")
             except Exception as e:
                 error_type = type(e).__name__
                 error_msg = str(e)
-                print(f"[{datetime.now()}] ⚠️ [行业接口] 获取行业板块实时行情异常: {error_type}")
+                print(f"[{datetime.now()}] ⚠️ [行业接口] 获取行业板块数据异常: {error_type}")
                 print(f"  错误消息: {error_msg[:300]}")
-                try:
-                    import traceback
-                    print(f"  完整堆栈: {traceback.format_exc()[:500]}")
-                except:
-                    pass
+                print(f"  完整堆栈: {traceback.format_exc()[:500]}")
                 # 不抛出异常，继续执行
         
         # 构建返回结果（确保字段名与后端期望一致）
@@ -1778,17 +1834,15 @@ def get_industry_info(stock_code):
         
         print(f"[{datetime.now()}] ✅ 成功获取行业信息: {stock_code} - {industry_name} (代码: {industry_code}, 股票数: {len(industry_stocks)})")
         
-        # 恢复原始代理设置（如果有）
-        if original_http_proxy:
-            os.environ['HTTP_PROXY'] = original_http_proxy
-        if original_https_proxy:
-            os.environ['HTTPS_PROXY'] = original_https_proxy
-        if original_http_proxy_lower:
-            os.environ['http_proxy'] = original_http_proxy_lower
-        if original_https_proxy_lower:
-            os.environ['https_proxy'] = original_https_proxy_lower
-        
-        return jsonify({'success': True, 'data': result})
+        # ETag 取结果内容（不含 lastUpdate）的哈希：缓存过期后重新获取、但行情没有变化时仍可返回 304；
+        # 板块行情没有取到的降级结果不缓存，下一次请求重新获取
+        etag = etag_for('industry', dumps({k: v for k, v in result.items() if k != 'lastUpdate'}))
+        if industry_market_data:
+            _industry_cache.put(stock_code, result, etag)
+        unchanged = not_modified(etag)
+        if unchanged is not None:
+            return unchanged
+        return with_etag(jsonify({'success': True, 'data': result}), etag)
         
     except Exception as e:
         error_msg = str(e)
@@ -1796,16 +1850,6 @@ def get_industry_info(stock_code):
         print(f"[{datetime.now()}] ❌ 获取行业信息失败: {error_msg}")
         print(error_trace)
         
-        # 确保在异常情况下也恢复代理设置
-        if original_http_proxy:
-            os.environ['HTTP_PROXY'] = original_http_proxy
-        if original_https_proxy:
-            os.environ['HTTPS_PROXY'] = original_https_proxy
-        if original_http_proxy_lower:
-            os.environ['http_proxy'] = original_http_proxy_lower
-        if original_https_proxy_lower:
-            os.environ['https_proxy'] = original_https_proxy_lower
-        
         return jsonify({
             'success': False,
             'error': error_msg,
@@ -1850,7 +1894,7 @@ def get_hot_rank_by_code(stock_code):
 
         print(f"[{datetime.now()}] 解析股票代码成功: 输入={stock_code}, 规范化后={symbol}")
 
-        df_hot_rank = ak.stock_hot_rank_latest_em(symbol=symbol)
+        df_hot_rank = ak_call(ak.stock_hot_rank_latest_em, symbol=symbol)
 
         if df_hot_rank is None or df_hot_rank.empty:
             print(f"[{datetime.now()}] ⚠️ stock_hot_rank_latest_em 返回空数据: {symbol}")
@@ -1912,6 +1956,46 @@ def get_hot_rank_by_code(stock_code):
         return jsonify({'success': False, 'error': error_msg}), 500
 
 
+@app.route('/api/stock/spot', methods=['GET'])
+def get_spot_quotes():
+    """
+    批量查询实时行情（最新价、涨跌幅、换手率等），基于缓存的全市场行情快照
+    
+    Query:
+        codes: 逗号分隔的股票代码，如 000001,600000
+    
+    Returns:
+        JSON格式的实时行情
+    """
+    try:
+        raw_codes = request.args.get('codes', '')
+        codes = [c.strip() for c in raw_codes.split(',') if c.strip()]
+        if not codes:
+            return jsonify({'success': False, 'error': 'codes_required'}), 400
+
+        snapshot = get_spot_snapshot()
+        if snapshot is None:
+            return jsonify({'success': False, 'error': '无法获取实时行情快照'}), 503
+
+        quotes = snapshot.bulk(codes)
+        missing = [c for c in codes if normalize_code(c) not in quotes]
+        return jsonify({
+            'success': True,
+            'data': {
+                'items': list(quotes.values()),
+                'count': len(quotes),
+                'missing': missing,
+                'snapshotTime': datetime.fromtimestamp(snapshot.fetched_at).isoformat(),
+                'source': 'AKShare - stock_zh_a_spot_em'
+            }
+        })
+    except Exception as e:
+        error_msg = str(e)
+        print(f"[{datetime.now()}] ❌ 获取实时行情失败: {error_msg}")
+        print(traceback.format_exc())
+        return jsonify({'success': False, 'error': error_msg}), 500
+
+
 @app.route('/api/strategy/hot-volume-breakout', methods=['GET'])
 def run_hot_volume_breakout_strategy():
     """热点题材成交量放大策略（短线操作）"""
@@ -1930,7 +2014,7 @@ def run_hot_volume_breakout_strategy():
 
         print(f"[{datetime.now()}] ⚡️ 执行热点题材成交量放大策略: top_hot={top_hot}, top_themes={top_themes}, theme_members={theme_members}")
 
-        strategy_results = run_strategy(top_hot, top_themes, theme_members)
+        strategy_results = strategy.run_strategy(top_hot, top_themes, theme_members)
 
         def to_float(value):
             try:
@@ -2018,216 +2102,238 @@ def run_hot_volume_breakout_strategy():
         }), 500
 
 
+def _parse_hot_rank_dataframe(df_hot_rank: pd.DataFrame):
+    """解析 stock_hot_rank_latest_em 返回的数据，只保留排名相关字段"""
+    hot_rank_list = []
+    # 打印列名以便调试
+    print(f"[{datetime.now()}] 📋 [人气榜接口] 数据列名: {list(df_hot_rank.columns)}")
+    
+    # stock_hot_rank_latest_em返回的字段包括：rank（排名）、rankChange（排名变化）、hisRankChange（历史排名变化）等
+    for idx, row in df_hot_rank.iterrows():
+        try:
+            # 提取股票代码和名称（用于匹配）
+            code = str(row.get('代码', row.get('股票代码', row.get('code', '')))).strip()
+            name = str(row.get('名称', row.get('股票名称', row.get('name', '')))).strip()
+            
+            # 提取排名相关字段（rank、rankChange、hisRankChange）
+            # rank: 当前排名（尝试多种可能的字段名）
+            rank = row.get('排名', row.get('rank', row.get('当前排名', None)))
+            if pd.isna(rank):
+                rank = None
+            
+            # rankChange: 排名变化（与上一期相比）
+            rank_change = row.get('排名变化', row.get('rankChange', row.get('排名变动', None)))
+            if pd.isna(rank_change):
+                rank_change = None
+            
+            # hisRankChange: 历史排名变化
+            his_rank_change = row.get('历史排名变化', row.get('hisRankChange', row.get('历史排名变动', None)))
+            if pd.isna(his_rank_change):
+                his_rank_change = None
+            
+            # 只返回rank、rankChange、hisRankChange这三个字段
+            if rank is not None:
+                hot_rank_list.append({
+                    'rank': int(rank) if pd.notna(rank) else None,
+                    'rankChange': int(rank_change) if pd.notna(rank_change) else None,
+                    'hisRankChange': int(his_rank_change) if pd.notna(his_rank_change) else None,
+                    'code': code,  # 保留code用于匹配股票
+                    'name': name   # 保留name用于显示
+                })
+        except Exception as e:
+            print(f"[{datetime.now()}] ⚠️ 解析人气榜数据行失败 (行{idx}): {str(e)[:100]}")
+            continue
+    return hot_rank_list
+
+
+def _load_hot_rank_list():
+    """从AKShare拉取并解析人气榜（在SWR缓存的刷新线程中执行），失败时抛出异常"""
+    # 调用AKShare的stock_hot_rank_latest_em接口（带重试，失败后分别等待1秒、2秒）
+    print(f"[{datetime.now()}] 📡 [人气榜接口] 调用 stock_hot_rank_latest_em()...")
+    start_time = time.time()
+    try:
+        # 在刷新线程中执行，不占用请求线程，等待所有重试
+        df_hot_rank = _call_with_retry(ak.stock_hot_rank_latest_em, "[人气榜接口] stock_hot_rank_latest_em",
+                                       RetryPolicy(retries=3, base_delay=1.0), wait_retries=True)
+    except CircuitOpenError as e:
+        print(f"[{datetime.now()}] ⚠️ [人气榜接口] {e}")
+        raise
+    except Exception as e:
+        print(f"[{datetime.now()}] ❌ [人气榜接口] 获取人气榜数据最终失败")
+        print(f"    错误类型: {type(e).__name__}")
+        print(f"    错误消息: {str(e)[:200]}")
+        print(f"    耗时: {time.time() - start_time:.2f}秒")
+        raise
+    print(f"[{datetime.now()}] ✅ [人气榜接口] 成功获取个股人气榜数据，耗时: {time.time() - start_time:.2f}秒，共{len(df_hot_rank)}条")
+    
+    if df_hot_rank is None or df_hot_rank.empty:
+        raise ValueError("stock_hot_rank_latest_em 返回空数据")
+    
+    hot_rank_list = _parse_hot_rank_dataframe(df_hot_rank)
+    if not hot_rank_list:
+        raise ValueError("人气榜数据解析结果为空")
+    print(f"[{datetime.now()}] ✅ 成功解析 {len(hot_rank_list)} 条人气榜数据")
+    return hot_rank_list
+
+
+# 人气榜每隔几分钟才更新一次：过期后先返回旧数据，由后台线程刷新；闭市期间取得的数据一直用到下一个交易时段
+HOT_RANK_CACHE_TTL = int(os.getenv('HOT_RANK_CACHE_TTL', '120'))
+_hot_rank_cache = StaleWhileRevalidateCache('人气榜', _load_hot_rank_list, ttl=HOT_RANK_CACHE_TTL,
+                                            expiry=trading_calendar.expires_at)
+
+
 @app.route('/api/stock/hot-rank', methods=['GET'])
 def get_hot_rank():
     """
     获取个股人气榜最新排名（使用AKShare的stock_hot_rank_latest_em）
     
+    数据来自 stale-while-revalidate 缓存：过期时立即返回上一次成功的数据（stale=true），
+    同时由单个后台线程刷新；刷新失败时继续返回旧数据。
+    
     Returns:
         JSON格式的个股人气榜数据
     """
     try:
         print(f"[{datetime.now()}] 请求个股人气榜数据")
         
-        # 临时禁用代理设置
-        original_http_proxy = os.environ.get('HTTP_PROXY')
-        original_https_proxy = os.environ.get('HTTPS_PROXY')
-        original_http_proxy_lower = os.environ.get('http_proxy')
-        original_https_proxy_lower = os.environ.get('https_proxy')
-        
-        # 临时移除代理环境变量
-        for proxy_var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']:
-            os.environ.pop(proxy_var, None)
-        
-        # 确保NO_PROXY设置正确
-        os.environ['NO_PROXY'] = '*'
-        os.environ['no_proxy'] = '*'
-        
-        hot_rank_list = []
-        
         try:
-            print(f"[{datetime.now()}] 🔧 [人气榜接口] 禁用代理设置...")
-            for proxy_var in ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']:
-                original_value = os.environ.get(proxy_var)
-                if original_value:
-                    print(f"[{datetime.now()}]   - 移除代理: {proxy_var} = {original_value[:50]}...")
-                os.environ.pop(proxy_var, None)
-            
-            os.environ['NO_PROXY'] = '*'
-            os.environ['no_proxy'] = '*'
-            print(f"[{datetime.now()}] ✅ [人气榜接口] 代理已禁用，NO_PROXY=*")
-            
-            import urllib3
-            urllib3.disable_warnings()
-            
-            # 调用AKShare的stock_hot_rank_latest_em接口（带重试）
-            df_hot_rank = None
-            for attempt in range(3):
-                try:
-                    if attempt > 0:
-                        delay = 1.0 * attempt
-                        print(f"[{datetime.now()}] ⏳ [人气榜接口] 等待{delay:.1f}秒后重试...")
-                        time.sleep(delay)
-                    
-                    print(f"[{datetime.now()}] 📡 [人气榜接口] 尝试调用 stock_hot_rank_latest_em() (尝试 {attempt + 1}/3)...")
-                    start_time = time.time()
-                    
-                    # 调用AKShare接口
-                    df_hot_rank = ak.stock_hot_rank_latest_em()
-                    elapsed_time = time.time() - start_time
-                    
-                    if df_hot_rank is not None and not df_hot_rank.empty:
-                        print(f"[{datetime.now()}] ✅ [人气榜接口] 成功获取个股人气榜数据，耗时: {elapsed_time:.2f}秒，共{len(df_hot_rank)}条")
-                        break
-                    else:
-                        print(f"[{datetime.now()}] ⚠️ [人气榜接口] 返回数据为空")
-                        time.sleep(0.5)
-                except Exception as e:
-                    error_type = type(e).__name__
-                    error_msg = str(e)
-                    elapsed_time = time.time() - start_time if 'start_time' in locals() else 0
-                    
-                    print(f"[{datetime.now()}] ❌ [人气榜接口] 获取人气榜数据失败 (尝试 {attempt + 1}/3)")
-                    print(f"    错误类型: {error_type}")
-                    print(f"    错误消息: {error_msg[:200]}")
-                    print(f"    耗时: {elapsed_time:.2f}秒")
-                    
-                    if attempt < 2:
-                        time.sleep(1)
-                    else:
-                        print(f"[{datetime.now()}] ❌ [人气榜接口] 获取人气榜数据最终失败")
-                        df_hot_rank = None
-                        break
-            
-            if df_hot_rank is not None and not df_hot_rank.empty:
-                # 打印列名以便调试（仅第一次）
-                if len(hot_rank_list) == 0:
-                    print(f"[{datetime.now()}] 📋 [人气榜接口] 数据列名: {list(df_hot_rank.columns)}")
-                
-                # 解析数据并构建返回格式
-                # stock_hot_rank_latest_em返回的字段包括：rank（排名）、rankChange（排名变化）、hisRankChange（历史排名变化）等
-                for idx, row in df_hot_rank.iterrows():
-                    try:
-                        # 提取股票代码和名称（用于匹配）
-                        code = str(row.get('代码', row.get('股票代码', row.get('code', '')))).strip()
-                        name = str(row.get('名称', row.get('股票名称', row.get('name', '')))).strip()
-                        
-                        # 提取排名相关字段（rank、rankChange、hisRankChange）
-                        # rank: 当前排名（尝试多种可能的字段名）
-                        rank = row.get('排名', row.get('rank', row.get('当前排名', None)))
-                        if pd.isna(rank):
-                            rank = None
-                        
-                        # rankChange: 排名变化（与上一期相比）
-                        rank_change = row.get('排名变化', row.get('rankChange', row.get('排名变动', None)))
-                        if pd.isna(rank_change):
-                            rank_change = None
-                        
-                        # hisRankChange: 历史排名变化
-                        his_rank_change = row.get('历史排名变化', row.get('hisRankChange', row.get('历史排名变动', None)))
-                        if pd.isna(his_rank_change):
-                            his_rank_change = None
-                        
-                        # 只返回rank、rankChange、hisRankChange这三个字段
-                        if rank is not None:
-                            hot_rank_list.append({
-                                'rank': int(rank) if pd.notna(rank) else None,
-                                'rankChange': int(rank_change) if pd.notna(rank_change) else None,
-                                'hisRankChange': int(his_rank_change) if pd.notna(his_rank_change) else None,
-                                'code': code,  # 保留code用于匹配股票
-                                'name': name   # 保留name用于显示
-                            })
-                    except Exception as e:
-                        print(f"[{datetime.now()}] ⚠️ 解析人气榜数据行失败 (行{idx}): {str(e)[:100]}")
-                        continue
-                
-                print(f"[{datetime.now()}] ✅ 成功解析 {len(hot_rank_list)} 条人气榜数据")
-            else:
-                print(f"[{datetime.now()}] ⚠️ 无法获取人气榜数据")
-                
+            cached = _hot_rank_cache.get()
         except Exception as e:
-            error_type = type(e).__name__
-            error_msg = str(e)
-            print(f"[{datetime.now()}] ⚠️ [人气榜接口] 获取人气榜数据异常: {error_type}")
-            print(f"  错误消息: {error_msg[:300]}")
-            try:
-                import traceback
-                print(f"  完整堆栈: {traceback.format_exc()[:500]}")
-            except:
-                pass
-        
-        # 恢复原始代理设置
-        if original_http_proxy:
-            os.environ['HTTP_PROXY'] = original_http_proxy
-        if original_https_proxy:
-            os.environ['HTTPS_PROXY'] = original_https_proxy
-        if original_http_proxy_lower:
-            os.environ['http_proxy'] = original_http_proxy_lower
-        if original_https_proxy_lower:
-            os.environ['https_proxy'] = original_https_proxy_lower
-        
-        # 构建返回结果
+            print(f"[{datetime.now()}] ⚠️ 未获取到人气榜数据: {str(e)[:300]}")
+            return jsonify({
+                'success': True,
+                'data': {
+                    'hotRankList': [],
+                    'count': 0,
+                    'updateTime': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'source': 'AKShare - stock_hot_rank_latest_em'
+                },
+                'message': '无法获取个股人气榜数据'
+            })
+        
+        # 版本即缓存的获取时间：榜单未刷新过时直接返回 304，不重新序列化整个榜单
+        etag = etag_for('hot-rank', cached.fetched_at)
+        unchanged = not_modified(etag)
+        if unchanged is not None:
+            return unchanged
+        
+        hot_rank_list = cached.value
         result = {
             'hotRankList': hot_rank_list,
             'count': len(hot_rank_list),
-            'updateTime': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'updateTime': datetime.fromtimestamp(cached.fetched_at).strftime('%Y-%m-%d %H:%M:%S'),
+            'cacheAgeSeconds': round(cached.age, 1),
+            'stale': cached.stale,
             'source': 'AKShare - stock_hot_rank_latest_em'
         }
+        if cached.last_error:
+            result['lastRefreshError'] = cached.last_error
         
-        if len(hot_rank_list) == 0:
-            print(f"[{datetime.now()}] ⚠️ 未获取到人气榜数据")
-            return jsonify({
-                'success': True,
-                'data': result,
-                'message': '无法获取个股人气榜数据'
-            })
-        
-        print(f"[{datetime.now()}] ✅ 成功获取个股人气榜数据 - 共{len(hot_rank_list)}条")
-        return jsonify({'success': True, 'data': result})
+        print(f"[{datetime.now()}] ✅ 返回个股人气榜数据 - 共{len(hot_rank_list)}条，缓存时长 {cached.age:.1f}秒{'（已过期，后台刷新中）' if cached.stale else ''}")
+        return with_etag(jsonify({'success': True, 'data': result}), etag)
         
     except Exception as e:
         error_msg = str(e)
-        try:
-            import traceback
-            error_trace = traceback.format_exc()
-            print(f"[{datetime.now()}] ❌ 获取个股人气榜数据失败: {error_msg}")
-            print(error_trace)
-        except:
-            print(f"[{datetime.now()}] ❌ 获取个股人气榜数据失败: {error_msg}")
+        error_trace = traceback.format_exc()
+        print(f"[{datetime.now()}] ❌ 获取个股人气榜数据失败: {error_msg}")
+        print(error_trace)
         return jsonify({
                 'success': False,
                 'error': error_msg,
                 'message': '无法获取个股人气榜数据'
             }), 500
 
+def _batch_fundamental_item(code, profiles):
+    """批量接口中的单个条目：基本面数据 + 代码主表中的静态属性；获取失败时抛出异常"""
+    payload, status = _load_fundamental(code)
+    if not payload.get('success'):
+        raise LookupError(payload.get('error') or f'HTTP {status}')
+    item = dict(payload['data'])  # 副本：补充字段不影响其他请求拿到的同一份数据
+    profile = profiles.get(_normalize_stock_code(code))
+    if profile:
+        if not item.get('stockName') or item.get('stockName') == '未知':
+            item['stockName'] = profile.get('name')
+        for key in ('exchange', 'board', 'industry', 'listingDate', 'totalShares', 'floatShares'):
+            item.setdefault(key, profile.get(key))
+    return item
+
+
+def _batch_error_entry(outcome):
+    return {
+        'index': outcome.index,
+        'stockCode': outcome.key,
+        'error': outcome.error,
+        'timedOut': outcome.timed_out,
+    }
+
+
 @app.route('/api/stock/batch', methods=['POST'])
 def get_batch_fundamental():
     """
     批量获取股票基本面数据
     
+    多只股票并发获取（单批并发数和单只超时见 batch_engine），单只失败或超时不影响其他股票，
+    失败的股票在 errors 中列出。
+    
     Body:
-        JSON格式: {"stockCodes": ["000001", "600000"]}
+        JSON格式: {"stockCodes": ["000001", "600000"], "stream": false}
+    
+    stream 为 true（或 ?stream=1、Accept: application/x-ndjson）时以 NDJSON 流式返回：
+    每完成一只股票输出一行 {"type": "item", ...} 或 {"type": "error", ...}，最后一行为 {"type": "summary", ...}。
     """
     try:
-        data = request.get_json()
-        stock_codes = data.get('stockCodes', [])
-        
-        results = []
-        for code in stock_codes:
-            try:
-                # 调用单个股票接口
-                response = get_fundamental(code)
-                result_data = response.get_json()
-                if result_data.get('success'):
-                    results.append(result_data['data'])
-            except Exception as e:
-                print(f"批量获取失败 {code}: {str(e)}")
-                continue
+        data = request.get_json(silent=True) or {}
+        stock_codes = [str(code) for code in data.get('stockCodes', []) if str(code).strip()]
+        stream = (bool(data.get('stream'))
+                  or request.args.get('stream', '').lower() in ('1', 'true')
+                  or 'application/x-ndjson' in request.headers.get('Accept', ''))
+        
+        # 静态属性（简称、交易所、板块、行业等）直接从本地代码主表补充
+        profiles = symbol_master.bulk(_normalize_stock_code(code) for code in stock_codes)
+        started = time.time()
+        outcomes = run_batch(stock_codes, lambda code: _batch_fundamental_item(code, profiles))
+        
+        if stream:
+            def generate():
+                succeeded = failed = 0
+                for outcome in outcomes:
+                    if outcome.ok:
+                        succeeded += 1
+                        line = {'type': 'item', 'index': outcome.index, 'stockCode': outcome.key, 'data': outcome.value}
+                    else:
+                        failed += 1
+                        line = {'type': 'error', **_batch_error_entry(outcome)}
+                    yield line
+                yield {
+                    'type': 'summary',
+                    'total': len(stock_codes),
+                    'count': succeeded,
+                    'failedCount': failed,
+                    'elapsedMs': round((time.time() - started) * 1000),
+                }
+            
+            return Response(stream_with_context(dumps_lines(generate())), mimetype='application/x-ndjson')
         
+        results = {}
+        errors = []
+        for outcome in outcomes:
+            if outcome.ok:
+                results[outcome.index] = outcome.value
+            else:
+                print(f"[{datetime.now()}] ⚠️ 批量获取失败 {outcome.key}: {outcome.error}")
+                errors.append(_batch_error_entry(outcome))
+        errors.sort(key=lambda entry: entry['index'])
+        
+        # 结果保持请求中的顺序
+        ordered = [results[index] for index in sorted(results)]
+        print(f"[{datetime.now()}] ✅ 批量基本面: {len(ordered)}/{len(stock_codes)} 成功，"
+              f"耗时 {time.time() - started:.1f}秒")
         return jsonify({
             'success': True,
-            'data': results,
-            'count': len(results)
+            'data': ordered,
+            'count': len(ordered),
+            'errors': errors,
+            'failedCount': len(errors)
         })
     except Exception as e:
         return jsonify({
@@ -2235,17 +2341,76 @@ def get_batch_fundamental():
             'error': str(e)
         }), 500
 
+# ---------- 启动预热（warmup.py）----------
+
+# 预热日线的自选股代码（逗号分隔）及回溯月数
+WARMUP_SYMBOLS = [code.strip() for code in os.getenv('WARMUP_SYMBOLS', '').split(',') if code.strip()]
+WARMUP_HISTORY_MONTHS = int(os.getenv('WARMUP_HISTORY_MONTHS', '6'))
+
+
+def _warm_hot_rank():
+    return {'count': len(_hot_rank_cache.get().value)}
+
+
+def _warm_spot_snapshot():
+    snapshot = get_spot_snapshot()
+    if snapshot is None:
+        raise ValueError("无法获取实时行情快照")
+    return {'count': len(snapshot)}
+
+
+def _warm_watchlist_bars():
+    """自选股日线写入本地日线存储（已覆盖的只增量同步），与批量接口共用有界线程池"""
+    loaded = failed = 0
+    for outcome in run_batch(WARMUP_SYMBOLS,
+                             lambda code: _fetch_history_dataframe_with_fallback(code, WARMUP_HISTORY_MONTHS, False)):
+        if outcome.ok:
+            loaded += 1
+        else:
+            failed += 1
+            print(f"[{datetime.now()}] ⚠️ 预热日线 {outcome.key} 失败: {outcome.error}")
+    if WARMUP_SYMBOLS and not loaded:
+        raise RuntimeError(f"{failed} 只自选股的日线全部加载失败")
+    return {'symbols': len(WARMUP_SYMBOLS), 'loaded': loaded, 'failed': failed}
+
+
+def _watchlist_synced_at():
+    """自选股中最早一次同步的时间（最旧的数据决定整体年龄）"""
+    synced = []
+    for code in WARMUP_SYMBOLS:
+        last_sync = bar_store.meta(_normalize_stock_identifier(code)[1]).get('lastSync')
+        if not last_sync:
+            return None
+        synced.append(datetime.fromisoformat(last_sync).timestamp())
+    return min(synced) if synced else None
+
+
+def _cache_fetched_at(cache):
+    cached = cache.peek()
+    return cached.fetched_at if cached is not None else None
+
+
+warmup.register('hot_rank', _warm_hot_rank, lambda: _cache_fetched_at(_hot_rank_cache))
+warmup.register('spot', _warm_spot_snapshot, lambda: _cache_fetched_at(spot_cache))
+warmup.register('industry_boards', lambda: {'count': industry_directory.warm_boards()},
+                lambda: industry_directory.boards_fetched_at or None)
+if WARMUP_SYMBOLS:
+    warmup.register('watchlist_bars', _warm_watchlist_bars, _watchlist_synced_at)
+
 if __name__ == '__main__':
     print("=" * 50)
     print("股票数据服务启动中...")
     print("服务地址: http://localhost:5001")
     print("API文档:")
     print("  GET  /health - 健康检查")
+    print("  GET  /ready - 就绪检查（启动预热状态）")
+    print("  GET  /api/upstream/health - 上游数据源健康度")
     print("  GET  /api/stock/fundamental/<stock_code> - 获取单个股票基本面")
     print("  GET  /api/stock/industry/<stock_code> - 获取股票行业详情")
     print("  GET  /api/stock/hot-rank - 获取个股人气榜最新排名")
+    print("  GET  /api/stock/spot?codes=000001,600000 - 批量查询实时行情")
     print("  GET  /api/stock/analyze/<stock_code>?months=3 - 大数据分析（技术指标+趋势）")
-    print("  POST /api/stock/batch - 批量获取基本面")
+    print("  POST /api/stock/batch - 批量获取基本面（stream=true 时以NDJSON流式返回）")
     print("=" * 50)
     
     # 检查是否安装了akshare
@@ -2256,5 +2421,11 @@ if __name__ == '__main__':
         print("❌ 缺少依赖，请运行: pip install akshare pandas flask flask-cors")
         exit(1)
     
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # 在后台导入 akshare 等依赖并预热常用数据集，与服务启动并行，/health 立即可用，预热结束后 /ready 返回200
+    preload_dependencies(background=True)
+    warmup.start()
+    
+    # 代理策略已在共享HTTP会话上统一设置，请求处理不修改进程环境，可以多线程处理请求；
+    # 关闭自动重载：重载器会在子进程中再执行一遍本段代码，预热和后台刷新都会重复一次
+    app.run(host='0.0.0.0', port=5001, debug=True, use_reloader=False, threaded=True)
 
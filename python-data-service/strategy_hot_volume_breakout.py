@@ -28,6 +28,14 @@ from typing import Dict, Iterable, List, Optional
 import akshare as ak
 import pandas as pd
 
+from bar_store import bar_store, normalize_bars, plain_code, sync_tail
+import http_session
+import metrics
+from circuit_breaker import CircuitOpenError
+from spot_snapshot import get_spot_snapshot
+from upstream import ak_call
+from provider_health import provider_health
+
 if sys.platform.startswith('win'):
     try:
         sys.stdout.reconfigure(encoding='utf-8')  # type: ignore[attr-defined]
@@ -35,35 +43,22 @@ if sys.platform.startswith('win'):
     except Exception:  # pylint: disable=broad-except
         pass
 
-PROXY_VARS = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'ALL_PROXY', 'all_proxy']
-
-
-def disable_global_proxy() -> Dict[str, Optional[str]]:
-    """临时移除代理，返回被移除的环境变量以便恢复。"""
-    removed = {}
-    for key in PROXY_VARS:
-        if key in os.environ:
-            removed[key] = os.environ.pop(key)
-    os.environ.setdefault('NO_PROXY', '*')
-    os.environ.setdefault('no_proxy', '*')
-    return removed
-
-
-def restore_global_proxy(removed: Dict[str, Optional[str]]) -> None:
-    """恢复之前移除的代理环境变量。"""
-    for key, value in removed.items():
-        if value is not None:
-            os.environ[key] = value
-
 
 def fetch_with_retry(func, description: str, *args, retries: int = 5, delay: float = 2.0, **kwargs):
-    """统一的重试逻辑，针对连接错误使用指数退避策略。"""
+    """统一的重试逻辑，针对连接错误使用指数退避策略。
+
+    每次尝试都经由 ak_call 发出，多个线程对同一函数和参数的并发请求会合并为一次。
+    上游已熔断时不再等待重试，直接抛出 CircuitOpenError。
+    """
     last_exc = None
     for attempt in range(1, retries + 1):
         try:
-            data = func(*args, **kwargs)
+            data = ak_call(func, *args, **kwargs)
             if data is not None:
                 return data
+        except CircuitOpenError as exc:
+            print(f"[WARN] {description} 跳过: {exc}")
+            raise
         except Exception as exc:  # pylint: disable=broad-except
             last_exc = exc
             exc_str = str(exc)
@@ -99,8 +94,10 @@ def fetch_with_retry(func, description: str, *args, retries: int = 5, delay: flo
             
             # 如果不是最后一次尝试，等待后继续重试
             if attempt < retries:
+                metrics.observe_retry('fetch_with_retry', getattr(func, '__name__', description))
                 time.sleep(wait_time)
     
+    metrics.observe_retry('fetch_with_retry', getattr(func, '__name__', description), exhausted=True)
     raise RuntimeError(f"无法获取 {description} (已重试 {retries} 次)") from last_exc
 
 
@@ -161,10 +158,7 @@ def build_hot_concepts(hot_df: pd.DataFrame, top_themes: int, members_per_theme:
     for idx, (_, row) in enumerate(hot_df.iterrows(), 1):
         symbol = row['code']
         try:
-            # 在请求之间添加延迟，避免请求过于频繁
-            if idx > 1:
-                time.sleep(0.3)  # 每个关键词请求之间延迟0.3秒
-            
+            # 请求速率由 upstream 的令牌桶控制（stock_hot_keyword_em 单独限速），无需固定延迟
             kw_df = load_stock_keywords(symbol)
         except Exception as exc:  # pylint: disable=broad-except
             print(f"[WARN] 获取 {symbol} 热点题材失败 ({idx}/{total_rows}): {exc}")
@@ -221,76 +215,25 @@ def build_hot_concepts(hot_df: pd.DataFrame, top_themes: int, members_per_theme:
 
 
 def _normalize_history_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    """标准化不同AKShare接口返回的数据格式。"""
-    df = df.copy()
-    
-    # 标准化列名（支持中英文列名）
-    column_mapping = {
-        '日期': 'date',
-        'Date': 'date',
-        'date': 'date',
-        '开盘': 'open',
-        'Open': 'open',
-        'open': 'open',
-        '最高': 'high',
-        'High': 'high',
-        'high': 'high',
-        '最低': 'low',
-        'Low': 'low',
-        'low': 'low',
-        '收盘': 'close',
-        'Close': 'close',
-        'close': 'close',
-        '成交量': 'volume',
-        'Volume': 'volume',
-        'volume': 'volume',
-        '成交额': 'turnover',
-        'Amount': 'turnover',
-        'amount': 'turnover',
-        '成交金额': 'turnover',
-        'Turnover': 'turnover',
-        'turnover': 'turnover',
-    }
-    
-    # 重命名列
-    for old_name, new_name in column_mapping.items():
-        if old_name in df.columns and new_name not in df.columns:
-            df.rename(columns={old_name: new_name}, inplace=True)
-    
-    # 确保必要的列存在（price相关列是必需的）
-    required_price_cols = ['date', 'open', 'high', 'low', 'close']
-    missing_price_cols = [col for col in required_price_cols if col not in df.columns]
-    if missing_price_cols:
-        raise ValueError(f"数据缺少必要列: {missing_price_cols}, 可用列: {list(df.columns)}")
-    
-    # 数值转换
-    numeric_cols = ['open', 'high', 'low', 'close']
-    if 'turnover' in df.columns:
-        numeric_cols.append('turnover')
-    if 'volume' in df.columns:
-        numeric_cols.append('volume')
-    
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    """标准化不同AKShare接口返回的数据格式。
+
+    与本地日线存储同一口径（bar_store.normalize_bars）：volume 为股，turnover 为成交额（元），
+    无论数据来自本地存储还是哪个上游接口，成交量的单位都相同。
+    """
+    df = normalize_bars(df)
+    if df.empty:
+        raise ValueError("日线数据为空")
     
-    # 如果缺少 volume 列，尝试从 turnover 和 close 计算
-    if 'volume' not in df.columns:
-        if 'turnover' in df.columns and 'close' in df.columns:
-            # 使用成交额和收盘价估算成交量：成交量 = 成交额 / 收盘价
-            # 注意：这个估算可能不够精确，但对于策略分析来说可以使用
+    # 缺少成交量时，尝试从成交额和收盘价估算：成交量（股） = 成交额（元） / 收盘价
+    # 注意：这个估算可能不够精确，但对于策略分析来说可以使用
+    if df['volume'].isna().all():
+        if df['turnover'].notna().any():
             df['volume'] = (df['turnover'] / df['close']).fillna(0)
             print(f"[INFO] 数据缺少 volume 列，已根据成交额和收盘价估算成交量")
         else:
-            # 如果既没有 volume 也没有 turnover，设置为 0（会导致成交量相关策略失效）
-            df['volume'] = 0
-            print(f"[WARN] 数据缺少 volume 和 turnover 列，成交量将设为 0")
-    
-    # 日期转换
-    df['date'] = pd.to_datetime(df['date'])
-    
-    # 排序
-    df.sort_values('date', inplace=True)
+            # 如果既没有 volume 也没有成交额，设置为 0（会导致成交量相关策略失效）
+            df['volume'] = 0.0
+            print(f"[WARN] 数据缺少 volume 和成交额列，成交量将设为 0")
     
     return df
 
@@ -326,18 +269,14 @@ def _try_fetch_volume_from_other_sources(symbol: str, target_dates: pd.Series, s
     # 尝试从 stock_zh_a_hist 获取 volume
     for adjust in ['', 'qfq', 'hfq']:
         try:
-            def fetch_hist_volume():
-                return ak.stock_zh_a_hist(
-                    symbol=symbol,
-                    period="daily",
-                    start_date=start_date_str,
-                    end_date=end_date_str,
-                    adjust=adjust or ""
-                )
-            
             df_volume_raw = fetch_with_retry(
-                fetch_hist_volume,
+                ak.stock_zh_a_hist,
                 f"{symbol} volume补全 (stock_zh_a_hist, {adjust})",
+                symbol=plain_code(symbol),
+                period="daily",
+                start_date=start_date_str,
+                end_date=end_date_str,
+                adjust=adjust or "",
                 retries=2,
                 delay=1.5
             )
@@ -357,280 +296,252 @@ def _try_fetch_volume_from_other_sources(symbol: str, target_dates: pd.Series, s
     return pd.Series(dtype=float)
 
 
+def _load_daily_bars_from_store(symbol: str, start_date: datetime, lookback_days: int) -> Optional[pd.DataFrame]:
+    """本地日线存储已覆盖所需区间时，增量同步尾部后直接读取；否则返回 None。"""
+    if not bar_store.covers(symbol, start_date):
+        return None
+    try:
+        sync_tail(symbol)
+    except Exception as exc:  # pylint: disable=broad-except
+        print(f"[WARN] {symbol} 增量同步失败: {str(exc)[:200]}，改为全量拉取")
+        return None
+    df = bar_store.read(symbol, start_date)
+    if df is None or df.empty:
+        return None
+    if df['volume'].isna().any():
+        # 腾讯接口只有成交额，按成交额/收盘价估算缺失的成交量
+        df['volume'] = df['volume'].fillna(df['turnover'] / df['close']).fillna(0)
+    if lookback_days > 0:
+        df = df.tail(lookback_days)
+    df['ma5'] = df['close'].rolling(5).mean()
+    df['ma10'] = df['close'].rolling(10).mean()
+    print(f"[INFO] {symbol} 使用本地日线存储")
+    return df.reset_index(drop=True)
+
+
+def _save_daily_bars_to_store(symbol: str, df: pd.DataFrame, coverage_start: Optional[datetime], source: str) -> None:
+    """把上游拉取的日线写入本地存储，失败时仅打印警告。"""
+    try:
+        bar_store.merge(symbol, df, coverage_start=coverage_start, source=source)
+    except Exception as exc:  # pylint: disable=broad-except
+        print(f"[WARN] {symbol} 写入本地日线存储失败: {str(exc)[:200]}")
+
+
 def load_daily_bars(symbol: str, lookback_days: int = 90) -> pd.DataFrame:
     """拉取指定股票的日线数据并截取最近 lookback_days。
     
-    使用多个备用数据源，按顺序尝试：
+    本地日线存储已覆盖时只增量同步缺失的交易日；否则使用多个备用数据源，默认顺序：
     1. stock_zh_a_hist_tx - 优先使用（连接稳定性好）
     2. stock_zh_a_daily - 备用方案
     3. stock_zh_a_hist - 备用方案（前复权、无复权、后复权）
+    实际顺序会按 provider_health 记录的近期成功率和耗时动态调整。
     
     如果使用 stock_zh_a_hist_tx 但缺少 volume 列，会尝试从其他接口补全。
     """
-    from datetime import datetime, timedelta
+    from datetime import timedelta
     
     end_date = datetime.now()
     start_date = end_date - timedelta(days=lookback_days + 30)  # 多取一些数据确保足够
     start_date_str = start_date.strftime("%Y%m%d")
     end_date_str = end_date.strftime("%Y%m%d")
     
-    # 方案1: 优先尝试 stock_zh_a_hist_tx（腾讯数据源，连接稳定性好）
-    try:
-        def fetch_hist_tx():
-            return ak.stock_zh_a_hist_tx(
+    df_local = _load_daily_bars_from_store(symbol, start_date, lookback_days)
+    if df_local is not None:
+        return df_local
+    
+    def via_hist_tx():
+        # 方案1: 优先尝试 stock_zh_a_hist_tx（腾讯数据源，连接稳定性好）
+        try:
+            df_raw = fetch_with_retry(
+                ak.stock_zh_a_hist_tx,
+                f"{symbol} 日线 (stock_zh_a_hist_tx)",
                 symbol=symbol,
                 start_date=start_date_str,
-                end_date=end_date_str
+                end_date=end_date_str,
+                retries=3,
+                delay=2.0
             )
         
-        df_raw = fetch_with_retry(
-            fetch_hist_tx,
-            f"{symbol} 日线 (stock_zh_a_hist_tx)",
-            retries=3,
-            delay=2.0
-        )
-        
-        # 检查原始数据的列
-        if df_raw is None or df_raw.empty:
-            raise ValueError(f"{symbol} stock_zh_a_hist_tx 返回空数据")
+            # 检查原始数据的列
+            if df_raw is None or df_raw.empty:
+                raise ValueError(f"{symbol} stock_zh_a_hist_tx 返回空数据")
         
-        print(f"[DEBUG] {symbol} stock_zh_a_hist_tx 原始列: {list(df_raw.columns)}")
+            print(f"[DEBUG] {symbol} stock_zh_a_hist_tx 原始列: {list(df_raw.columns)}")
         
-        # 检查是否有 volume 相关的列（支持中英文列名）
-        has_volume = any(col in df_raw.columns for col in ['volume', 'Volume', '成交量'])
-        has_amount_or_turnover = any(col in df_raw.columns for col in ['amount', 'Amount', 'turnover', 'Turnover', '成交额', '成交金额'])
+            # 检查是否有 volume 相关的列（支持中英文列名）
+            has_volume = any(col in df_raw.columns for col in ['volume', 'Volume', '成交量'])
+            has_amount_or_turnover = any(col in df_raw.columns for col in ['amount', 'Amount', 'turnover', 'Turnover', '成交额', '成交金额'])
         
-        # stock_zh_a_hist_tx 返回的列：['date', 'open', 'close', 'high', 'low', 'amount']
-        # amount 是成交额（金额），不是成交量（volume）
-        if not has_volume and has_amount_or_turnover:
-            print(f"[INFO] {symbol} 从 stock_zh_a_hist_tx 获取的数据缺少 volume 列（只有 amount 成交额），尝试从其他接口补全...")
+            # stock_zh_a_hist_tx 返回的列：['date', 'open', 'close', 'high', 'low', 'amount']
+            # amount 是成交额（金额），不是成交量（volume）
+            if not has_volume and has_amount_or_turnover:
+                print(f"[INFO] {symbol} 从 stock_zh_a_hist_tx 获取的数据缺少 volume 列（只有 amount 成交额），尝试从其他接口补全...")
             
-            # 先标准化以获取日期列，用于匹配（此时会自动从 amount 和 close 估算 volume）
-            df_temp = _normalize_history_dataframe(df_raw.copy())
+                # 先标准化以获取日期列，用于匹配（此时会自动从 amount 和 close 估算 volume）
+                df_temp = _normalize_history_dataframe(df_raw.copy())
             
-            if 'date' in df_temp.columns and len(df_temp) > 0:
-                target_dates = df_temp['date'].copy()
+                if 'date' in df_temp.columns and len(df_temp) > 0:
+                    target_dates = df_temp['date'].copy()
                 
-                # 尝试从其他接口获取真实的 volume 数据
-                try:
-                    volume_data = _try_fetch_volume_from_other_sources(symbol, target_dates, start_date_str, end_date_str)
+                    # 尝试从其他接口获取真实的 volume 数据
+                    try:
+                        volume_data = _try_fetch_volume_from_other_sources(symbol, target_dates, start_date_str, end_date_str)
                     
-                    if len(volume_data) > 0 and not volume_data.isna().all():
-                        # 成功从其他接口获取到 volume 数据，替换估算值
-                        # 保存原始的估算值作为回退
-                        estimated_volume = df_temp['volume'].copy() if 'volume' in df_temp.columns else None
-                        # 使用真实的 volume 数据（如果日期匹配）
-                        real_volume = df_temp['date'].map(volume_data)
-                        # 对于没有匹配到的日期，使用估算值（已有）
-                        if estimated_volume is not None:
-                            df_temp['volume'] = real_volume.fillna(estimated_volume)
+                        if len(volume_data) > 0 and not volume_data.isna().all():
+                            # 成功从其他接口获取到 volume 数据，替换估算值
+                            # 保存原始的估算值作为回退
+                            estimated_volume = df_temp['volume'].copy() if 'volume' in df_temp.columns else None
+                            # 使用真实的 volume 数据（如果日期匹配）
+                            real_volume = df_temp['date'].map(volume_data)
+                            # 对于没有匹配到的日期，使用估算值（已有）
+                            if estimated_volume is not None:
+                                df_temp['volume'] = real_volume.fillna(estimated_volume)
+                            else:
+                                df_temp['volume'] = real_volume.fillna(0)
+                            df = df_temp
+                            print(f"[INFO] {symbol} 成功从其他接口补全了 {len(volume_data)} 条真实 volume 数据")
                         else:
-                            df_temp['volume'] = real_volume.fillna(0)
-                        df = df_temp
-                        print(f"[INFO] {symbol} 成功从其他接口补全了 {len(volume_data)} 条真实 volume 数据")
-                    else:
-                        # 如果其他接口也失败，使用标准化函数自动估算（已在 _normalize_history_dataframe 中完成）
+                            # 如果其他接口也失败，使用标准化函数自动估算（已在 _normalize_history_dataframe 中完成）
+                            df = df_temp
+                            print(f"[INFO] {symbol} 无法从其他接口获取真实 volume，已使用成交额(amount)和收盘价估算 volume")
+                    except Exception as e:
+                        # 如果补全过程出错，使用已标准化的数据（已包含估算的 volume）
                         df = df_temp
-                        print(f"[INFO] {symbol} 无法从其他接口获取真实 volume，已使用成交额(amount)和收盘价估算 volume")
-                except Exception as e:
-                    # 如果补全过程出错，使用已标准化的数据（已包含估算的 volume）
-                    df = df_temp
-                    print(f"[WARN] {symbol} 补全 volume 时出错: {str(e)[:100]}，已使用成交额和收盘价估算")
+                        print(f"[WARN] {symbol} 补全 volume 时出错: {str(e)[:100]}，已使用成交额和收盘价估算")
+                else:
+                    # 如果标准化失败，直接标准化
+                    df = _normalize_history_dataframe(df_raw)
+            elif has_volume:
+                # 有 volume 列，直接标准化
+                df = _normalize_history_dataframe(df_raw)
             else:
-                # 如果标准化失败，直接标准化
+                # 既没有 volume 也没有 amount/turnover，直接标准化（会设置为 0）
                 df = _normalize_history_dataframe(df_raw)
-        elif has_volume:
-            # 有 volume 列，直接标准化
-            df = _normalize_history_dataframe(df_raw)
-        else:
-            # 既没有 volume 也没有 amount/turnover，直接标准化（会设置为 0）
-            df = _normalize_history_dataframe(df_raw)
-        if len(df) > 0:
-            # 过滤日期范围
-            df = df[df['date'] >= start_date]
             if len(df) > 0:
-                if lookback_days > 0:
-                    df = df.tail(lookback_days)
-                df['ma5'] = df['close'].rolling(5).mean()
-                df['ma10'] = df['close'].rolling(10).mean()
-                print(f"[INFO] {symbol} 成功使用 stock_zh_a_hist_tx 获取日线数据")
-                return df.reset_index(drop=True)
-    except Exception as exc:
-        exc_msg = str(exc)[:200]
-        print(f"[WARN] {symbol} stock_zh_a_hist_tx 失败: {exc_msg}，尝试备用方案...")
+                # 存储保存接口原始数据，由 bar_store 统一单位（df 中的成交量可能来自其他接口的补全或估算）
+                _save_daily_bars_to_store(symbol, df_raw, start_date, 'stock_zh_a_hist_tx')
+                # 过滤日期范围
+                df = df[df['date'] >= start_date]
+                if len(df) > 0:
+                    if lookback_days > 0:
+                        df = df.tail(lookback_days)
+                    df['ma5'] = df['close'].rolling(5).mean()
+                    df['ma10'] = df['close'].rolling(10).mean()
+                    print(f"[INFO] {symbol} 成功使用 stock_zh_a_hist_tx 获取日线数据")
+                    return df.reset_index(drop=True)
+        except Exception as exc:
+            exc_msg = str(exc)[:200]
+            print(f"[WARN] {symbol} stock_zh_a_hist_tx 失败: {exc_msg}，尝试备用方案...")
+        return None
     
-    # 方案2: 尝试 stock_zh_a_daily（一次性获取全量数据）
-    try:
-        df = fetch_with_retry(
-            ak.stock_zh_a_daily,
-            f"{symbol} 日线 (stock_zh_a_daily)",
-            symbol,
-            retries=3,
-            delay=2.5
-        )
-        df = _normalize_history_dataframe(df)
-        if len(df) > 0:
-            # 过滤日期范围
-            df = df[df['date'] >= start_date]
+    def via_daily():
+        # 方案2: 尝试 stock_zh_a_daily（一次性获取全量数据）
+        try:
+            df_raw = fetch_with_retry(
+                ak.stock_zh_a_daily,
+                f"{symbol} 日线 (stock_zh_a_daily)",
+                symbol,
+                retries=3,
+                delay=2.5
+            )
+            df = _normalize_history_dataframe(df_raw.copy())
             if len(df) > 0:
-                if lookback_days > 0:
-                    df = df.tail(lookback_days)
-                df['ma5'] = df['close'].rolling(5).mean()
-                df['ma10'] = df['close'].rolling(10).mean()
-                print(f"[INFO] {symbol} 成功使用 stock_zh_a_daily 获取日线数据")
-                return df.reset_index(drop=True)
-    except Exception as exc:
-        exc_msg = str(exc)[:200]
-        print(f"[WARN] {symbol} stock_zh_a_daily 失败: {exc_msg}，尝试备用方案...")
+                # 全量历史，从上市首日起完整覆盖
+                _save_daily_bars_to_store(symbol, df_raw, None, 'stock_zh_a_daily')
+                # 过滤日期范围
+                df = df[df['date'] >= start_date]
+                if len(df) > 0:
+                    if lookback_days > 0:
+                        df = df.tail(lookback_days)
+                    df['ma5'] = df['close'].rolling(5).mean()
+                    df['ma10'] = df['close'].rolling(10).mean()
+                    print(f"[INFO] {symbol} 成功使用 stock_zh_a_daily 获取日线数据")
+                    return df.reset_index(drop=True)
+        except Exception as exc:
+            exc_msg = str(exc)[:200]
+            print(f"[WARN] {symbol} stock_zh_a_daily 失败: {exc_msg}，尝试备用方案...")
+        return None
     
-    # 方案3: 尝试 stock_zh_a_hist（多个复权选项）
-    adjust_options = ['qfq', '', 'hfq']  # 前复权、无复权、后复权
-    for adjust in adjust_options:
-        try:
-            adjust_label = {'qfq': '前复权', 'hfq': '后复权', '': '无复权'}[adjust]
+    def via_hist():
+        # 方案3: 尝试 stock_zh_a_hist（多个复权选项）
+        adjust_options = ['qfq', '', 'hfq']  # 前复权、无复权、后复权
+        for adjust in adjust_options:
+            try:
+                adjust_label = {'qfq': '前复权', 'hfq': '后复权', '': '无复权'}[adjust]
             
-            def fetch_hist():
-                return ak.stock_zh_a_hist(
-                    symbol=symbol,
+                df_raw = fetch_with_retry(
+                    ak.stock_zh_a_hist,
+                    f"{symbol} 日线 (stock_zh_a_hist, {adjust_label})",
+                    symbol=plain_code(symbol),
                     period="daily",
                     start_date=start_date_str,
                     end_date=end_date_str,
-                    adjust=adjust or ""
+                    adjust=adjust or "",
+                    retries=3,
+                    delay=2.0
                 )
-            
-            df = fetch_with_retry(
-                fetch_hist,
-                f"{symbol} 日线 (stock_zh_a_hist, {adjust_label})",
-                retries=3,
-                delay=2.0
-            )
-            df = _normalize_history_dataframe(df)
-            if len(df) > 0:
-                if lookback_days > 0:
-                    df = df.tail(lookback_days)
-                df['ma5'] = df['close'].rolling(5).mean()
-                df['ma10'] = df['close'].rolling(10).mean()
-                print(f"[INFO] {symbol} 成功使用 stock_zh_a_hist ({adjust_label}) 获取日线数据")
-                return df.reset_index(drop=True)
-        except Exception as exc:
-            exc_msg = str(exc)[:200]
-            print(f"[WARN] {symbol} stock_zh_a_hist ({adjust}) 失败: {exc_msg}，继续尝试...")
-            continue
+                df = _normalize_history_dataframe(df_raw.copy())
+                if len(df) > 0:
+                    # 本地存储只保存不复权日线，复权结果只用于本次计算
+                    if not adjust:
+                        _save_daily_bars_to_store(symbol, df_raw, start_date, 'stock_zh_a_hist')
+                    if lookback_days > 0:
+                        df = df.tail(lookback_days)
+                    df['ma5'] = df['close'].rolling(5).mean()
+                    df['ma10'] = df['close'].rolling(10).mean()
+                    print(f"[INFO] {symbol} 成功使用 stock_zh_a_hist ({adjust_label}) 获取日线数据")
+                    return df.reset_index(drop=True)
+            except Exception as exc:
+                exc_msg = str(exc)[:200]
+                print(f"[WARN] {symbol} stock_zh_a_hist ({adjust}) 失败: {exc_msg}，继续尝试...")
+                continue
+        return None
+    
+    sources = {
+        'stock_zh_a_hist_tx': via_hist_tx,
+        'stock_zh_a_daily': via_daily,
+        'stock_zh_a_hist': via_hist,
+    }
+    for source_name in provider_health.order(sources):
+        df = sources[source_name]()
+        if df is not None:
+            return df
     
     # 所有方案都失败
     raise RuntimeError(f"无法获取 {symbol} 的日线数据，所有备用方案都已尝试")
 
 
-# 全局缓存实时行情数据，避免重复请求
-_cached_spot_data = None
-_cached_spot_time = None
-_CACHE_DURATION = 60  # 缓存60秒
+def _fetch_spot_dataframe() -> pd.DataFrame:
+    return fetch_with_retry(
+        ak.stock_zh_a_spot_em,
+        "实时行情（换手率）",
+        retries=3,
+        delay=2.0
+    )
+
 
 def get_turnover_rate(symbol: str) -> Optional[float]:
     """从实时行情API获取换手率（百分比，如5.0表示5%）。
     
     尝试多种方法：
-    1. 从全市场实时行情数据中查找
+    1. 从全市场实时行情快照中按代码索引查找（快照缓存60秒）
     2. 从单个股票实时行情接口获取
     3. 如果都失败，返回None
     """
-    global _cached_spot_data, _cached_spot_time
-    
-    # 方法1：从全市场实时行情数据中查找（使用缓存）
+    # 方法1：从全市场实时行情快照中查找（O(1) 索引）
     try:
-        current_time = time.time()
-        if _cached_spot_data is None or _cached_spot_time is None or (current_time - _cached_spot_time) > _CACHE_DURATION:
-            print(f"[DEBUG] 方法1：正在获取全市场实时行情数据...")
-            try:
-                _cached_spot_data = fetch_with_retry(
-                    ak.stock_zh_a_spot_em,
-                    "实时行情（换手率）",
-                    retries=3,  # 增加重试次数
-                    delay=2.0   # 增加延迟时间
-                )
-                _cached_spot_time = current_time
-                if _cached_spot_data is not None and not _cached_spot_data.empty:
-                    print(f"[DEBUG] 方法1：成功获取 {len(_cached_spot_data)} 条实时行情数据")
-                    print(f"[DEBUG] 方法1：数据列名: {list(_cached_spot_data.columns)}")
-                else:
-                    print(f"[WARN] 方法1：获取的数据为空")
-            except Exception as fetch_exc:
-                # 网络错误时，不打印完整堆栈，只打印关键信息
-                exc_msg = str(fetch_exc)
-                if 'Connection' in exc_msg or 'timeout' in exc_msg.lower() or 'urllib3' in exc_msg:
-                    print(f"[WARN] 方法1：网络连接失败，跳过（可能是网络问题或接口暂时不可用）")
-                else:
-                    print(f"[WARN] 方法1：获取数据失败: {exc_msg[:150]}")
-                _cached_spot_data = None
-        
-        df = _cached_spot_data
-        if df is not None and not df.empty:
-            # 查找股票代码列（更宽松的匹配）
-            code_col = None
-            for col in df.columns:
-                col_str = str(col)
-                col_lower = col_str.lower()
-                # 更宽松的匹配条件
-                if ('代码' in col_str or 'code' in col_lower) and '名称' not in col_str and 'name' not in col_lower:
-                    code_col = col
-                    break
-            
-            if code_col is None:
-                print(f"[DEBUG] 方法1：未找到代码列，所有列: {list(df.columns)}")
+        snapshot = get_spot_snapshot(_fetch_spot_dataframe)
+        if snapshot is not None:
+            if 'turnoverRate' not in snapshot.columns:
+                print(f"[DEBUG] 方法1：未找到换手率列")
+            elif snapshot.position(symbol) < 0:
+                print(f"[DEBUG] 方法1未找到匹配的股票代码: {symbol}")
             else:
-                symbol_clean = symbol.replace('sh', '').replace('sz', '').replace('SH', '').replace('SZ', '').strip()
-                print(f"[DEBUG] 方法1：查找股票代码 {symbol_clean}，代码列: {code_col}")
-                
-                # 查找换手率列（更宽松的匹配）
-                turnover_col = None
-                for col in df.columns:
-                    col_str = str(col)
-                    col_lower = col_str.lower()
-                    # 更宽松的匹配：换手、turnover、rate等关键词
-                    if ('换手' in col_str or 
-                        ('turnover' in col_lower and 'rate' in col_lower) or
-                        (col_lower == 'turnoverrate') or
-                        ('turnover' in col_lower and 'ratio' in col_lower)):
-                        turnover_col = col
-                        break
-                
-                if turnover_col is None:
-                    print(f"[DEBUG] 方法1：未找到换手率列，所有列: {list(df.columns)}")
-                else:
-                    print(f"[DEBUG] 方法1：找到换手率列: {turnover_col}")
-                    # 尝试匹配股票代码
-                    found = False
-                    for idx, row in df.iterrows():
-                        code_val = str(row[code_col]).replace('sh', '').replace('sz', '').replace('SH', '').replace('SZ', '').strip()
-                        if code_val == symbol_clean:
-                            found = True
-                            turnover_rate = row[turnover_col]
-                            print(f"[DEBUG] 方法1：找到匹配股票，换手率原始值: {turnover_rate} (类型: {type(turnover_rate)})")
-                            if pd.notna(turnover_rate):
-                                try:
-                                    # 尝试直接转换
-                                    rate_value = float(turnover_rate)
-                                    if 0 <= rate_value <= 1000:
-                                        print(f"[INFO] 方法1成功获取 {symbol} 换手率: {rate_value}%")
-                                        return rate_value
-                                    else:
-                                        print(f"[DEBUG] 方法1：换手率值超出合理范围: {rate_value}")
-                                except (ValueError, TypeError):
-                                    # 尝试移除百分号
-                                    try:
-                                        value_str = str(turnover_rate).replace('%', '').strip()
-                                        rate_value = float(value_str)
-                                        if 0 <= rate_value <= 1000:
-                                            print(f"[INFO] 方法1成功获取 {symbol} 换手率: {rate_value}%")
-                                            return rate_value
-                                    except (ValueError, TypeError) as e:
-                                        print(f"[DEBUG] 方法1解析 {symbol} 换手率值失败: {turnover_rate}, 错误: {e}")
-                    
-                    if not found:
-                        # 打印前几条数据用于调试
-                        print(f"[DEBUG] 方法1未找到匹配的股票代码: {symbol_clean}")
-                        if len(df) > 0:
-                            print(f"[DEBUG] 方法1：前3条数据的代码列值: {df[code_col].head(3).tolist()}")
+                rate_value = snapshot.turnover_rate(symbol)
+                if rate_value is not None and 0 <= rate_value <= 1000:
+                    print(f"[INFO] 方法1成功获取 {symbol} 换手率: {rate_value}%")
+                    return rate_value
+                print(f"[DEBUG] 方法1：换手率值无效: {rate_value}")
     except Exception as exc:
         exc_msg = str(exc)
         # 对于网络错误，不打印完整堆栈
@@ -656,8 +567,9 @@ def get_turnover_rate(symbol: str) -> Optional[float]:
         df_info = None
         try:
             df_info = fetch_with_retry(
-                lambda: ak.stock_individual_info_em(symbol=full_code),
+                ak.stock_individual_info_em,
                 f"{symbol} 个股信息（方法2a）",
+                symbol=full_code,
                 retries=2,
                 delay=1.0
             )
@@ -667,8 +579,9 @@ def get_turnover_rate(symbol: str) -> Optional[float]:
                 # 只有非网络错误才尝试其他方法
                 try:
                     df_info = fetch_with_retry(
-                        lambda: ak.stock_individual_info_em(stock=full_code),
+                        ak.stock_individual_info_em,
                         f"{symbol} 个股信息（方法2b）",
+                        stock=full_code,
                         retries=2,
                         delay=1.0
                     )
@@ -676,8 +589,9 @@ def get_turnover_rate(symbol: str) -> Optional[float]:
                     try:
                         # 尝试不带前缀的代码
                         df_info = fetch_with_retry(
-                            lambda: ak.stock_individual_info_em(symbol=symbol_clean),
+                            ak.stock_individual_info_em,
                             f"{symbol} 个股信息（方法2c）",
+                            symbol=symbol_clean,
                             retries=2,
                             delay=1.0
                         )
@@ -731,8 +645,9 @@ def get_turnover_rate(symbol: str) -> Optional[float]:
         # 尝试使用 stock_zh_a_spot 获取单个股票实时行情
         try:
             df_spot = fetch_with_retry(
-                lambda: ak.stock_zh_a_spot(symbol=full_code),
+                ak.stock_zh_a_spot,
                 f"{symbol} 实时行情（方法3）",
+                symbol=full_code,
                 retries=2,
                 delay=1.0
             )
@@ -857,36 +772,29 @@ def evaluate_stock(candidate: Dict) -> Dict:
 
 def run_strategy(top_hot: int, top_themes: int, theme_members: int) -> List[Dict]:
     """执行策略并返回评估结果。"""
-    proxy_backup = disable_global_proxy()
-    try:
-        hot_df = load_hot_stock_rank(top_hot)
-        candidates = build_hot_concepts(hot_df, top_themes, theme_members)
-        if not candidates:
-            print("[INFO] 未找到满足热点题材约束的股票。")
-            return []
-        results = []
-        total = len(candidates)
-        for idx, candidate in enumerate(candidates, 1):
-            try:
-                symbol = candidate.get('stock_code', 'unknown')
-                print(f"[INFO] 正在评估 ({idx}/{total}): {symbol}")
-                
-                # 在评估股票前添加短暂延迟，避免请求过于频繁
-                if idx > 1:
-                    time.sleep(0.5)  # 每个股票之间延迟0.5秒
-                
-                evaluated = evaluate_stock(candidate)
-            except Exception as exc:  # pylint: disable=broad-except
-                symbol = candidate.get('stock_code', 'unknown')
-                exc_msg = str(exc)[:200]  # 截断过长的错误信息
-                print(f"[WARN] 评估 {symbol} 失败: {exc_msg}")
-                candidate['passed'] = False
-                candidate['fail_reason'] = f'数据获取失败: {exc_msg}'
-                evaluated = candidate
-            results.append(evaluated)
-        return results
-    finally:
-        restore_global_proxy(proxy_backup)
+    # 代理策略在共享HTTP会话上统一生效（可重复调用），不再临时修改环境变量
+    http_session.install()
+    hot_df = load_hot_stock_rank(top_hot)
+    candidates = build_hot_concepts(hot_df, top_themes, theme_members)
+    if not candidates:
+        print("[INFO] 未找到满足热点题材约束的股票。")
+        return []
+    results = []
+    total = len(candidates)
+    for idx, candidate in enumerate(candidates, 1):
+        try:
+            symbol = candidate.get('stock_code', 'unknown')
+            print(f"[INFO] 正在评估 ({idx}/{total}): {symbol}")
+            evaluated = evaluate_stock(candidate)
+        except Exception as exc:  # pylint: disable=broad-except
+            symbol = candidate.get('stock_code', 'unknown')
+            exc_msg = str(exc)[:200]  # 截断过长的错误信息
+            print(f"[WARN] 评估 {symbol} 失败: {exc_msg}")
+            candidate['passed'] = False
+            candidate['fail_reason'] = f'数据获取失败: {exc_msg}'
+            evaluated = candidate
+        results.append(evaluated)
+    return results
 
 
 def format_results(results: List[Dict]) -> None:
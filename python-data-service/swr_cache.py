@@ -0,0 +1,118 @@
+"""
+Stale-While-Revalidate 缓存 - 过期后立即返回旧值，由单个后台线程刷新
+
+    - 尚无数据：同步加载（并发的首次请求只加载一次）
+    - 数据未过期：直接返回（过期时间默认为获取后 ttl 秒，也可由 expiry 按获取时间计算，
+      例如闭市期间取得的数据一直有效到下一个交易时段）
+    - 数据已过期：返回旧值并标记 stale，同时启动一次后台刷新
+    - 后台刷新失败：继续提供旧值，记录错误，间隔 retry_interval 后再尝试
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+import metrics
+
+
+@dataclass
+class CachedValue:
+    value: Any
+    fetched_at: float
+    stale: bool
+    refreshing: bool
+    last_error: Optional[str] = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class StaleWhileRevalidateCache:
+    """单个数据集的 SWR 缓存。loader 失败时应抛出异常，而不是返回空值。"""
+
+    def __init__(self, name: str, loader: Callable[[], Any], ttl: float, retry_interval: float = 10.0,
+                 expiry: Optional[Callable[[float, float], float]] = None):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        # expiry(fetched_at, ttl) -> 过期时间戳
+        self.expiry = expiry
+        self.retry_interval = retry_interval
+        self._value: Any = None
+        self._fetched_at = 0.0
+        self._has_value = False
+        self._last_error: Optional[str] = None
+        self._last_attempt = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _load(self) -> None:
+        self._last_attempt = time.time()
+        value = self.loader()
+        with self._lock:
+            self._value = value
+            self._fetched_at = time.time()
+            self._has_value = True
+            self._last_error = None
+
+    def _refresh_in_background(self) -> None:
+        try:
+            with self._load_lock:
+                self._load()
+            print(f"[{datetime.now()}] ✅ [{self.name}] 后台刷新完成")
+        except Exception as exc:  # pylint: disable=broad-except
+            with self._lock:
+                self._last_error = f"{type(exc).__name__}: {str(exc)[:200]}"
+            print(f"[{datetime.now()}] ⚠️ [{self.name}] 后台刷新失败，继续使用旧数据: {self._last_error}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _expired(self, now: float) -> bool:
+        """调用方需持有 self._lock。"""
+        if self.expiry is not None:
+            return now >= self.expiry(self._fetched_at, self.ttl)
+        return now - self._fetched_at > self.ttl
+
+    def _snapshot(self) -> CachedValue:
+        with self._lock:
+            return CachedValue(
+                value=self._value,
+                fetched_at=self._fetched_at,
+                stale=self._expired(time.time()),
+                refreshing=self._refreshing,
+                last_error=self._last_error,
+            )
+
+    def get(self) -> CachedValue:
+        """返回缓存值；首次加载失败时抛出 loader 的异常。"""
+        if not self._has_value:
+            with self._load_lock:
+                if not self._has_value:
+                    self._load()
+            metrics.observe_cache(self.name, 'miss')
+            return self._snapshot()
+
+        now = time.time()
+        with self._lock:
+            expired = self._expired(now)
+            can_retry = now - self._last_attempt >= self.retry_interval
+            start_refresh = expired and can_retry and not self._refreshing
+            if start_refresh:
+                self._refreshing = True
+        if start_refresh:
+            threading.Thread(target=self._refresh_in_background, name=f"swr-{self.name}", daemon=True).start()
+        metrics.observe_cache(self.name, 'stale' if expired else 'hit')
+        return self._snapshot()
+
+    def peek(self) -> Optional[CachedValue]:
+        """不触发加载或刷新，没有数据时返回 None。"""
+        if not self._has_value:
+            return None
+        return self._snapshot()
@@ -0,0 +1,236 @@
+"""
+股票代码主表 - 代码、简称、交易所、板块、行业、上市日期、股本等静态属性
+
+一次性从交易所的批量股票列表构建并保存到本地 JSON：
+    - 上交所主板/科创板 stock_info_sh_name_code：简称、上市日期
+    - 深交所 stock_info_sz_name_code：简称、板块、上市日期、总股本、流通股本、所属行业（证监会行业）
+    - 北交所 stock_info_bj_name_code：简称、上市日期、总股本、流通股本、所属行业
+后台线程每 REFRESH_INTERVAL 秒刷新一次。各接口按代码查简称等静态属性时只需查内存字典，
+不再为此单独请求 stock_individual_info_em。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+from lazy_import import lazy_import
+
+# pandas 延迟导入（见 lazy_import.py），导入本模块时不加载
+pd = lazy_import('pandas')
+
+DEFAULT_MASTER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'symbol_master.json')
+
+REFRESH_INTERVAL = int(os.getenv('SYMBOL_MASTER_REFRESH', str(24 * 3600)))
+# 刷新失败后的重试间隔（秒）
+RETRY_AFTER_FAILURE_SECONDS = 1800
+
+FIELDS = ('code', 'name', 'exchange', 'board', 'industry', 'listingDate', 'totalShares', 'floatShares')
+
+
+def _default_fetch(name: str, **kwargs) -> pd.DataFrame:
+    import akshare as ak  # pylint: disable=import-outside-toplevel
+    from upstream import ak_call  # pylint: disable=import-outside-toplevel
+    return ak_call(getattr(ak, name), **kwargs)
+
+
+def board_of(code: str) -> str:
+    """根据代码前缀推断板块。"""
+    if code.startswith('688') or code.startswith('689'):
+        return '科创板'
+    if code.startswith('30'):
+        return '创业板'
+    if code.startswith(('8', '4', '92')):
+        return '北交所'
+    return '主板'
+
+
+def _clean_text(value) -> Optional[str]:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def _to_number(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.replace(',', '').strip()
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if pd.isna(number) else number
+
+
+def _to_date_str(value) -> Optional[str]:
+    if value is None:
+        return None
+    parsed = pd.to_datetime(value, errors='coerce')
+    return None if pd.isna(parsed) else parsed.strftime('%Y-%m-%d')
+
+
+class SymbolMaster:
+    """线程安全的股票代码主表。fetch(name, **kwargs) 按AKShare函数名取数，便于替换。"""
+
+    def __init__(self, path: Optional[str] = None, fetch: Callable[..., pd.DataFrame] = _default_fetch):
+        self.path = path or os.getenv('SYMBOL_MASTER_PATH', DEFAULT_MASTER_PATH)
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict] = {}
+        self._built_at = 0.0
+        self._last_attempt = 0.0
+        self._loaded = False
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as fh:
+                        payload = json.load(fh)
+                    self._records = payload.get('records', {})
+                    self._built_at = payload.get('builtAt', 0.0)
+                    print(f"[{datetime.now()}] 已加载股票代码主表: {len(self._records)} 只股票")
+                except Exception as exc:  # pylint: disable=broad-except
+                    print(f"[{datetime.now()}] ⚠️ 股票代码主表文件损坏，忽略: {exc}")
+            self._loaded = True
+
+    def _persist(self) -> None:
+        with self._lock:
+            payload = {'builtAt': self._built_at, 'records': dict(self._records)}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump(payload, fh, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 写入股票代码主表失败: {exc}")
+
+    # ---------- 构建 ----------
+
+    def _collect(self, records: Dict[str, Dict], df: Optional[pd.DataFrame], code_col: str, name_col: str,
+                 exchange: str, date_col: Optional[str] = None, total_col: Optional[str] = None,
+                 float_col: Optional[str] = None, industry_col: Optional[str] = None,
+                 board_col: Optional[str] = None) -> int:
+        if df is None or df.empty or code_col not in df.columns:
+            return 0
+        count = 0
+        for row in df.to_dict('records'):
+            code = str(row.get(code_col, '')).strip().split('.')[0].zfill(6)
+            if not code.isdigit() or not code.strip('0'):
+                continue
+            record = records.setdefault(code, {'code': code})
+            record['name'] = _clean_text(row.get(name_col)) or record.get('name')
+            record['exchange'] = exchange
+            record['board'] = (_clean_text(row.get(board_col)) if board_col else None) or board_of(code)
+            if industry_col:
+                record['industry'] = _clean_text(row.get(industry_col))
+            if date_col:
+                record['listingDate'] = _to_date_str(row.get(date_col))
+            if total_col:
+                record['totalShares'] = _to_number(row.get(total_col))
+            if float_col:
+                record['floatShares'] = _to_number(row.get(float_col))
+            count += 1
+        return count
+
+    def refresh(self) -> int:
+        """从交易所股票列表重建主表，返回股票数；所有来源都失败时抛出异常并保留旧数据。"""
+        self._last_attempt = time.time()
+        sources = [
+            ('上交所主板', 'stock_info_sh_name_code', {'symbol': '主板A股'},
+             dict(code_col='证券代码', name_col='证券简称', exchange='SH', date_col='上市日期')),
+            ('上交所科创板', 'stock_info_sh_name_code', {'symbol': '科创板'},
+             dict(code_col='证券代码', name_col='证券简称', exchange='SH', date_col='上市日期')),
+            ('深交所', 'stock_info_sz_name_code', {'symbol': 'A股列表'},
+             dict(code_col='A股代码', name_col='A股简称', exchange='SZ', date_col='A股上市日期',
+                  total_col='A股总股本', float_col='A股流通股本', industry_col='所属行业', board_col='板块')),
+            ('北交所', 'stock_info_bj_name_code', {},
+             dict(code_col='证券代码', name_col='证券简称', exchange='BJ', date_col='上市日期',
+                  total_col='总股本', float_col='流通股本', industry_col='所属行业')),
+        ]
+        records: Dict[str, Dict] = {}
+        failed = []
+        for label, func_name, kwargs, columns in sources:
+            try:
+                count = self._collect(records, self._fetch(func_name, **kwargs), **columns)
+                print(f"[{datetime.now()}] 股票代码主表: {label} {count} 只")
+            except Exception as exc:  # pylint: disable=broad-except
+                failed.append(label)
+                print(f"[{datetime.now()}] ⚠️ 股票代码主表: 获取{label}列表失败: {str(exc)[:150]}")
+        if not records:
+            raise RuntimeError("所有交易所股票列表都获取失败")
+
+        with self._lock:
+            # 某个交易所失败时保留该交易所的旧记录
+            for code, record in self._records.items():
+                records.setdefault(code, record)
+            self._records = {code: {field: record.get(field) for field in FIELDS} for code, record in records.items()}
+            self._built_at = time.time()
+        self._persist()
+        print(f"[{datetime.now()}] ✅ 股票代码主表已更新: {len(records)} 只股票"
+              + (f"（失败: {', '.join(failed)}）" if failed else ''))
+        return len(records)
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 刷新股票代码主表失败: {str(exc)[:150]}")
+
+    def _start_refresh_if_due(self) -> None:
+        now = time.time()
+        if now - self._built_at <= REFRESH_INTERVAL or now - self._last_attempt < RETRY_AFTER_FAILURE_SECONDS:
+            return
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._last_attempt = now
+            self._refresh_thread = threading.Thread(target=self._refresh_in_background, name='symbol-master',
+                                                    daemon=True)
+            self._refresh_thread.start()
+
+    # ---------- 查询 ----------
+
+    def get(self, code: str) -> Optional[Dict]:
+        """按代码查询静态属性（内存字典），主表中没有时返回 None。"""
+        self._ensure_loaded()
+        self._start_refresh_if_due()
+        record = self._records.get(str(code).strip().zfill(6))
+        return dict(record) if record is not None else None
+
+    def name_of(self, code: str) -> Optional[str]:
+        record = self.get(code)
+        return record.get('name') if record else None
+
+    def bulk(self, codes: Iterable[str]) -> Dict[str, Dict]:
+        self._ensure_loaded()
+        self._start_refresh_if_due()
+        result = {}
+        for code in codes:
+            clean = str(code).strip().zfill(6)
+            record = self._records.get(clean)
+            if record is not None:
+                result[clean] = dict(record)
+        return result
+
+    def status(self) -> Dict:
+        self._ensure_loaded()
+        return {
+            'symbols': len(self._records),
+            'builtAt': datetime.fromtimestamp(self._built_at).isoformat() if self._built_at else None,
+        }
+
+
+symbol_master = SymbolMaster()
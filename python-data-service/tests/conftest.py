@@ -0,0 +1,20 @@
+"""测试公共设置：服务模块是平铺的脚本文件，把服务目录加入 sys.path 后直接导入。"""
+
+import os
+import sys
+import tempfile
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+# 持久化文件写到临时目录，测试不读写 data/ 下的真实缓存；不启动预热
+_TMP_DIR = tempfile.mkdtemp(prefix='stock-service-tests-')
+for _name, _file in (('TRADE_CALENDAR_PATH', 'trade_calendar.json'),
+                     ('INDUSTRY_DIRECTORY_PATH', 'industry_directory.json'),
+                     ('SYMBOL_MASTER_PATH', 'symbol_master.json'),
+                     ('FUNDAMENTAL_CACHE_PATH', 'fundamental_cache.json'),
+                     ('ARTICLE_CACHE_PATH', 'article_cache.sqlite3')):
+    os.environ.setdefault(_name, os.path.join(_TMP_DIR, _file))
+os.environ.setdefault('STOCK_BAR_STORE_DIR', os.path.join(_TMP_DIR, 'bars'))
+os.environ.setdefault('WARMUP_ENABLED', '0')
@@ -0,0 +1,95 @@
+import itertools
+
+import pytest
+
+import article_cache as article_cache_module
+import stock_data_service as svc
+from article_cache import ArticleCache
+
+URL = 'https://finance.example.com/a/1.html'
+HTML = '<html><body><div class="article-content"><p>央行宣布降准0.5个百分点</p></div></body></html>'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """每次取时间递增1秒，保证最近访问时间有先后。"""
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(article_cache_module.time, 'time', lambda: float(next(ticks)))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ArticleCache(path=str(tmp_path / 'articles.sqlite3'))
+    monkeypatch.setattr(svc, 'article_cache', cache)
+    return cache
+
+
+class FakeResponse:
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+        self.encoding = 'utf-8'
+        self.apparent_encoding = 'utf-8'
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+def test_lru_evicts_least_recently_accessed(tmp_path, clock):
+    cache = ArticleCache(path=str(tmp_path / 'articles.sqlite3'), max_entries=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    # 访问 a 后，b 成为最久未访问的条目
+    assert cache.get('a').content == 'A'
+    cache.put('c', 'C')
+
+    assert cache.get('b') is None
+    assert cache.get('a').content == 'A'
+    assert cache.get('c').content == 'C'
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'articles.sqlite3')
+    ArticleCache(path=path).put(URL, '正文', etag='"v1"', last_modified='Mon, 12 Oct 2026 08:00:00 GMT')
+
+    cached = ArticleCache(path=path).get(URL)
+    assert cached.content == '正文'
+    assert cached.etag == '"v1"'
+    assert cached.last_modified == 'Mon, 12 Oct 2026 08:00:00 GMT'
+    assert not cached.needs_revalidation
+
+
+def test_etag_round_trip_revalidates_with_304(cache, monkeypatch):
+    session = FakeSession(FakeResponse(200, HTML, {'ETag': '"v1"', 'Last-Modified': 'Mon, 12 Oct 2026 08:00:00 GMT'}),
+                          FakeResponse(304))
+    content = svc._fetch_news_article_content(URL, session=session)
+    assert '降准' in content
+    assert 'If-None-Match' not in session.requests[0]
+
+    # 校验期内直接返回缓存，不访问网络
+    assert svc._fetch_news_article_content(URL, session=session) == content
+    assert len(session.requests) == 1
+
+    # 超过校验期后携带 ETag/Last-Modified 做条件请求，304 时沿用缓存并刷新校验时间
+    monkeypatch.setattr(article_cache_module, 'REVALIDATE_AFTER_SECONDS', -1)
+    assert svc._fetch_news_article_content(URL, session=session) == content
+    assert session.requests[1]['If-None-Match'] == '"v1"'
+    assert session.requests[1]['If-Modified-Since'] == 'Mon, 12 Oct 2026 08:00:00 GMT'
+    monkeypatch.setattr(article_cache_module, 'REVALIDATE_AFTER_SECONDS', 3600)
+    assert not cache.get(URL).needs_revalidation
+
+
+def test_upstream_error_falls_back_to_cached_content(cache, monkeypatch):
+    cache.put(URL, '旧正文', etag='"v1"')
+    monkeypatch.setattr(article_cache_module, 'REVALIDATE_AFTER_SECONDS', -1)
+
+    session = FakeSession(FakeResponse(503))
+    assert svc._fetch_news_article_content(URL, session=session) == '旧正文'
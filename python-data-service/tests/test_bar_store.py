@@ -0,0 +1,205 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+import bar_store as bar_store_module
+from bar_store import BAR_COLUMNS, BAR_SCHEMA_VERSION, DailyBarStore, normalize_bars
+
+
+def daily_frame():
+    """stock_zh_a_daily：volume 为股，amount 为成交额（元），turnover 为换手率。"""
+    return pd.DataFrame({
+        'date': ['2025-01-02', '2025-01-03'],
+        'open': [10.0, 10.2], 'high': [10.5, 10.6], 'low': [9.9, 10.1], 'close': [10.2, 10.4],
+        'volume': [1_000_000.0, 2_000_000.0],
+        'amount': [10_200_000.0, 20_800_000.0],
+        'outstanding_share': [1e8, 1e8],
+        'turnover': [0.01, 0.02],
+    })
+
+
+def hist_frame():
+    """stock_zh_a_hist：成交量为手，成交额为元，换手率为百分比。"""
+    return pd.DataFrame({
+        '日期': ['2025-01-02', '2025-01-03'], '股票代码': ['600000', '600000'],
+        '开盘': [10.0, 10.2], '收盘': [10.2, 10.4], '最高': [10.5, 10.6], '最低': [9.9, 10.1],
+        '成交量': [10_000, 20_000], '成交额': [10_200_000.0, 20_800_000.0],
+        '振幅': [5.9, 4.9], '涨跌幅': [2.0, 1.96], '涨跌额': [0.2, 0.2], '换手率': [1.0, 2.0],
+    })
+
+
+def tx_frame():
+    """stock_zh_a_hist_tx：volume 为股，turnover 为换手率，amount 为成交额（元）。"""
+    return pd.DataFrame({
+        'date': ['2025-01-02', '2025-01-03'],
+        'open': [10.0, 10.2], 'close': [10.2, 10.4], 'high': [10.5, 10.6], 'low': [9.9, 10.1],
+        'volume': [1_000_000.0, 2_000_000.0], 'turnover': [0.01, 0.02],
+        'amount': [10_200_000.0, 20_800_000.0],
+    })
+
+
+@pytest.mark.parametrize('frame', [daily_frame, hist_frame, tx_frame])
+def test_normalize_bars_uses_shares_and_yuan_for_every_source(frame):
+    bars = normalize_bars(frame())
+
+    assert list(bars.columns) == BAR_COLUMNS
+    assert bars['volume'].tolist() == [1_000_000.0, 2_000_000.0]
+    assert bars['turnover'].tolist() == [10_200_000.0, 20_800_000.0]
+    assert bars['close'].tolist() == [10.2, 10.4]
+    assert bars['date'].tolist() == [pd.Timestamp('2025-01-02'), pd.Timestamp('2025-01-03')]
+
+
+def test_normalize_bars_is_idempotent():
+    bars = normalize_bars(hist_frame())
+    pd.testing.assert_frame_equal(normalize_bars(bars), bars)
+
+
+def test_normalize_bars_keeps_missing_amount_as_nan():
+    frame = tx_frame().drop(columns=['amount'])
+    bars = normalize_bars(frame)
+    assert bars['turnover'].isna().all()
+
+
+def test_normalize_bars_requires_date_and_close():
+    with pytest.raises(ValueError):
+        normalize_bars(pd.DataFrame({'open': [1.0]}))
+
+
+def test_merge_replaces_data_written_with_an_older_schema(tmp_path):
+    store = DailyBarStore(root=str(tmp_path), fmt='pickle')
+    legacy = pd.DataFrame({'date': pd.to_datetime(['2024-12-31']), 'open': [9.0], 'high': [9.0], 'low': [9.0],
+                           'close': [9.0], 'volume': [100.0], 'turnover': [0.01]})
+    legacy.to_pickle(os.path.join(tmp_path, 'sh600000.pkl'))
+    with open(os.path.join(tmp_path, 'sh600000.meta.json'), 'w', encoding='utf-8') as fh:
+        json.dump({'coverageStart': None, 'lastSync': '2025-01-01T00:00:00'}, fh)
+
+    assert store.read('sh600000') is None
+    assert not store.covers('sh600000', pd.Timestamp('2025-01-01'))
+
+    merged = store.merge('sh600000', daily_frame(), coverage_start=None, source='stock_zh_a_daily')
+    assert merged['date'].min() == pd.Timestamp('2025-01-02')
+    assert store.meta('sh600000')['schema'] == BAR_SCHEMA_VERSION
+    assert store.covers('sh600000', pd.Timestamp('2000-01-01'))
+
+
+def test_merge_combines_sources_in_one_unit(tmp_path):
+    store = DailyBarStore(root=str(tmp_path), fmt='pickle')
+    store.merge('sh600000', daily_frame().iloc[:1], coverage_start=None, source='stock_zh_a_daily')
+    merged = store.merge('sh600000', hist_frame().iloc[1:], coverage_start=pd.Timestamp('2025-01-03'),
+                         source='stock_zh_a_hist')
+
+    assert merged['volume'].tolist() == [1_000_000.0, 2_000_000.0]
+    assert merged['turnover'].tolist() == [10_200_000.0, 20_800_000.0]
+
+
+def test_plain_code_strips_exchange_prefix():
+    assert bar_store_module.plain_code('sh600000') == '600000'
+    assert bar_store_module.plain_code('000001') == '000001'
+
+
+class FakeUpstream:
+    """替换 akshare 的日线接口，记录调用参数；返回值为 DataFrame 或要抛出的异常。"""
+
+    def __init__(self, monkeypatch, **responses):
+        self.calls = []
+        for name, response in responses.items():
+            monkeypatch.setattr(f'akshare.{name}', self._fetcher(name, response))
+        # 直接调用，不经过熔断器和限速，测试之间互不影响
+        monkeypatch.setattr('upstream.ak_call', lambda func, *args, **kwargs: func(*args, **kwargs))
+
+    def _fetcher(self, name, response):
+        def fetch(**kwargs):
+            self.calls.append((name, kwargs))
+            if isinstance(response, Exception):
+                raise response
+            return response
+        fetch.__name__ = fetch.__qualname__ = name
+        return fetch
+
+
+@pytest.fixture
+def stale_store(tmp_path, monkeypatch):
+    """已入库到 2025-01-02、最新交易日为 2025-01-03 的存储，上次同步已过期。"""
+    store = DailyBarStore(root=str(tmp_path), fmt='pickle')
+    store.merge('sh600000', daily_frame().iloc[:1], coverage_start=None, source='stock_zh_a_daily')
+    monkeypatch.setattr(bar_store_module, 'expected_last_trade_date', lambda now=None: pd.Timestamp('2025-01-03'))
+    monkeypatch.setattr(bar_store_module.trading_calendar, 'expires_at', lambda synced_at, ttl: 0.0)
+    return store
+
+
+def sync(store):
+    return bar_store_module.sync_tail('sh600000', store=store, now=pd.Timestamp('2025-01-03 16:00').to_pydatetime())
+
+
+def test_sync_tail_calls_hist_with_bare_code(stale_store, monkeypatch):
+    upstream = FakeUpstream(monkeypatch, stock_zh_a_hist=hist_frame(), stock_zh_a_hist_tx=tx_frame())
+
+    assert sync(stale_store) == 1
+    name, kwargs = upstream.calls[0]
+    assert name == 'stock_zh_a_hist'
+    assert kwargs['symbol'] == '600000'
+    assert kwargs['adjust'] == ''
+    assert stale_store.last_date('sh600000') == pd.Timestamp('2025-01-03')
+
+
+def test_sync_tail_treats_empty_source_as_miss(stale_store, monkeypatch):
+    upstream = FakeUpstream(monkeypatch, stock_zh_a_hist=pd.DataFrame(), stock_zh_a_hist_tx=tx_frame())
+    last_sync = stale_store.meta('sh600000')['lastSync']
+
+    assert sync(stale_store) == 1
+    assert [name for name, _ in upstream.calls] == ['stock_zh_a_hist', 'stock_zh_a_hist_tx']
+    assert stale_store.meta('sh600000')['source'] == 'stock_zh_a_hist_tx'
+    assert stale_store.meta('sh600000')['lastSync'] != last_sync
+
+
+def test_sync_tail_marks_synced_only_when_all_sources_are_empty(stale_store, monkeypatch):
+    FakeUpstream(monkeypatch, stock_zh_a_hist=pd.DataFrame(), stock_zh_a_hist_tx=tx_frame().iloc[:1])
+    last_sync = stale_store.meta('sh600000')['lastSync']
+
+    assert sync(stale_store) == 0
+    assert stale_store.meta('sh600000')['lastSync'] != last_sync
+
+
+def test_sync_tail_does_not_mark_synced_when_a_source_failed(stale_store, monkeypatch):
+    FakeUpstream(monkeypatch, stock_zh_a_hist=ConnectionError('reset'), stock_zh_a_hist_tx=pd.DataFrame())
+    last_sync = stale_store.meta('sh600000')['lastSync']
+
+    with pytest.raises(RuntimeError):
+        sync(stale_store)
+    assert stale_store.meta('sh600000')['lastSync'] == last_sync
+
+
+def test_sync_tail_skips_upstream_when_no_trading_day_passed(stale_store, monkeypatch):
+    upstream = FakeUpstream(monkeypatch, stock_zh_a_hist=hist_frame(), stock_zh_a_hist_tx=tx_frame())
+    monkeypatch.setattr(bar_store_module, 'expected_last_trade_date', lambda now=None: pd.Timestamp('2025-01-02'))
+
+    assert sync(stale_store) == 0
+    assert upstream.calls == []
+
+
+def test_sync_tail_returns_none_without_local_data(tmp_path, monkeypatch):
+    FakeUpstream(monkeypatch, stock_zh_a_hist=hist_frame(), stock_zh_a_hist_tx=tx_frame())
+    store = DailyBarStore(root=str(tmp_path), fmt='pickle')
+    assert bar_store_module.sync_tail('sh600000', store=store) is None
+
+
+@pytest.mark.parametrize('frame, source', [
+    (daily_frame, 'stock_zh_a_daily'), (hist_frame, 'stock_zh_a_hist'), (tx_frame, 'stock_zh_a_hist_tx')])
+def test_store_and_upstream_fallback_report_the_same_volume(tmp_path, frame, source):
+    import strategy_hot_volume_breakout as strategy
+
+    store = DailyBarStore(root=str(tmp_path), fmt='pickle')
+    stored = store.merge('sh600000', frame(), coverage_start=None, source=source)
+    fallback = strategy._normalize_history_dataframe(frame())
+
+    assert fallback['volume'].tolist() == stored['volume'].tolist() == [1_000_000.0, 2_000_000.0]
+    assert fallback['turnover'].tolist() == stored['turnover'].tolist()
+
+
+def test_upstream_fallback_estimates_missing_volume_in_shares():
+    import strategy_hot_volume_breakout as strategy
+
+    fallback = strategy._normalize_history_dataframe(tx_frame().drop(columns=['volume']))
+    assert fallback['volume'].tolist() == pytest.approx([1_000_000.0, 2_000_000.0])
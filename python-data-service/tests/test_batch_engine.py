@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import batch_engine
+import stock_data_service as svc
+from batch_engine import run_batch
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    """单线程的共享线程池，模拟线程池被其他批次占满。"""
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(batch_engine, '_executor', executor)
+    yield executor
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_window_limits_concurrency_and_yields_in_completion_order():
+    lock = threading.Lock()
+    active, peak = [0], [0]
+
+    def fn(delay):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(delay)
+        with lock:
+            active[0] -= 1
+        return delay
+
+    outcomes = list(run_batch([0.4, 0.05, 0.2, 0.3], fn, concurrency=2, item_timeout=5))
+
+    assert peak[0] == 2
+    assert [o.index for o in outcomes] == [1, 2, 0, 3]
+    assert all(o.ok and o.value == o.key for o in outcomes)
+
+
+def test_failed_item_does_not_affect_others():
+    def fn(key):
+        if key == 'bad':
+            raise LookupError('无数据')
+        return key.upper()
+
+    outcomes = {o.key: o for o in run_batch(['a', 'bad', 'c'], fn, concurrency=3, item_timeout=5)}
+
+    assert outcomes['bad'].error == 'LookupError: 无数据'
+    assert not outcomes['bad'].timed_out
+    assert [outcomes[k].value for k in ('a', 'c')] == ['A', 'C']
+
+
+def test_slow_item_times_out_and_frees_the_window():
+    release = threading.Event()
+
+    def fn(key):
+        if key == 'slow':
+            release.wait(5)
+        return key
+
+    started = time.time()
+    try:
+        outcomes = list(run_batch(['slow', 'a', 'b'], fn, concurrency=1, item_timeout=0.2))
+    finally:
+        release.set()
+
+    assert [(o.key, o.ok, o.timed_out) for o in outcomes] == [('slow', False, True), ('a', True, False),
+                                                              ('b', True, False)]
+    assert time.time() - started < 1.0
+
+
+def test_queue_time_does_not_count_toward_item_timeout(small_pool):
+    # 线程池只有一个线程：第二个条目排队 0.15 秒，执行 0.15 秒，总计超过 item_timeout 但执行时间没有
+    outcomes = list(run_batch(['a', 'b'], lambda key: time.sleep(0.15) or key, concurrency=2, item_timeout=0.25))
+
+    assert [(o.key, o.ok) for o in outcomes] == [('a', True), ('b', True)]
+    assert all(o.elapsed < 0.25 for o in outcomes)
+
+
+def test_closing_the_iterator_cancels_queued_items(small_pool):
+    calls = []
+
+    def fn(key):
+        calls.append(key)
+        time.sleep(0.1)
+        return key
+
+    outcomes = run_batch(['a', 'b', 'c'], fn, concurrency=3, item_timeout=5)
+    assert next(outcomes).key == 'a'
+    outcomes.close()
+    time.sleep(0.3)
+
+    # b 可能在取消前已开始执行，c 一定被取消
+    assert 'c' not in calls
+
+
+def test_batch_endpoint_streams_ndjson(monkeypatch):
+    def load_fundamental(code):
+        if code == '999999':
+            return {'success': False, 'error': '未找到'}, 404
+        return {'success': True, 'data': {'stockCode': code, 'stockName': '未知'}}, 200
+
+    monkeypatch.setattr(svc, '_load_fundamental', load_fundamental)
+    monkeypatch.setattr(svc.symbol_master, 'bulk', lambda codes: {'600000': {'name': '浦发银行', 'exchange': 'SH'}})
+
+    response = svc.app.test_client().post('/api/stock/batch', json={'stockCodes': ['600000', '999999'],
+                                                                     'stream': True})
+
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    items = {line['stockCode']: line for line in lines[:-1]}
+    assert items['600000']['type'] == 'item'
+    assert items['600000']['data']['stockName'] == '浦发银行'
+    assert items['600000']['data']['exchange'] == 'SH'
+    assert items['999999'] == {'type': 'error', 'index': 1, 'stockCode': '999999', 'error': 'LookupError: 未找到',
+                               'timedOut': False}
+    assert lines[-1]['type'] == 'summary'
+    assert (lines[-1]['total'], lines[-1]['count'], lines[-1]['failedCount']) == (2, 1, 1)
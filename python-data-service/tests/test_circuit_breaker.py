@@ -0,0 +1,126 @@
+import pytest
+
+import circuit_breaker
+import metrics
+import upstream
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, 'time', clock)
+    return clock
+
+
+def open_breaker(threshold=3, reset_timeout=30.0):
+    breaker = CircuitBreaker('stock_zh_a_spot_em', failure_threshold=threshold, reset_timeout=reset_timeout)
+    for _ in range(threshold):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_at_failure_threshold(clock):
+    breaker = CircuitBreaker('stock_zh_a_spot_em', failure_threshold=3)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1
+
+
+def test_success_resets_consecutive_failures(clock):
+    breaker = CircuitBreaker('stock_zh_a_spot_em', failure_threshold=3)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_after_cooldown_allows_exactly_one_probe(clock):
+    breaker = open_breaker(reset_timeout=30.0)
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 1
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # 探测请求返回前，其余调用继续被拒绝
+    for _ in range(3):
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+
+def test_probe_success_closes(clock):
+    breaker = open_breaker()
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 0
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_probe_failure_reopens(clock):
+    breaker = open_breaker()
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.opened_at == clock.now
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    # 重新计算冷却时间
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_upstream_failure_classification():
+    assert circuit_breaker.is_upstream_failure(ConnectionError('reset'))
+    assert circuit_breaker.is_upstream_failure(RuntimeError('Read timed out'))
+    assert not circuit_breaker.is_upstream_failure(KeyError('日期'))
+
+
+def test_ak_call_rejects_open_circuit_and_counts_it(monkeypatch):
+    calls = []
+
+    def stock_breaker_test_em(symbol):
+        calls.append(symbol)
+        raise ConnectionError('Connection aborted')
+
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', True)
+    breaker = upstream.circuit_breakers.get('stock_breaker_test_em')
+    monkeypatch.setattr(breaker, 'failure_threshold', 2)
+    rejected_before = metrics.upstream_rejected.values().get(('stock_breaker_test_em',), 0.0)
+
+    for symbol in ('600000', '000001'):
+        with pytest.raises(ConnectionError):
+            upstream.ak_call(stock_breaker_test_em, symbol=symbol)
+    assert breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        upstream.ak_call(stock_breaker_test_em, symbol='600519')
+    assert calls == ['600000', '000001']
+    assert metrics.upstream_rejected.values()[('stock_breaker_test_em',)] == rejected_before + 1
@@ -0,0 +1,132 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+import stock_data_service as svc
+from conditional import ResponseCache, etag_for, frame_fingerprint, not_modified
+from swr_cache import CachedValue
+
+# ---------- conditional 模块 ----------
+
+
+def test_etag_depends_only_on_parts():
+    assert etag_for('hot-rank', 1.0) == etag_for('hot-rank', 1.0)
+    assert etag_for('hot-rank', 1.0) != etag_for('hot-rank', 2.0)
+
+
+def test_frame_fingerprint_follows_content():
+    frame = pd.DataFrame({'close': [1.0, 2.0]})
+    assert frame_fingerprint(frame) == frame_fingerprint(frame.copy())
+    assert frame_fingerprint(frame) != frame_fingerprint(frame.assign(close=[1.0, 2.5]))
+    assert frame_fingerprint(pd.DataFrame()) == 'empty'
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None), ('W/"abc"', 304), ('"abc"', 304), ('W/"other"', None), ('*', 304)])
+def test_not_modified_matches_weak_etags(header, expected):
+    app = Flask(__name__)
+    headers = {'If-None-Match': header} if header else {}
+    with app.test_request_context('/', headers=headers):
+        response = not_modified('abc')
+    if expected is None:
+        assert response is None
+    else:
+        assert response.status_code == 304
+        assert response.headers['ETag'] == 'W/"abc"'
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache('test', max_entries=2)
+    cache.put('a', 1, 'ea')
+    cache.put('b', 2, 'eb')
+    assert cache.get('a').value == 1
+    cache.put('c', 3, 'ec')
+    assert cache.get('b') is None
+    assert cache.get('a').etag == 'ea'
+
+
+def test_response_cache_expiry():
+    cache = ResponseCache('test', ttl=30, expiry=lambda fetched_at, ttl: 0.0)
+    cache.put('a', 1, 'ea')
+    assert cache.get('a') is None
+
+
+# ---------- 接口的 304 路径 ----------
+
+
+@pytest.fixture
+def client():
+    svc.app.config['TESTING'] = True
+    return svc.app.test_client()
+
+
+def revalidate(client, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/"')
+    assert first.headers['Cache-Control'] == 'no-cache'
+    second = client.get(url, headers={'If-None-Match': etag})
+    return first, second
+
+
+def test_hot_rank_returns_304_until_the_list_is_refreshed(client, monkeypatch):
+    entry = CachedValue(value=[{'rank': 1, 'code': '600000'}], fetched_at=1_700_000_000.0,
+                        stale=False, refreshing=False)
+    monkeypatch.setattr(svc._hot_rank_cache, 'get', lambda: entry)
+
+    first, second = revalidate(client, '/api/stock/hot-rank')
+    assert second.status_code == 304
+    assert second.data == b''
+
+    entry.fetched_at += 120
+    refreshed = client.get('/api/stock/hot-rank', headers={'If-None-Match': first.headers['ETag']})
+    assert refreshed.status_code == 200
+    assert refreshed.headers['ETag'] != first.headers['ETag']
+
+
+def daily_bars(days=80, last_close=10.0):
+    dates = pd.bdate_range(end='2025-06-30', periods=days)
+    close = np.linspace(8.0, last_close, days)
+    return pd.DataFrame({
+        'date': dates, 'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+        'volume': np.full(days, 1_000_000.0), 'amount': close * 1_000_000.0,
+        'outstanding_share': np.full(days, 1e8), 'turnover': np.full(days, 0.01),
+    })
+
+
+def test_analyze_returns_304_while_bars_are_unchanged(client, monkeypatch):
+    bars = {'frame': daily_bars()}
+    monkeypatch.setattr(svc, '_fetch_history_dataframe_with_fallback', lambda code, months, allow_extended: (
+        bars['frame'], 'stock_zh_a_daily', datetime(2025, 3, 1), datetime(2025, 6, 30)))
+
+    first, second = revalidate(client, '/api/stock/analyze/600000?months=3')
+    assert second.status_code == 304
+
+    # 新的日线使分析结果失效
+    bars['frame'] = daily_bars(last_close=11.0)
+    changed = client.get('/api/stock/analyze/600000?months=3', headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_industry_returns_304_for_cached_result(client, monkeypatch):
+    monkeypatch.setattr(svc, '_industry_cache', ResponseCache('industry', ttl=30))
+    svc._industry_cache.put('600000', {'industryName': '银行'}, etag_for('industry', 'v1'))
+
+    first, second = revalidate(client, '/api/stock/industry/600000')
+    assert first.get_json()['data'] == {'industryName': '银行'}
+    assert second.status_code == 304
+
+
+def test_industry_returns_304_when_uncached_result_is_unchanged(client, monkeypatch):
+    # 行业未知时不请求板块行情，降级结果不缓存，但内容不变时仍返回 304
+    monkeypatch.setattr(svc, '_industry_cache', ResponseCache('industry', ttl=30))
+    monkeypatch.setattr(svc, '_resolve_industry_name', lambda code: None)
+
+    first, second = revalidate(client, '/api/stock/industry/600000')
+    assert first.get_json()['data']['industryName'] == '未知'
+    assert second.status_code == 304
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from fundamental_cache import FundamentalCache
+
+
+def make_cache(tmp_path):
+    return FundamentalCache(path=str(tmp_path / 'fundamental_cache.json'))
+
+
+def test_put_keeps_its_own_copy(tmp_path):
+    cache = make_cache(tmp_path)
+    data = {'stockCode': '600000', 'stockName': '未知', 'reportDate': '20250630'}
+    cache.put('600000', data, now=datetime(2025, 9, 1))
+
+    data['stockName'] = '浦发银行'
+    data.setdefault('industry', '银行')
+
+    assert cache.get('600000', now=datetime(2025, 9, 2)) == {
+        'stockCode': '600000', 'stockName': '未知', 'reportDate': '20250630'}
+
+
+def test_get_returns_a_copy(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('600000', {'stockName': '未知', 'reportDate': '20250630'}, now=datetime(2025, 9, 1))
+
+    first = cache.get('600000', now=datetime(2025, 9, 2))
+    first['stockName'] = '浦发银行'
+
+    assert cache.get('600000', now=datetime(2025, 9, 2))['stockName'] == '未知'
+
+
+def test_expired_entry_is_a_miss(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('600000', {'reportDate': '20250630'}, now=datetime(2025, 4, 1))
+    assert cache.get('600000', now=datetime(2025, 12, 1)) is None
+
+
+def test_unchanged_report_date_only_extends_expiry(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('600000', {'stockName': '浦发银行', 'reportDate': '20250630'}, now=datetime(2025, 9, 1))
+    expires_before = cache._entries['600000']['expiresAt']
+
+    cache.put('600000', {'stockName': '其他', 'reportDate': '20250630'}, now=datetime(2025, 9, 20))
+
+    entry = cache._entries['600000']
+    assert entry['cachedAt'] == datetime(2025, 9, 1).isoformat()
+    assert entry['expiresAt'] > expires_before
+    assert entry['data']['stockName'] == '浦发银行'
+
+
+def test_new_report_date_replaces_entry(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put('600000', {'stockName': 'A', 'reportDate': '20250630'}, now=datetime(2025, 9, 1))
+    cache.put('600000', {'stockName': 'A', 'reportDate': '20250930'}, now=datetime(2025, 11, 1))
+    assert cache.get('600000', now=datetime(2025, 11, 2))['reportDate'] == '20250930'
+
+
+def test_workers_sharing_a_file_keep_each_others_entries(tmp_path):
+    first, second = make_cache(tmp_path), make_cache(tmp_path)
+    first.get('000001', now=datetime(2025, 9, 1))
+    second.get('000001', now=datetime(2025, 9, 1))
+
+    first.put('000001', {'reportDate': '20250630'}, now=datetime(2025, 9, 1))
+    first.flush()
+    second.put('600000', {'reportDate': '20250630'}, now=datetime(2025, 9, 1))
+    second.flush()
+
+    reloaded = make_cache(tmp_path)
+    assert reloaded.get('000001', now=datetime(2025, 9, 2)) is not None
+    assert reloaded.get('600000', now=datetime(2025, 9, 2)) is not None
+    # 落盘时同时读入了其他进程的条目
+    assert second.get('000001', now=datetime(2025, 9, 2)) is not None
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+import requests
+
+import http_session
+
+
+@pytest.fixture
+def fresh_install(monkeypatch):
+    """在未安装状态下运行，测试结束后还原 requests 的全局函数和环境变量。"""
+    monkeypatch.setattr(http_session, '_installed', False)
+    monkeypatch.setattr(http_session, '_shared_session', None)
+    monkeypatch.setattr(requests.api, 'request', requests.api.request)
+    monkeypatch.setattr(requests, 'request', requests.request)
+    monkeypatch.setattr(requests.Session, '__init__', http_session._original_session_init)
+    for var in http_session.PROXY_ENV_VARS:
+        monkeypatch.setenv(var, 'http://127.0.0.1:7890')
+    monkeypatch.setenv('NO_PROXY', '')
+    monkeypatch.setenv('no_proxy', '')
+
+
+def test_install_removes_proxy_env_vars_and_patches_requests(fresh_install):
+    http_session.install()
+
+    for var in http_session.PROXY_ENV_VARS:
+        assert var not in os.environ
+    assert os.environ['NO_PROXY'] == '*'
+    assert requests.api.request is http_session.request
+    assert requests.request is http_session.request
+
+    session = requests.Session()
+    assert session.trust_env is False
+    assert session.proxies == {'http': None, 'https': None}
+
+
+def test_install_runs_once(fresh_install, monkeypatch):
+    http_session.install()
+    # 第二次调用不再修改环境变量
+    monkeypatch.setenv('HTTP_PROXY', 'http://127.0.0.1:7890')
+    http_session.install()
+    assert os.environ['HTTP_PROXY'] == 'http://127.0.0.1:7890'
+
+
+def test_shared_session_is_created_once(fresh_install):
+    first = http_session.shared_session()
+    assert http_session.shared_session() is first
+
+
+def test_pool_and_retry_settings_apply(fresh_install):
+    session = http_session.shared_session()
+    adapter = session.get_adapter('https://push2.eastmoney.com/api')
+
+    assert adapter._pool_connections == http_session.POOL_CONNECTIONS
+    assert adapter._pool_maxsize == http_session.POOL_MAXSIZE
+    assert adapter.max_retries.total == 3
+    assert 503 in adapter.max_retries.status_forcelist
+    assert session.trust_env is False
+
+    no_retry = http_session.create_session(retries=0, pool_maxsize=4)
+    assert no_retry.get_adapter('http://example.com')._pool_maxsize == 4
+    assert no_retry.get_adapter('http://example.com').max_retries.total == 0
+
+
+def test_request_uses_shared_session_with_default_timeout(fresh_install, monkeypatch):
+    calls = []
+    session = http_session.shared_session()
+    monkeypatch.setattr(session, 'request', lambda method, url, **kwargs: calls.append((method, url, kwargs)))
+    http_session.install()
+
+    requests.get('https://push2.eastmoney.com/api', proxies={'https': 'http://127.0.0.1:7890'})
+
+    method, url, kwargs = calls[0]
+    assert (method, url) == ('get', 'https://push2.eastmoney.com/api')
+    assert kwargs['proxies'] == {'http': None, 'https': None}
+    assert kwargs['timeout'] == http_session.DEFAULT_TIMEOUT
@@ -0,0 +1,115 @@
+import pandas as pd
+import pytest
+
+import industry_directory
+import stock_data_service as svc
+from industry_directory import IndustryDirectory
+
+BOARDS = {'银行': 'BK0475'}
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    """行业目录只收录“银行”板块、反向索引为空；记录是否查询了股票基本信息。"""
+    calls = []
+    monkeypatch.setattr(svc.industry_directory, 'industry_of', lambda code: None)
+    monkeypatch.setattr(svc.industry_directory, 'resolve_board',
+                        lambda name: {'name': name, 'code': BOARDS[name]} if name in BOARDS else None)
+
+    def individual_info(code):
+        calls.append(code)
+        return '银行'
+    monkeypatch.setattr(svc, '_industry_from_individual_info', individual_info)
+    return calls
+
+
+def use_master_record(monkeypatch, record):
+    monkeypatch.setattr(svc.symbol_master, 'get', lambda code: record)
+
+
+def test_master_industry_resolving_to_board_skips_individual_info(lookups, monkeypatch):
+    use_master_record(monkeypatch, {'code': '000001', 'industry': '银行'})
+    assert svc._resolve_industry_name('000001') == '银行'
+    assert lookups == []
+
+
+@pytest.mark.parametrize('industry', [None, ''])
+def test_master_record_without_industry_falls_back(lookups, monkeypatch, industry):
+    use_master_record(monkeypatch, {'code': '600000', 'industry': industry})
+    assert svc._resolve_industry_name('600000') == '银行'
+    assert lookups == ['600000']
+
+
+def test_unresolvable_master_industry_falls_back(lookups, monkeypatch):
+    use_master_record(monkeypatch, {'code': '000001', 'industry': '货币金融服务'})
+    assert svc._resolve_industry_name('000001') == '银行'
+    assert lookups == ['000001']
+
+
+def test_master_industry_is_kept_when_individual_info_has_none(lookups, monkeypatch):
+    use_master_record(monkeypatch, {'code': '000001', 'industry': '货币金融服务'})
+    monkeypatch.setattr(svc, '_industry_from_individual_info', lambda code: None)
+    assert svc._resolve_industry_name('000001') == '货币金融服务'
+
+
+def test_directory_hit_skips_master_and_individual_info(lookups, monkeypatch):
+    monkeypatch.setattr(svc.industry_directory, 'industry_of', lambda code: '银行')
+    use_master_record(monkeypatch, None)
+    assert svc._resolve_industry_name('000001') == '银行'
+    assert lookups == []
+
+
+class BoardFetch:
+    """stock_board_industry_name_em 的替身：记录调用次数，fail 为 True 时抛出异常。"""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self, name, **kwargs):
+        assert name == 'stock_board_industry_name_em'
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError('reset')
+        return pd.DataFrame({'板块名称': ['银行'], '板块代码': ['BK0475'], '涨跌幅': [1.2]})
+
+
+def wait_for_boards(directory):
+    thread = directory._boards_thread
+    if thread is not None:
+        thread.join(5)
+
+
+def test_board_quote_returns_cache_and_refreshes_in_background(tmp_path, monkeypatch):
+    fetch = BoardFetch()
+    directory = IndustryDirectory(path=str(tmp_path / 'industry.json'), fetch=fetch)
+
+    # 尚无缓存：不等待网络，后台拉取一次
+    assert directory.board_quote('银行') is None
+    wait_for_boards(directory)
+    assert fetch.calls == 1
+    assert directory.board_quote('银行')['板块代码'] == 'BK0475'
+    assert fetch.calls == 1
+
+    # 过期后返回旧行情并在后台刷新
+    monkeypatch.setattr(industry_directory, 'BOARD_QUOTE_TTL', 0.0)
+    assert directory.board_quote('银行')['板块代码'] == 'BK0475'
+    wait_for_boards(directory)
+    assert fetch.calls == 2
+
+
+def test_failing_board_refresh_runs_at_most_once_per_ttl(tmp_path):
+    fetch = BoardFetch()
+    fetch.fail = True
+    directory = IndustryDirectory(path=str(tmp_path / 'industry.json'), fetch=fetch)
+
+    for _ in range(5):
+        assert directory.board_quote('银行') is None
+        wait_for_boards(directory)
+    assert fetch.calls == 1
+    assert directory.status()['boardQuotes'] == 0
+
+
+def test_upstream_health_reports_industry_directory():
+    response = svc.app.test_client().get('/api/upstream/health')
+    assert set(response.get_json()['data']['industryDirectory']) >= {'boards', 'boardQuotes', 'builtAt'}
@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import lazy_import as lazy_import_module
+import profile_startup
+from lazy_import import LazyModule, lazy_import, preload
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'numpy', 'akshare', 'bs4', 'strategy_hot_volume_breakout')
+
+
+@pytest.fixture
+def probe_module(tmp_path, monkeypatch):
+    """临时目录中的一个小模块，导入时计数。"""
+    (tmp_path / 'lazy_probe_module.py').write_text('IMPORTS = []\nIMPORTS.append(1)\nVALUE = 42\n', encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'lazy_probe_module', raising=False)
+    monkeypatch.setattr(lazy_import_module, '_registry', {})
+    yield 'lazy_probe_module'
+    sys.modules.pop('lazy_probe_module', None)
+
+
+def test_importing_service_does_not_load_heavy_dependencies():
+    code = ('import json, sys; import stock_data_service; '
+            f'print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))')
+    env = dict(os.environ, WARMUP_ENABLED='0')
+    result = subprocess.run([sys.executable, '-c', code], cwd=SERVICE_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
+
+
+def test_module_is_imported_on_first_attribute_access(probe_module):
+    proxy = lazy_import(probe_module)
+    assert isinstance(proxy, LazyModule)
+    assert probe_module not in sys.modules
+    assert not proxy.loaded
+    assert proxy.status() == {'loaded': False, 'importSeconds': None, 'loadedAt': None}
+
+    assert proxy.VALUE == 42
+    assert proxy.loaded
+    assert proxy.status()['importSeconds'] is not None
+    # 之后的访问直接转发，不重复导入
+    assert proxy.IMPORTS == [1]
+    assert lazy_import(probe_module) is proxy
+
+
+def test_attribute_assignment_reaches_real_module(probe_module):
+    proxy = lazy_import(probe_module)
+    proxy.VALUE = 7
+    assert sys.modules[probe_module].VALUE == 7
+
+
+def test_preload_imports_registered_modules(probe_module):
+    proxy = lazy_import(probe_module)
+    preload(background=True).join(5)
+    assert proxy.loaded
+    assert lazy_import_module.status()[probe_module]['loaded']
+
+
+def test_preload_reports_failed_import_without_raising(monkeypatch):
+    monkeypatch.setattr(lazy_import_module, '_registry', {})
+    proxy = lazy_import('lazy_probe_module_that_does_not_exist')
+    preload()
+    assert not proxy.loaded
+
+
+def test_run_importtime_parses_subprocess_output():
+    rows = profile_startup.run_importtime('import colorsys')
+    names = [name for name, _, _, _ in rows]
+    assert 'colorsys' in names
+    assert all(self_us >= 0 and cumulative_us >= self_us for _, self_us, cumulative_us, _ in rows)
+
+
+def test_top_level_totals_groups_by_package():
+    rows = [('flask', 100, 300, 0), ('flask.app', 200, 200, 1), ('json', 50, 50, 0)]
+    assert profile_startup.top_level_totals(rows) == [('flask', 300), ('json', 50)]
+
+
+@pytest.mark.parametrize('budget, exits', [('1000', False), ('100', True)])
+def test_profile_startup_checks_budget(monkeypatch, capsys, budget, exits):
+    rows = [('flask', 100_000, 100_000, 1), ('stock_data_service', 50_000, 200_000, 0)]
+    monkeypatch.setattr(profile_startup, 'run_importtime', lambda code: rows)
+    monkeypatch.setattr(sys, 'argv', ['profile_startup.py', '--budget', budget])
+
+    if exits:
+        with pytest.raises(SystemExit) as excinfo:
+            profile_startup.main()
+        assert excinfo.value.code == 1
+    else:
+        profile_startup.main()
+    assert '导入 stock_data_service: 200 ms' in capsys.readouterr().out
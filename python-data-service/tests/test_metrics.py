@@ -0,0 +1,116 @@
+import json
+import os
+
+import metrics
+from metrics import Counter, Gauge, Histogram, Registry
+
+DEAD_PID = 2 ** 22 + 12345  # 超出 Linux 默认 pid_max，视为已退出的进程
+
+
+def make_registry():
+    registry = Registry()
+    requests = registry.register(Counter('test_requests', '请求数', ('route',)))
+    in_flight = registry.register(Gauge('test_in_flight', '进行中的请求数', ('route',)))
+    duration = registry.register(Histogram('test_duration_seconds', '耗时', ('route',), buckets=(0.1, 1.0)))
+    return registry, requests, in_flight, duration
+
+
+def worker_snapshot(registry, pid):
+    snapshot = registry.snapshot()
+    snapshot['pid'] = pid
+    return snapshot
+
+
+def test_render_merged_sums_counters_and_histograms_across_workers():
+    registry, requests, in_flight, duration = make_registry()
+    requests.inc(route='/a')
+    in_flight.inc(route='/a')
+    duration.observe(0.05, route='/a')
+    other = worker_snapshot(registry, DEAD_PID)
+    requests.inc(2, route='/a')
+    duration.observe(0.5, route='/a')
+
+    text = registry.render_merged([registry.snapshot(), other])
+
+    assert 'stock_service_test_requests_total{route="/a"} 4' in text
+    assert 'stock_service_test_duration_seconds_bucket{route="/a",le="0.1"} 2' in text
+    assert 'stock_service_test_duration_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'stock_service_test_duration_seconds_count{route="/a"} 3' in text
+    # 仪表按进程输出，已退出的进程不再出现
+    assert f'stock_service_test_in_flight{{route="/a",worker="{os.getpid()}"}} 1' in text
+    assert f'worker="{DEAD_PID}"' not in text
+
+
+def test_render_merged_computes_hit_ratio_from_all_workers():
+    local = metrics.registry.snapshot()
+    local['metrics'] = {name: [] for name in local['metrics']}
+    local['metrics'][metrics.cache_requests.name] = [[['analysis', 'hit'], 3.0]]
+    other = dict(local, pid=DEAD_PID)
+    other['metrics'] = dict(local['metrics'])
+    other['metrics'][metrics.cache_requests.name] = [[['analysis', 'miss'], 1.0]]
+
+    text = metrics.registry.render_merged([local, other])
+    assert 'stock_service_cache_requests_total{cache="analysis",result="hit"} 3' in text
+    assert 'stock_service_cache_hit_ratio{cache="analysis"} 0.75' in text
+
+
+def test_snapshot_round_trips_through_directory(tmp_path):
+    registry, requests, _, _ = make_registry()
+    requests.inc(route='/a')
+    registry.write_snapshot(str(tmp_path))
+    with open(tmp_path / f'{DEAD_PID}.json', 'w', encoding='utf-8') as fh:
+        json.dump(worker_snapshot(registry, DEAD_PID), fh)
+    (tmp_path / 'broken.json').write_text('{', encoding='utf-8')
+
+    snapshots = registry.load_snapshots(str(tmp_path))
+    assert sorted(snapshot['pid'] for snapshot in snapshots) == sorted([os.getpid(), DEAD_PID])
+    assert 'stock_service_test_requests_total{route="/a"} 2' in registry.render_merged(snapshots)
+
+
+def test_render_uses_metrics_dir(tmp_path, monkeypatch):
+    registry, requests, _, _ = make_registry()
+    requests.inc(route='/a')
+    with open(tmp_path / f'{DEAD_PID}.json', 'w', encoding='utf-8') as fh:
+        json.dump(worker_snapshot(registry, DEAD_PID), fh)
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+
+    assert 'stock_service_test_requests_total{route="/a"} 2' in registry.render()
+    assert (tmp_path / f'{os.getpid()}.json').exists()
+
+
+def test_render_without_metrics_dir_is_local(monkeypatch):
+    registry, requests, _, _ = make_registry()
+    requests.inc(route='/a')
+    monkeypatch.setattr(metrics, 'METRICS_DIR', '')
+    assert f'stock_service_test_requests_total{{route="/a",worker="{os.getpid()}"}} 1' in registry.render()
+
+
+def test_reset_discards_inherited_values():
+    registry, requests, in_flight, duration = make_registry()
+    requests.inc(route='/a')
+    in_flight.inc(route='/a')
+    duration.observe(0.2, route='/a')
+    registry.reset()
+    assert all(values == [] for values in registry.snapshot()['metrics'].values())
+
+
+def test_help_and_type_lines_name_the_sample_family():
+    registry, requests, in_flight, duration = make_registry()
+    requests.inc(route='/a')
+    in_flight.inc(route='/a')
+    duration.observe(0.05, route='/a')
+
+    for text in (registry.render_local(), registry.render_merged([registry.snapshot()])):
+        lines = text.splitlines()
+        assert '# HELP stock_service_test_requests_total 请求数' in lines
+        assert '# TYPE stock_service_test_requests_total counter' in lines
+        assert '# TYPE stock_service_test_in_flight gauge' in lines
+        assert '# TYPE stock_service_test_duration_seconds histogram' in lines
+        # 每个样本都属于它前面最近一次 TYPE 声明的指标
+        family = None
+        for line in lines:
+            if line.startswith('# TYPE '):
+                family = line.split()[2]
+            elif not line.startswith('#'):
+                series = line.split('{')[0].split(' ')[0]
+                assert series == family or series in (f'{family}_bucket', f'{family}_sum', f'{family}_count')
@@ -0,0 +1,77 @@
+import pandas as pd
+
+import upstream
+from circuit_breaker import OPEN
+from provider_health import ProviderHealthRegistry
+
+SOURCES = ['stock_zh_a_daily', 'stock_zh_a_hist', 'stock_zh_a_hist_tx']
+
+
+def record(registry, name, outcomes, latency=0.2):
+    for ok in outcomes:
+        registry.record(name, ok, latency)
+
+
+def test_order_keeps_declared_order_without_samples():
+    assert ProviderHealthRegistry().order(SOURCES) == SOURCES
+
+
+def test_unsampled_provider_does_not_jump_ahead_of_healthy_one():
+    registry = ProviderHealthRegistry()
+    record(registry, 'stock_zh_a_daily', [True] * 5)
+
+    assert registry.order(SOURCES) == SOURCES
+
+
+def test_healthy_providers_keep_declared_order_regardless_of_small_latency_differences():
+    registry = ProviderHealthRegistry()
+    record(registry, 'stock_zh_a_daily', [True] * 5, latency=0.6)
+    record(registry, 'stock_zh_a_hist', [True] * 5, latency=0.2)
+
+    assert registry.order(SOURCES) == SOURCES
+
+
+def test_failing_provider_is_demoted_behind_unsampled_ones():
+    registry = ProviderHealthRegistry()
+    record(registry, 'stock_zh_a_daily', [False, False, True])
+
+    assert registry.order(SOURCES) == ['stock_zh_a_hist', 'stock_zh_a_hist_tx', 'stock_zh_a_daily']
+
+
+def test_slow_provider_is_demoted():
+    registry = ProviderHealthRegistry()
+    record(registry, 'stock_zh_a_daily', [True] * 5, latency=6.0)
+    record(registry, 'stock_zh_a_hist', [True] * 5, latency=0.5)
+
+    assert registry.order(SOURCES) == ['stock_zh_a_hist', 'stock_zh_a_hist_tx', 'stock_zh_a_daily']
+
+
+def test_demoted_providers_are_ordered_by_cost():
+    registry = ProviderHealthRegistry()
+    record(registry, 'stock_zh_a_daily', [False] * 4, latency=2.0)
+    record(registry, 'stock_zh_a_hist', [False] * 4, latency=0.5)
+
+    assert registry.order(SOURCES) == ['stock_zh_a_hist_tx', 'stock_zh_a_hist', 'stock_zh_a_daily']
+
+
+def test_stale_samples_restore_declared_position(monkeypatch):
+    registry = ProviderHealthRegistry()
+    record(registry, 'stock_zh_a_daily', [False] * 3)
+    now = registry._stats['stock_zh_a_daily'].last_call
+    monkeypatch.setattr('provider_health.time.time', lambda: now + 3600)
+
+    assert registry.order(SOURCES) == SOURCES
+
+
+def test_invoke_records_empty_frame_as_failure(monkeypatch):
+    registry = ProviderHealthRegistry()
+    monkeypatch.setattr(upstream, 'provider_health', registry)
+
+    def stock_zh_a_hist(**kwargs):
+        return pd.DataFrame()
+
+    assert upstream._invoke(stock_zh_a_hist, (), {}).empty
+    stats = registry.snapshot()['stock_zh_a_hist']
+    assert stats['failures'] == 1
+    assert stats['lastError'] == '空结果'
+    assert upstream.circuit_breakers.get('stock_zh_a_hist').state != OPEN
@@ -0,0 +1,37 @@
+import pytest
+
+import upstream
+from rate_limiter import RateLimiterRegistry, per_process, process_count
+
+
+@pytest.mark.parametrize('value, expected', [(None, 1), ('4', 4), ('0', 1), ('x', 1)])
+def test_process_count(monkeypatch, value, expected):
+    if value is None:
+        monkeypatch.delenv('STOCK_SERVICE_WORKERS', raising=False)
+    else:
+        monkeypatch.setenv('STOCK_SERVICE_WORKERS', value)
+    assert process_count() == expected
+
+
+def test_rates_are_split_between_workers(monkeypatch):
+    monkeypatch.setenv('STOCK_SERVICE_WORKERS', '4')
+    monkeypatch.setenv('UPSTREAM_RATE_EASTMONEY', '10')
+    monkeypatch.setenv('UPSTREAM_BURST_EASTMONEY', '20')
+    monkeypatch.setenv('UPSTREAM_FUNCTION_RATES', 'stock_hot_keyword_em:2/4')
+    registry = RateLimiterRegistry()
+    registry.acquire('stock_hot_keyword_em', 'eastmoney')
+
+    snapshot = registry.snapshot()
+    assert snapshot['hosts']['eastmoney']['rate'] == 2.5
+    assert snapshot['hosts']['eastmoney']['capacity'] == 5.0
+    assert snapshot['functions']['stock_hot_keyword_em']['rate'] == 0.5
+    assert snapshot['functions']['stock_hot_keyword_em']['capacity'] == 1.0
+    assert per_process(10) == 2.5
+
+
+def test_host_limits_are_split_between_workers(monkeypatch):
+    monkeypatch.setenv('STOCK_SERVICE_WORKERS', '4')
+    assert upstream.process_host_limit(8) == 2
+    assert upstream.process_host_limit(2) == 1
+    monkeypatch.setenv('STOCK_SERVICE_WORKERS', '1')
+    assert upstream.process_host_limit(8) == 8
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from retry_scheduler import RetryPending, RetryPolicy, RetryScheduler
+
+
+def flaky(failures):
+    """前 failures 次调用抛出 ConnectionError，之后返回调用次数。"""
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise ConnectionError('reset')
+        return len(calls)
+    return fn, calls
+
+
+def test_call_returns_first_attempt_result():
+    fn, _ = flaky(0)
+    assert RetryScheduler(workers=2).call(fn, 'ok', RetryPolicy(retries=3, base_delay=5.0), timeout=2) == 1
+
+
+def test_call_returns_degraded_after_first_failure_without_waiting_for_backoff():
+    scheduler = RetryScheduler(workers=2)
+    fn, calls = flaky(1)
+    policy = RetryPolicy(retries=2, base_delay=0.3)
+
+    started = time.time()
+    with pytest.raises(RetryPending):
+        scheduler.call(fn, 'flaky', policy, timeout=5, key='flaky')
+    assert time.time() - started < 0.3
+
+    # 后台重试成功后，相同 key 的下一次调用直接拿到结果
+    time.sleep(0.6)
+    assert scheduler.call(fn, 'flaky', policy, timeout=5, key='flaky') == 2
+    assert len(calls) == 2
+
+
+def test_wait_retries_waits_for_background_retries():
+    fn, _ = flaky(1)
+    policy = RetryPolicy(retries=2, base_delay=0.05)
+    assert RetryScheduler(workers=2).call(fn, 'flaky', policy, timeout=5, wait_retries=True) == 2
+
+
+def test_call_raises_last_error_when_single_attempt_fails():
+    fn, _ = flaky(5)
+    with pytest.raises(ConnectionError):
+        RetryScheduler(workers=2).call(fn, 'broken', RetryPolicy(retries=1), timeout=5)
+
+
+def test_first_attempt_runs_inline_when_pool_is_busy():
+    """后台重试占满线程池时，健康的调用仍在请求线程内立即完成，不因排队而降级。"""
+    scheduler = RetryScheduler(workers=1)
+    release = threading.Event()
+    scheduler.submit(lambda: release.wait(5), 'blocking', RetryPolicy(retries=1))
+
+    try:
+        results = []
+        threads = [threading.Thread(target=lambda i=i: results.append(
+            scheduler.call(lambda: (time.sleep(0.05), i)[1], f'healthy-{i}', timeout=0.2, key=('healthy', i))))
+            for i in range(16)]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        assert sorted(results) == list(range(16))
+        assert time.time() - started < 1.0
+    finally:
+        release.set()
+
+
+def test_concurrent_callers_share_background_retry():
+    scheduler = RetryScheduler(workers=2)
+    fn, calls = flaky(1)
+    policy = RetryPolicy(retries=2, base_delay=0.3)
+
+    with pytest.raises(RetryPending):
+        scheduler.call(fn, 'flaky', policy, timeout=5, key='shared')
+    # 后台重试进行中，相同 key 的请求不再发起新的尝试
+    with pytest.raises(RetryPending):
+        scheduler.call(fn, 'flaky', policy, timeout=5, key='shared')
+    assert len(calls) == 1
+    assert scheduler.call(fn, 'flaky', policy, timeout=5, key='shared', wait_retries=True) == 2
+    assert len(calls) == 2
@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import serialization
+from serialization import FrameRecords, _encode_column, dumps
+
+
+def decode_column(values):
+    return [json.loads(part) for part in _encode_column(values)]
+
+
+def test_datetime_column_with_nat_encodes_null():
+    values = pd.Series([pd.Timestamp('2025-01-02'), pd.NaT])
+    encoded = decode_column(values)
+    assert encoded[0] == 'Thu, 02 Jan 2025 00:00:00 GMT'
+    assert encoded[1] is None
+
+
+def test_nullable_int_column_keeps_integers():
+    values = pd.Series([1, None, 3], dtype='Int64')
+    assert _encode_column(values) == [b'1', b'null', b'3']
+
+
+@pytest.mark.parametrize('values, expected', [
+    (pd.Series([1, 2], dtype='int64'), [1, 2]),
+    (pd.Series([1.5, np.nan]), [1.5, None]),
+    (pd.Series([True, None], dtype='boolean'), [True, None]),
+    (pd.Series(['a', None, pd.NA], dtype=object), ['a', None, None]),
+])
+def test_encode_column_maps_missing_values_to_null(values, expected):
+    assert decode_column(values) == expected
+
+
+def frame_with_missing_values():
+    return pd.DataFrame({
+        'date': [pd.Timestamp('2025-01-02'), pd.NaT],
+        'volume': pd.array([100, pd.NA], dtype='Int64'),
+        'close': [10.5, np.nan],
+        'name': ['平安银行', None],
+    })
+
+
+def test_dumps_frame_with_nat_and_na():
+    payload = json.loads(dumps({'rows': FrameRecords(frame_with_missing_values())}))
+    assert payload['rows'][1] == {'date': None, 'volume': None, 'close': None, 'name': None}
+    assert payload['rows'][0]['volume'] == 100
+    assert isinstance(payload['rows'][0]['volume'], int)
+
+
+def test_dumps_frame_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, 'orjson', None)
+    payload = json.loads(dumps({'rows': FrameRecords(frame_with_missing_values())}))
+    assert payload['rows'][1] == {'date': None, 'volume': None, 'close': None, 'name': None}
+    assert payload['rows'][0]['volume'] == 100
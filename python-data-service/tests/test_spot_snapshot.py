@@ -0,0 +1,111 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import spot_snapshot
+from spot_snapshot import SpotSnapshot, SpotSnapshotCache
+
+
+def spot_frame(price=10.0):
+    return pd.DataFrame({
+        '代码': ['600000', '000001', '430047', '600000'],
+        '名称': ['浦发银行', '平安银行', '诺思兰德', '重复行'],
+        '最新价': [price, price + 1, price + 2, 99.0],
+        '换手率': ['1.5%', '2.0', None, '9.9'],
+        '成交量': [1000, 2000, 3000, 4000],
+    })
+
+
+@pytest.fixture
+def never_expires(monkeypatch):
+    monkeypatch.setattr(spot_snapshot.trading_calendar, 'expires_at', lambda fetched_at, ttl: float('inf'))
+
+
+def test_lookup_by_code_accepts_exchange_prefix():
+    snapshot = SpotSnapshot(spot_frame())
+
+    assert len(snapshot) == 4
+    item = snapshot.lookup('sh600000')
+    assert item == {'code': '600000', 'name': '浦发银行', 'price': 10.0, 'turnoverRate': 1.5, 'volume': 1000.0}
+    assert snapshot.lookup('1') == snapshot.lookup('000001')
+    assert snapshot.turnover_rate('sz000001') == 2.0
+    # 缺失值返回 None 而不是 NaN
+    assert snapshot.turnover_rate('430047') is None
+
+
+def test_missing_codes_are_skipped():
+    snapshot = SpotSnapshot(spot_frame())
+
+    assert snapshot.lookup('688981') is None
+    assert snapshot.value('688981', 'price') is None
+    assert snapshot.value('600000', 'amount') is None
+
+    result = snapshot.bulk(['688981', 'bj430047', '600000'], fields=['price', 'amount'])
+    assert list(result) == ['430047', '600000']
+    assert result['430047'] == {'code': '430047', 'name': '诺思兰德', 'price': 12.0}
+    assert snapshot.bulk([]) == {}
+
+
+def test_missing_code_column_is_rejected():
+    with pytest.raises(ValueError):
+        SpotSnapshot(pd.DataFrame({'名称': ['浦发银行'], '最新价': [10.0]}))
+
+
+def test_refresh_replaces_snapshot_atomically(monkeypatch):
+    expired = {'value': False}
+    monkeypatch.setattr(spot_snapshot.trading_calendar, 'expires_at',
+                        lambda fetched_at, ttl: 0.0 if expired['value'] else float('inf'))
+    cache = SpotSnapshotCache()
+    old = cache.get(lambda: spot_frame(10.0))
+
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow_loader():
+        started.set()
+        assert release.wait(5)
+        return spot_frame(20.0)
+
+    expired['value'] = True
+    refreshed = []
+    thread = threading.Thread(target=lambda: refreshed.append(cache.get(slow_loader)))
+    thread.start()
+    assert started.wait(5)
+
+    # 刷新期间读者看到的仍是完整的旧快照
+    assert cache.peek() is old
+    assert old.value('600000', 'price') == 10.0
+
+    expired['value'] = False
+    release.set()
+    thread.join(5)
+    new = refreshed[0]
+    assert new is not old
+    assert cache.peek() is new
+    assert new.value('600000', 'price') == 20.0
+    # 旧快照构建后只读，已持有它的调用方不受刷新影响
+    assert old.value('600000', 'price') == 10.0
+
+
+def test_failed_refresh_keeps_stale_snapshot(monkeypatch):
+    expired = {'value': False}
+    monkeypatch.setattr(spot_snapshot.trading_calendar, 'expires_at',
+                        lambda fetched_at, ttl: 0.0 if expired['value'] else float('inf'))
+    cache = SpotSnapshotCache()
+    old = cache.get(lambda: spot_frame())
+    expired['value'] = True
+
+    def failing_loader():
+        raise ConnectionError('reset')
+
+    assert cache.get(failing_loader) is old
+    # 失败后的重试间隔内不再调用 loader
+    assert cache.get(lambda: pytest.fail('loader called during backoff')) is old
+
+
+def test_empty_first_load_returns_none(never_expires):
+    cache = SpotSnapshotCache()
+
+    assert cache.get(lambda: pd.DataFrame()) is None
+    assert cache.peek() is None
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from swr_cache import StaleWhileRevalidateCache
+
+
+class Loader:
+    """依次返回 1, 2, 3...；block 置位前阻塞，fail 为 True 时抛出异常。"""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.block = threading.Event()
+        self.block.set()
+        self.started = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.block.wait(5)
+        if self.fail:
+            raise ConnectionError('reset')
+        return self.calls
+
+
+def wait_until_idle(cache):
+    deadline = time.time() + 5
+    while cache.peek().refreshing and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def expire(cache):
+    cache.expiry = lambda fetched_at, ttl: 0.0
+    cache._last_attempt = 0.0
+
+
+def test_first_load_is_synchronous_and_shared():
+    loader = Loader()
+    loader.block.clear()
+    cache = StaleWhileRevalidateCache('test', loader, ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get().value)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert loader.started.wait(5)
+    loader.block.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [1, 1, 1, 1]
+    assert loader.calls == 1
+    assert cache.peek().stale is False
+
+
+def test_first_load_failure_raises():
+    loader = Loader()
+    loader.fail = True
+    cache = StaleWhileRevalidateCache('test', loader, ttl=60)
+    with pytest.raises(ConnectionError):
+        cache.get()
+    assert cache.peek() is None
+
+
+def test_expired_value_is_served_while_one_refresh_runs():
+    loader = Loader()
+    cache = StaleWhileRevalidateCache('test', loader, ttl=60)
+    cache.get()
+    expire(cache)
+    loader.block.clear()
+    loader.started.clear()
+
+    served = [cache.get() for _ in range(5)]
+    assert loader.started.wait(5)
+    assert all(entry.value == 1 and entry.stale for entry in served)
+    assert served[-1].refreshing
+    assert loader.calls == 2
+
+    loader.block.set()
+    wait_until_idle(cache)
+    cache.expiry = None
+    assert cache.get().value == 2
+    assert loader.calls == 2
+
+
+def test_failed_refresh_keeps_stale_value():
+    loader = Loader()
+    cache = StaleWhileRevalidateCache('test', loader, ttl=60, retry_interval=3600)
+    cache.get()
+    expire(cache)
+    loader.fail = True
+
+    assert cache.get().value == 1
+    wait_until_idle(cache)
+    entry = cache.get()
+    assert entry.value == 1
+    assert entry.stale
+    assert entry.last_error.startswith('ConnectionError')
+    # retry_interval 内不再发起刷新
+    assert loader.calls == 2
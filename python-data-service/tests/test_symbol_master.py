@@ -0,0 +1,86 @@
+import json
+
+import pandas as pd
+import pytest
+
+import stock_data_service as svc
+from symbol_master import SymbolMaster
+
+SOURCES = {
+    ('stock_info_sh_name_code', '主板A股'): pd.DataFrame({
+        '证券代码': ['600000'], '证券简称': ['浦发银行'], '上市日期': ['1999-11-10']}),
+    ('stock_info_sh_name_code', '科创板'): pd.DataFrame({
+        '证券代码': ['688981'], '证券简称': ['中芯国际'], '上市日期': ['2020-07-16']}),
+    ('stock_info_sz_name_code', 'A股列表'): pd.DataFrame({
+        'A股代码': ['1', '300750'], 'A股简称': ['平安银行', '宁德时代'], 'A股上市日期': ['1991-04-03', '2018-06-11'],
+        'A股总股本': ['19,405,918,198', '4,399,041,236'], 'A股流通股本': ['19,405,546,950', '3,926,339,352'],
+        '所属行业': ['J 金融业', 'C 制造业'], '板块': ['主板', '创业板']}),
+    ('stock_info_bj_name_code', None): pd.DataFrame({
+        '证券代码': ['430047'], '证券简称': ['诺思兰德'], '上市日期': ['2020-07-27'],
+        '总股本': [274_000_000], '流通股本': [150_000_000], '所属行业': ['医药制造业']}),
+}
+
+
+class Fetch:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    def __call__(self, name, **kwargs):
+        if name in self.failing:
+            raise ConnectionError('reset')
+        return SOURCES[(name, kwargs.get('symbol'))]
+
+
+@pytest.fixture
+def master(tmp_path):
+    master = SymbolMaster(path=str(tmp_path / 'symbol_master.json'), fetch=Fetch())
+    assert master.refresh() == 5
+    return master
+
+
+def test_lookup_returns_master_record(master):
+    assert master.get('1') == {
+        'code': '000001', 'name': '平安银行', 'exchange': 'SZ', 'board': '主板', 'industry': 'J 金融业',
+        'listingDate': '1991-04-03', 'totalShares': 19405918198.0, 'floatShares': 19405546950.0,
+    }
+    assert master.get('688981')['board'] == '科创板'
+    assert master.get('430047')['exchange'] == 'BJ'
+    assert master.name_of('600000') == '浦发银行'
+    assert master.get('999999') is None
+
+
+def test_lookup_returns_copies(master):
+    master.get('600000')['name'] = '改名'
+    assert master.name_of('600000') == '浦发银行'
+
+
+def test_bulk_skips_unknown_codes(master):
+    assert list(master.bulk(['300750', '123456', '600000'])) == ['300750', '600000']
+
+
+def test_records_persist_across_instances(master, tmp_path):
+    path = tmp_path / 'symbol_master.json'
+    assert json.loads(path.read_text(encoding='utf-8'))['records']['300750']['name'] == '宁德时代'
+
+    reloaded = SymbolMaster(path=str(path), fetch=lambda name, **kwargs: pytest.fail('fetched on load'))
+    assert reloaded.get('300750')['industry'] == 'C 制造业'
+    assert reloaded.status()['symbols'] == 5
+
+
+def test_failed_exchange_keeps_previous_records(master, monkeypatch):
+    monkeypatch.setattr(master, '_fetch', Fetch(failing={'stock_info_sz_name_code'}))
+    assert master.refresh() == 5
+    assert master.name_of('000001') == '平安银行'
+
+
+def test_refresh_fails_when_every_source_fails(tmp_path):
+    master = SymbolMaster(path=str(tmp_path / 'symbol_master.json'),
+                          fetch=Fetch(failing={name for name, _ in SOURCES}))
+    with pytest.raises(RuntimeError):
+        master.refresh()
+    assert master.status() == {'symbols': 0, 'builtAt': None}
+
+
+def test_upstream_health_reports_symbol_master():
+    response = svc.app.test_client().get('/api/upstream/health')
+    assert set(response.get_json()['data']['symbolMaster']) == {'symbols', 'builtAt'}
@@ -0,0 +1,141 @@
+import json
+import threading
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from trading_calendar import MARKET_TZ, TradingCalendar, market_now
+
+
+def write_calendar(path, days):
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump({'tradeDates': [d.isoformat() for d in days]}, fh)
+
+
+def test_refresh_runs_in_background_and_keeps_existing_calendar(tmp_path):
+    today = market_now().date()
+    # 剩余不足7天：需要刷新
+    days = [today - timedelta(days=3), today + timedelta(days=2)]
+    path = tmp_path / 'calendar.json'
+    write_calendar(path, days)
+
+    started, release = threading.Event(), threading.Event()
+    fresh = [today - timedelta(days=3), today + timedelta(days=2), today + timedelta(days=30)]
+
+    def fetch():
+        started.set()
+        assert release.wait(5)
+        return pd.DataFrame({'trade_date': [d.isoformat() for d in fresh]})
+
+    calendar = TradingCalendar(path=str(path), fetch=fetch)
+    # 上游阻塞时请求线程不等待，继续使用已加载的日历
+    assert calendar.is_trading_day(today + timedelta(days=2))
+    assert started.wait(5)
+    assert calendar._days == days
+
+    release.set()
+    calendar._refresh_thread.join(5)
+    assert calendar._days == fresh
+    assert json.loads(path.read_text(encoding='utf-8'))['tradeDates'][-1] == fresh[-1].isoformat()
+
+
+def test_only_one_refresh_is_started(tmp_path):
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return pd.DataFrame()
+
+    calendar = TradingCalendar(path=str(tmp_path / 'calendar.json'), fetch=fetch)
+    for _ in range(5):
+        calendar.is_trading_day(market_now().date())
+    release.set()
+    calendar._refresh_thread.join(5)
+    assert calls == [1]
+
+
+HOLIDAY = date(2026, 10, 1)
+
+
+@pytest.fixture
+def calendar(tmp_path):
+    """2026-09-01 起的工作日（10月1日至7日国庆休市），一直覆盖到今天之后，不触发刷新。"""
+    end = max(date(2026, 12, 31), market_now().date() + timedelta(days=30))
+    days, day = [], date(2026, 9, 1)
+    while day <= end:
+        if day.weekday() < 5 and not HOLIDAY <= day <= date(2026, 10, 7):
+            days.append(day)
+        day += timedelta(days=1)
+    path = tmp_path / 'calendar.json'
+    write_calendar(path, days)
+    return TradingCalendar(path=str(path), fetch=lambda: pytest.fail('calendar refreshed'))
+
+
+def at(day, hour, minute=0):
+    return datetime.combine(day, dtime(hour, minute), tzinfo=MARKET_TZ)
+
+
+FRIDAY = date(2026, 10, 16)
+MONDAY = date(2026, 10, 19)
+
+
+@pytest.mark.parametrize('hour, minute, state, active', [
+    (9, 0, 'pre_open', False),
+    (9, 15, 'trading', True),
+    (11, 30, 'lunch_break', False),
+    (13, 0, 'trading', True),
+    (15, 0, 'settling', True),
+    (15, 29, 'settling', True),
+    (15, 30, 'post_close', False),
+])
+def test_session_state_matches_market_activity(calendar, hour, minute, state, active):
+    now = at(FRIDAY, hour, minute)
+    assert calendar.session_state(now) == state
+    assert calendar.is_market_active(now) is active
+
+
+def test_session_state_closed_on_weekends_and_holidays(calendar):
+    assert calendar.session_state(at(date(2026, 10, 17), 10)) == 'closed'
+    assert calendar.session_state(at(HOLIDAY, 10)) == 'closed'
+    assert not calendar.is_market_active(at(HOLIDAY, 10))
+
+
+def test_times_are_converted_to_beijing_time(calendar):
+    # UTC 01:30 为北京时间 09:30
+    utc = datetime(2026, 10, 16, 1, 30, tzinfo=timezone.utc)
+    assert calendar.session_state(utc) == 'trading'
+    # 不带时区的时间视为北京时间
+    assert calendar.session_state(datetime(2026, 10, 16, 9, 30)) == 'trading'
+    assert market_now().utcoffset() == timedelta(hours=8)
+
+
+def test_next_market_event(calendar):
+    assert calendar.next_market_event(at(FRIDAY, 8)) == at(FRIDAY, 9, 15)
+    assert calendar.next_market_event(at(FRIDAY, 12)) == at(FRIDAY, 13)
+    # 活跃时段（包括盘后结算）返回当前时间
+    assert calendar.next_market_event(at(FRIDAY, 15, 10)) == at(FRIDAY, 15, 10)
+    assert calendar.next_market_event(at(FRIDAY, 16)) == at(MONDAY, 9, 15)
+    assert calendar.next_market_event(at(date(2026, 9, 30), 16)) == at(date(2026, 10, 8), 9, 15)
+
+
+def test_expires_at(calendar):
+    live = at(FRIDAY, 10).timestamp()
+    assert calendar.expires_at(live, 60) == live + 60
+
+    # 闭市期间取得的数据一直有效到下一个交易时段开始
+    lunch = at(FRIDAY, 12).timestamp()
+    assert calendar.expires_at(lunch, 60) == at(FRIDAY, 13).timestamp()
+    weekend = at(date(2026, 10, 17), 10).timestamp()
+    assert calendar.expires_at(weekend, 60) == at(MONDAY, 9, 15).timestamp()
+    # 距下一个时段不足 ttl 时按 ttl 计算
+    just_before_open = at(FRIDAY, 9, 14).timestamp()
+    assert calendar.expires_at(just_before_open, 120) == just_before_open + 120
+
+
+def test_last_settled_trade_date(calendar):
+    assert calendar.last_settled_trade_date(at(FRIDAY, 15, 10)) == date(2026, 10, 15)
+    assert calendar.last_settled_trade_date(at(FRIDAY, 15, 30)) == FRIDAY
+    assert calendar.last_settled_trade_date(at(MONDAY, 10)) == FRIDAY
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from upstream import SingleFlight
+
+
+def run_concurrently(flight, fn, waiters=3):
+    """一个执行方在 fn 中等所有等待方都加入后才返回，返回所有调用方的 (result, shared)。"""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do('key', fn))
+        except Exception as exc:  # pylint: disable=broad-except
+            errors.append(exc)
+
+    threads = [threading.Thread(target=call) for _ in range(waiters + 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results, errors
+
+
+def leader_waiting_for(flight, waiters, value):
+    def fn():
+        # 等待其余调用方都挂到同一个 key 上，保证结果被共享
+        while True:
+            with flight._lock:
+                call = flight._calls['key']
+                if call.waiters >= waiters:
+                    break
+            time.sleep(0.001)
+        return value() if callable(value) else value
+    return fn
+
+
+def test_single_flight_runs_fn_once_and_shares_result():
+    flight = SingleFlight()
+    runs = []
+    results, errors = run_concurrently(
+        flight, leader_waiting_for(flight, 3, lambda: runs.append(1) or 42))
+
+    assert errors == []
+    assert runs == [1]
+    assert results == [(42, True)] * 4
+    assert flight.in_flight() == 0
+
+
+def test_single_flight_gives_every_caller_its_own_frame():
+    flight = SingleFlight()
+    frame = pd.DataFrame({'close': [1.0, 2.0]})
+    results, errors = run_concurrently(flight, leader_waiting_for(flight, 3, frame))
+
+    assert errors == []
+    frames = [result for result, shared in results]
+    assert all(shared for _, shared in results)
+    assert len({id(result) for result in frames}) == 4
+    frames[0].loc[0, 'close'] = 99.0
+    assert all(result['close'].tolist() == [1.0, 2.0] for result in frames[1:])
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+
+    def fail():
+        leader_waiting_for(flight, 2, None)()
+        raise ConnectionError('reset')
+
+    results, errors = run_concurrently(flight, fail, waiters=2)
+    assert results == []
+    assert len(errors) == 3 and all(isinstance(exc, ConnectionError) for exc in errors)
+    assert flight.in_flight() == 0
+
+
+def test_single_flight_without_waiters_is_not_shared():
+    flight = SingleFlight()
+    frame = pd.DataFrame({'close': [1.0]})
+    result, shared = flight.do('key', lambda: frame)
+    assert result is frame
+    assert not shared
+
+
+def test_single_flight_leader_error_propagates():
+    flight = SingleFlight()
+    with pytest.raises(ValueError):
+        flight.do('key', lambda: (_ for _ in ()).throw(ValueError('bad')))
+    assert flight.in_flight() == 0
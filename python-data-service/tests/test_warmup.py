@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+import stock_data_service as svc
+import warmup as warmup_module
+from warmup import Warmup
+
+
+@pytest.fixture
+def warmup(monkeypatch):
+    monkeypatch.setattr(warmup_module, 'WARMUP_ENABLED', True)
+    monkeypatch.delenv('WARMUP_DATASETS', raising=False)
+    instance = Warmup()
+    monkeypatch.setattr(svc, 'warmup', instance)
+    return instance
+
+
+def ready_status():
+    response = svc.app.test_client().get('/ready')
+    return response.status_code, response.get_json()
+
+
+def wait_until_ready(warmup):
+    deadline = time.time() + 5
+    while not warmup.is_ready() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_ready_returns_503_until_warmup_completes(warmup):
+    release = threading.Event()
+    warmup.register('hot_rank', lambda: release.wait(5) and 100, fetched_at=lambda: time.time() - 3)
+
+    # 本进程尚未开始预热
+    assert ready_status()[0] == 503
+    assert warmup.start()
+    assert not warmup.start()
+    status, body = ready_status()
+    assert status == 503
+    assert body['datasets']['hot_rank']['state'] in ('pending', 'loading')
+
+    release.set()
+    wait_until_ready(warmup)
+    status, body = ready_status()
+    assert status == 200
+    assert body['ready']
+    dataset = body['datasets']['hot_rank']
+    assert (dataset['state'], dataset['detail'], dataset['error']) == ('ready', 100, None)
+    assert dataset['ageSeconds'] >= 3
+
+
+def test_failed_step_does_not_block_readiness(warmup):
+    def broken():
+        raise ConnectionError('reset')
+
+    warmup.register('spot', broken)
+    warmup.register('industry_boards', lambda: 86)
+    warmup.start()
+    wait_until_ready(warmup)
+
+    status, body = ready_status()
+    assert status == 200
+    assert body['datasets']['spot']['state'] == 'failed'
+    assert body['datasets']['spot']['error'] == 'ConnectionError: reset'
+    assert body['datasets']['industry_boards']['state'] == 'ready'
+
+
+def test_hanging_step_is_ready_after_timeout(warmup, monkeypatch):
+    monkeypatch.setattr(warmup_module, 'WARMUP_TIMEOUT', 0.2)
+    release = threading.Event()
+    warmup.register('watchlist_bars', lambda: release.wait(5))
+    try:
+        warmup.start()
+        assert ready_status()[0] == 503
+        time.sleep(0.25)
+        status, body = ready_status()
+        assert status == 200
+        assert body['datasets']['watchlist_bars']['state'] == 'loading'
+    finally:
+        release.set()
+
+
+def test_configured_datasets_limit_warmup(warmup, monkeypatch):
+    monkeypatch.setenv('WARMUP_DATASETS', 'spot')
+    warmup.register('spot', lambda: 1)
+    warmup.register('hot_rank', lambda: pytest.fail('not selected'))
+    warmup.start()
+    wait_until_ready(warmup)
+
+    assert list(warmup.snapshot()['datasets']) == ['spot']
+
+
+def test_disabled_warmup_is_ready_immediately(monkeypatch):
+    monkeypatch.setattr(warmup_module, 'WARMUP_ENABLED', False)
+    instance = Warmup()
+    monkeypatch.setattr(svc, 'warmup', instance)
+
+    assert not instance.start()
+    assert ready_status()[0] == 200
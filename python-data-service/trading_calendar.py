@@ -0,0 +1,244 @@
+"""
+交易日历与交易时段时钟 - 判断当前是否开市，并计算下一次行情可能变化的时间
+
+交易日来自 tool_trade_date_hist_sina（包含当年剩余交易日），保存到本地 JSON，
+日历即将用完时在后台线程中刷新（请求线程继续使用现有日历）；取不到日历时退化为“周一到周五都是交易日”。
+
+A股时段（北京时间）：
+    09:15 集合竞价开始 —— 11:30 上午收盘
+    13:00 下午开盘     —— 15:00 收盘
+    15:00 —— 15:30 盘后结算（含科创板/创业板盘后固定价格交易），15:30 之后日线可用
+行情只在 [09:15, 11:30) 和 [13:00, 15:30) 内变化，其余时间的缓存可以一直用到下一个时段开始。
+所有时段都按北京时间计算，与服务器所在时区无关；传入不带时区的 datetime 时视为北京时间。
+"""
+
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from typing import Callable, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from lazy_import import lazy_import
+
+# pandas 延迟导入（见 lazy_import.py），导入本模块时不加载
+pd = lazy_import('pandas')
+
+DEFAULT_CALENDAR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'trade_calendar.json')
+
+try:
+    MARKET_TZ = ZoneInfo('Asia/Shanghai')
+except ZoneInfoNotFoundError:  # pragma: no cover - Windows 未安装 tzdata 时使用固定偏移（中国不实行夏令时）
+    MARKET_TZ = timezone(timedelta(hours=8), 'Asia/Shanghai')
+
+PRE_OPEN = dtime(9, 15)
+MORNING_CLOSE = dtime(11, 30)
+AFTERNOON_OPEN = dtime(13, 0)
+MARKET_CLOSE = dtime(15, 0)
+# 收盘后行情（日线、盘后交易）落定的时间
+SETTLED = dtime(15, 30)
+
+# 日历剩余天数少于该值时刷新
+REFRESH_WHEN_REMAINING_DAYS = 7
+# 刷新失败后的重试间隔（秒）
+RETRY_AFTER_FAILURE_SECONDS = 3600
+
+
+def market_now() -> datetime:
+    """当前北京时间（带时区）。"""
+    return datetime.now(MARKET_TZ)
+
+
+def _market_time(now: Optional[datetime]) -> datetime:
+    """转换为北京时间；None 为当前时间，不带时区的 datetime 视为北京时间。"""
+    if now is None:
+        return market_now()
+    if now.tzinfo is None:
+        return now.replace(tzinfo=MARKET_TZ)
+    return now.astimezone(MARKET_TZ)
+
+
+def _default_fetch() -> pd.DataFrame:
+    import akshare as ak  # pylint: disable=import-outside-toplevel
+    from upstream import ak_call  # pylint: disable=import-outside-toplevel
+    return ak_call(ak.tool_trade_date_hist_sina)
+
+
+class TradingCalendar:
+    """交易日历，线程安全，首次使用时加载。"""
+
+    def __init__(self, path: Optional[str] = None, fetch: Callable[[], pd.DataFrame] = _default_fetch):
+        self.path = path or os.getenv('TRADE_CALENDAR_PATH', DEFAULT_CALENDAR_PATH)
+        self._fetch = fetch
+        self._days: List[date] = []
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._last_attempt = 0.0
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    # ---------- 加载 ----------
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load_file()
+                    self._loaded = True
+        if not self._needs_refresh():
+            return
+        with self._lock:
+            if time.time() - self._last_attempt < RETRY_AFTER_FAILURE_SECONDS:
+                return
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._last_attempt = time.time()
+            # 在后台刷新，不阻塞请求线程；刷新期间继续使用现有日历（或按工作日估算）
+            self._refresh_thread = threading.Thread(target=self.refresh, name='trading-calendar', daemon=True)
+            self._refresh_thread.start()
+
+    def _load_file(self) -> None:
+        """调用方需持有 self._lock。"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as fh:
+                payload = json.load(fh)
+            self._days = sorted(date.fromisoformat(d) for d in payload.get('tradeDates', []))
+            print(f"[{datetime.now()}] 已加载交易日历: {len(self._days)} 个交易日, 截止 {self._days[-1] if self._days else '-'}")
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 交易日历文件损坏，忽略: {exc}")
+            self._days = []
+
+    def _needs_refresh(self) -> bool:
+        return not self._days or self._days[-1] < market_now().date() + timedelta(days=REFRESH_WHEN_REMAINING_DAYS)
+
+    def refresh(self) -> bool:
+        """从上游重新获取交易日历，成功返回 True。"""
+        self._last_attempt = time.time()
+        try:
+            df = self._fetch()
+            if df is None or df.empty:
+                raise ValueError("tool_trade_date_hist_sina 返回空数据")
+            column = 'trade_date' if 'trade_date' in df.columns else df.columns[0]
+            days = sorted({d.date() for d in pd.to_datetime(df[column], errors='coerce').dropna()})
+            if not days:
+                raise ValueError("交易日历解析结果为空")
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 获取交易日历失败，按工作日估算: {str(exc)[:150]}")
+            return False
+        with self._lock:
+            self._days = days
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as fh:
+                json.dump({'tradeDates': [d.isoformat() for d in days]}, fh)
+            os.replace(tmp_path, self.path)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[{datetime.now()}] ⚠️ 写入交易日历文件失败: {exc}")
+        print(f"[{datetime.now()}] ✅ 交易日历已更新: {len(days)} 个交易日, 截止 {days[-1]}")
+        return True
+
+    # ---------- 交易日 ----------
+
+    def is_trading_day(self, day: date) -> bool:
+        self._ensure_loaded()
+        days = self._days
+        if days and days[0] <= day <= days[-1]:
+            index = bisect.bisect_left(days, day)
+            return days[index] == day
+        return day.weekday() < 5
+
+    def previous_trading_day(self, day: date) -> date:
+        """严格早于 day 的最近一个交易日。"""
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def next_trading_day(self, day: date) -> date:
+        """严格晚于 day 的最近一个交易日。"""
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    # ---------- 交易时段 ----------
+
+    def last_settled_trade_date(self, now: Optional[datetime] = None) -> date:
+        """当前应能取到的最新完整日线日期：交易日 15:30 之后为当日，否则为上一个交易日。"""
+        now = _market_time(now)
+        today = now.date()
+        if self.is_trading_day(today) and now.time() >= SETTLED:
+            return today
+        return self.previous_trading_day(today)
+
+    def is_market_active(self, now: Optional[datetime] = None) -> bool:
+        """行情是否可能正在变化（交易日的 [09:15, 11:30) 和 [13:00, 15:30)，与 session_state 的
+        trading / settling 对应）。"""
+        now = _market_time(now)
+        if not self.is_trading_day(now.date()):
+            return False
+        t = now.time()
+        return PRE_OPEN <= t < MORNING_CLOSE or AFTERNOON_OPEN <= t < SETTLED
+
+    def session_state(self, now: Optional[datetime] = None) -> str:
+        """closed / pre_open / trading / lunch_break / settling / post_close。
+
+        settling 为 15:00 收盘到 15:30 盘后数据落定之间，行情仍可能变化（is_market_active 为 True）。
+        """
+        now = _market_time(now)
+        if not self.is_trading_day(now.date()):
+            return 'closed'
+        t = now.time()
+        if t < PRE_OPEN:
+            return 'pre_open'
+        if t < MORNING_CLOSE:
+            return 'trading'
+        if t < AFTERNOON_OPEN:
+            return 'lunch_break'
+        if t < MARKET_CLOSE:
+            return 'trading'
+        if t < SETTLED:
+            return 'settling'
+        return 'post_close'
+
+    def next_market_event(self, now: Optional[datetime] = None) -> datetime:
+        """下一次行情可能开始变化的时间（北京时间）；当前处于活跃时段时返回 now。"""
+        now = _market_time(now)
+        if self.is_market_active(now):
+            return now
+        today = now.date()
+        if self.is_trading_day(today):
+            t = now.time()
+            if t < PRE_OPEN:
+                return datetime.combine(today, PRE_OPEN, tzinfo=MARKET_TZ)
+            if t < AFTERNOON_OPEN:
+                return datetime.combine(today, AFTERNOON_OPEN, tzinfo=MARKET_TZ)
+        return datetime.combine(self.next_trading_day(today), PRE_OPEN, tzinfo=MARKET_TZ)
+
+    def expires_at(self, fetched_at: float, live_ttl: float) -> float:
+        """缓存条目的过期时间戳：在活跃时段取得的数据 live_ttl 秒后过期；
+        闭市期间取得的数据一直有效到下一个时段开始。"""
+        fetched = datetime.fromtimestamp(fetched_at, MARKET_TZ)
+        if self.is_market_active(fetched):
+            return fetched_at + live_ttl
+        return max(fetched_at + live_ttl, self.next_market_event(fetched).timestamp())
+
+    def status(self, now: Optional[datetime] = None) -> dict:
+        now = _market_time(now)
+        return {
+            'session': self.session_state(now),
+            'marketActive': self.is_market_active(now),
+            'isTradingDay': self.is_trading_day(now.date()),
+            'lastSettledTradeDate': self.last_settled_trade_date(now).isoformat(),
+            'nextMarketEvent': self.next_market_event(now).isoformat(),
+            'calendarEnd': self._days[-1].isoformat() if self._days else None,
+        }
+
+
+trading_calendar = TradingCalendar()
@@ -0,0 +1,284 @@
+"""
+上游调用网关 - 服务和策略模块中的AKShare调用统一通过 ak_call 发出
+
+相同 (函数, 参数) 的并发调用会合并为一次真实请求（single-flight），
+其余调用方等待并共享结果，避免高峰期对上游的瞬时重复请求触发限流。
+每次真实请求的结果和耗时会记录到 provider_health，用于调整备用数据源的顺序；
+每个上游函数有独立的熔断器，持续故障时直接抛出 CircuitOpenError，不再占用线程等待超时。
+
+每个数据源主机（东方财富、新浪、腾讯、交易所）有独立的并发上限，无论调用来自多少个线程，
+同时发往同一主机的请求数都不会超过上限（多进程部署时上限由各工作进程平分）；请求速率由 rate_limiter 的令牌桶控制。异步处理函数可以 await ak_call_async：
+调用在该主机专用的有界线程池中执行，排队等待的调用不占用线程。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import metrics
+from circuit_breaker import CircuitOpenError, circuit_breakers, is_upstream_failure
+from provider_health import provider_health
+from rate_limiter import process_count, rate_limiters
+
+
+class _InFlightCall:
+    __slots__ = ('event', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+def _snapshot(result: Any) -> Any:
+    return result.copy() if hasattr(result, 'copy') else result
+
+
+class SingleFlight:
+    """同一 key 同时只执行一次 fn，并发调用方共享其结果或异常。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]):
+        """执行 fn 或等待正在执行的同 key 调用。
+
+        结果被共享时每个调用方拿到各自的对象：执行方返回 fn 的原始结果，等待方各自复制
+        执行方在唤醒等待方之前留下的快照（有 copy() 的结果，如 DataFrame），
+        任何一方修改自己的结果都不影响其他调用方。
+
+        Returns:
+            (result, shared)：shared 为 True 表示结果被多个调用方共享。
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _InFlightCall()
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return _snapshot(call.result), True
+
+        shared = False
+        try:
+            result = fn()
+        except BaseException as exc:  # pylint: disable=broad-except
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+                shared = call.waiters > 0
+            if shared and call.error is None:
+                # 快照在唤醒等待方之前生成，执行方随后修改 result 不会与等待方的复制并发
+                call.result = _snapshot(result)
+            call.event.set()
+        return result, shared
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+_single_flight = SingleFlight()
+
+
+def call_key(func: Callable, args: tuple, kwargs: dict) -> Optional[Hashable]:
+    """根据函数和参数生成合并用的 key；闭包、lambda 或不可哈希参数返回 None（不合并）。"""
+    qualname = getattr(func, '__qualname__', '')
+    if not qualname or '<' in qualname:
+        return None
+    key = (getattr(func, '__module__', ''), qualname, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def upstream_name(func: Callable) -> str:
+    """上游函数名，如 stock_zh_a_daily。"""
+    return getattr(func, '__name__', repr(func))
+
+
+# 各数据源主机允许的最大并发请求数（整个服务的总量）
+HOST_LIMITS = {
+    'eastmoney': int(os.getenv('UPSTREAM_LIMIT_EASTMONEY', '8')),
+    'sina': int(os.getenv('UPSTREAM_LIMIT_SINA', '4')),
+    'tencent': int(os.getenv('UPSTREAM_LIMIT_TENCENT', '4')),
+    'exchange': int(os.getenv('UPSTREAM_LIMIT_EXCHANGE', '2')),
+    'default': int(os.getenv('UPSTREAM_LIMIT_DEFAULT', '4')),
+}
+
+
+def process_host_limit(limit: int) -> int:
+    """本进程的主机并发上限：总量按工作进程数平分（向下取整），每个进程至少 1。"""
+    return max(1, limit // process_count())
+
+
+# 函数名不带 _em / _tx / sina 后缀的接口所在主机
+_HOST_BY_FUNCTION = {
+    'stock_zh_a_hist': 'eastmoney',
+    'stock_zh_a_daily': 'sina',
+    'stock_zh_a_minute': 'sina',
+    'stock_zh_a_spot': 'sina',
+    'stock_financial_abstract': 'sina',
+}
+
+
+def upstream_host(func: Callable) -> str:
+    """上游函数所在的数据源主机：eastmoney / sina / tencent / exchange / default。"""
+    name = upstream_name(func)
+    if name in _HOST_BY_FUNCTION:
+        return _HOST_BY_FUNCTION[name]
+    if name.endswith('_em') or '_em_' in name:
+        return 'eastmoney'
+    if name.endswith('_tx') or '_tx_' in name:
+        return 'tencent'
+    if 'sina' in name:
+        return 'sina'
+    if name.startswith('stock_info_') and name.endswith('_name_code'):
+        return 'exchange'
+    return 'default'
+
+
+class HostLimiter:
+    """单个数据源主机的并发上限，以及异步调用使用的有界线程池。"""
+
+    def __init__(self, host: str, limit: int):
+        self.host = host
+        self.limit = max(1, limit)
+        self._semaphore = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __enter__(self):
+        with self._lock:
+            self._waiting += 1
+        self._semaphore.acquire()
+        with self._lock:
+            self._waiting -= 1
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self._active -= 1
+        self._semaphore.release()
+
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.limit,
+                                                        thread_name_prefix=f'upstream-{self.host}')
+        return self._executor
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            queued = self._executor._work_queue.qsize() if self._executor is not None else 0  # pylint: disable=protected-access
+            return {'limit': self.limit, 'active': self._active, 'waiting': self._waiting, 'queued': queued}
+
+
+_host_limiters = {host: HostLimiter(host, process_host_limit(limit)) for host, limit in HOST_LIMITS.items()}
+
+
+def host_limiter(func: Callable) -> HostLimiter:
+    return _host_limiters[upstream_host(func)]
+
+
+def host_snapshot() -> Dict[str, Dict]:
+    """各数据源主机的并发上限和当前占用。"""
+    return {host: limiter.snapshot() for host, limiter in _host_limiters.items()}
+
+
+def _host_gauge(field: str):
+    return lambda: {(host,): snapshot[field] for host, snapshot in host_snapshot().items()}
+
+
+metrics.registry.register(metrics.Gauge(
+    'upstream_in_flight', '各数据源主机正在进行的上游请求数', ('host',), collect=_host_gauge('active')))
+metrics.registry.register(metrics.Gauge(
+    'upstream_waiting', '各数据源主机等待并发名额的调用数', ('host',), collect=_host_gauge('waiting')))
+
+
+def _invoke(func: Callable, args: tuple, kwargs: dict):
+    """发出真实请求（受主机速率和并发上限约束），记录数据源健康度、运行指标并更新熔断器。"""
+    name = upstream_name(func)
+    host = upstream_host(func)
+    breaker = circuit_breakers.get(name)
+    # 先等令牌再占并发名额，等待期间不占用主机的并发上限
+    rate_limiters.acquire(name, host)
+    with host_limiter(func):
+        started = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:  # pylint: disable=broad-except
+            elapsed = time.time() - started
+            provider_health.record(name, False, elapsed, exc)
+            metrics.observe_upstream(name, host, elapsed, exc)
+            if is_upstream_failure(exc):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+    elapsed = time.time() - started
+    # 空 DataFrame 计为该数据源的失败（调整备用数据源顺序），但不是连接故障，不计入熔断
+    provider_health.record(name, getattr(result, 'empty', False) is not True, elapsed)
+    metrics.observe_upstream(name, host, elapsed)
+    breaker.record_success()
+    return result
+
+
+def ak_call(func: Callable, *args, **kwargs):
+    """调用AKShare函数，相同参数的并发调用只发出一次请求。
+
+    结果被多个调用方共享时，每个调用方拿到的都是 DataFrame 的副本，可以放心修改。
+
+    Raises:
+        CircuitOpenError: 该上游函数处于熔断状态。
+    """
+    name = upstream_name(func)
+    try:
+        circuit_breakers.get(name).before_call()
+    except CircuitOpenError:
+        if metrics.METRICS_ENABLED:
+            metrics.upstream_rejected.inc(function=name)
+        raise
+    key = call_key(func, args, kwargs)
+    if key is None:
+        return _invoke(func, args, kwargs)
+
+    result, shared = _single_flight.do(key, lambda: _invoke(func, args, kwargs))
+    if shared:
+        if metrics.METRICS_ENABLED:
+            metrics.upstream_coalesced.inc(function=name)
+        print(f"[{datetime.now()}] 🔗 合并并发请求: {name}")
+    return result
+
+
+async def ak_call_async(func: Callable, *args, **kwargs):
+    """ak_call 的异步版本：在该上游主机的有界线程池中执行，等待期间不占用调用方线程。
+
+    Raises:
+        CircuitOpenError: 该上游函数处于熔断状态。
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(host_limiter(func).executor(), functools.partial(ak_call, func, *args, **kwargs))
@@ -0,0 +1,155 @@
+"""
+启动预热 - 服务启动后在后台并发预取常用数据集，并单独报告就绪状态
+
+    - 各数据集（人气榜、实时行情快照、行业板块列表、自选股日线等）由服务登记加载函数，
+      启动时在有界线程池中并发加载，第一批用户请求直接命中缓存
+    - 存活（/health）与就绪（/ready）分开：预热全部结束（成功或失败）或超过 WARMUP_TIMEOUT 后才算就绪，
+      单个数据集失败不会让实例一直不就绪，对应请求回退到按需加载
+    - 就绪状态中列出每个数据集的加载状态、耗时和当前数据的获取时间/年龄
+
+配置：
+    WARMUP_ENABLED=1                 是否启用预热
+    WARMUP_DATASETS=hot_rank,spot    只预热列出的数据集（默认全部已登记的数据集）
+    WARMUP_CONCURRENCY=4             同时加载的数据集数
+    WARMUP_TIMEOUT=60                超过该秒数仍未完成时也报告就绪
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', '1').lower() not in ('0', 'false', 'no')
+WARMUP_CONCURRENCY = int(os.getenv('WARMUP_CONCURRENCY', '4'))
+WARMUP_TIMEOUT = float(os.getenv('WARMUP_TIMEOUT', '60'))
+
+
+def _configured_datasets() -> Optional[List[str]]:
+    raw = os.getenv('WARMUP_DATASETS', '').strip()
+    if not raw:
+        return None
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+@dataclass
+class WarmupTask:
+    name: str
+    loader: Callable[[], Any]
+    # 返回当前缓存数据的获取时间戳（没有数据时返回 None），用于报告数据年龄
+    fetched_at: Optional[Callable[[], Optional[float]]] = None
+    state: str = 'pending'
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    detail: Any = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class Warmup:
+    """预热任务登记表和执行状态，线程安全。每个进程（包括 fork 出的工作进程）各自预热一次。"""
+
+    def __init__(self):
+        self._tasks: Dict[str, WarmupTask] = {}
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._started_at: Optional[float] = None
+        self._selected: List[str] = []
+
+    def register(self, name: str, loader: Callable[[], Any],
+                 fetched_at: Optional[Callable[[], Optional[float]]] = None) -> None:
+        """登记数据集。loader 失败时应抛出异常，返回值（如条数）会出现在就绪状态中。"""
+        with self._lock:
+            self._tasks[name] = WarmupTask(name, loader, fetched_at)
+
+    def start(self) -> bool:
+        """在后台开始预热；本进程已开始过或未启用时返回 False。"""
+        if not WARMUP_ENABLED:
+            return False
+        with self._lock:
+            if self._pid == os.getpid():
+                return False
+            self._pid = os.getpid()
+            self._started_at = time.time()
+            configured = _configured_datasets()
+            self._selected = [name for name in self._tasks if configured is None or name in configured]
+            tasks = [self._tasks[name] for name in self._selected]
+            for task in tasks:
+                task.state, task.started_at, task.finished_at, task.error, task.detail = 'pending', None, None, None, None
+        print(f"[{datetime.now()}] 🔥 开始预热: {', '.join(self._selected) or '（无）'}")
+        threading.Thread(target=self._run, args=(tasks,), name='warmup', daemon=True).start()
+        return True
+
+    def _run(self, tasks: List[WarmupTask]) -> None:
+        with ThreadPoolExecutor(max_workers=max(1, WARMUP_CONCURRENCY), thread_name_prefix='warmup') as executor:
+            for task in tasks:
+                executor.submit(self._run_task, task)
+        done = sum(1 for task in tasks if task.state == 'ready')
+        print(f"[{datetime.now()}] ✅ 预热结束: {done}/{len(tasks)} 个数据集已加载，"
+              f"用时 {time.time() - self._started_at:.1f}秒")
+
+    @staticmethod
+    def _run_task(task: WarmupTask) -> None:
+        with task.lock:
+            task.state = 'loading'
+            task.started_at = time.time()
+        try:
+            detail = task.loader()
+            with task.lock:
+                task.state, task.detail = 'ready', detail
+        except Exception as exc:  # pylint: disable=broad-except
+            with task.lock:
+                task.state, task.error = 'failed', f"{type(exc).__name__}: {str(exc)[:200]}"
+            print(f"[{datetime.now()}] ⚠️ 预热 {task.name} 失败: {task.error}")
+        finally:
+            with task.lock:
+                task.finished_at = time.time()
+
+    def _selected_tasks(self) -> List[WarmupTask]:
+        with self._lock:
+            return [self._tasks[name] for name in self._selected]
+
+    def is_ready(self) -> bool:
+        """预热未启用、全部结束或已超时即为就绪；本进程尚未开始预热时未就绪。"""
+        if not WARMUP_ENABLED:
+            return True
+        if self._pid != os.getpid() or self._started_at is None:
+            return False
+        if time.time() - self._started_at >= WARMUP_TIMEOUT:
+            return True
+        return all(task.state in ('ready', 'failed') for task in self._selected_tasks())
+
+    def snapshot(self) -> Dict:
+        now = time.time()
+        datasets = {}
+        for task in self._selected_tasks():
+            with task.lock:
+                entry = {
+                    'state': task.state,
+                    'seconds': round((task.finished_at or now) - task.started_at, 2) if task.started_at else None,
+                    'error': task.error,
+                    'detail': task.detail,
+                }
+            fetched_at = None
+            if task.fetched_at is not None:
+                try:
+                    fetched_at = task.fetched_at()
+                except Exception:  # pylint: disable=broad-except
+                    fetched_at = None
+            entry['fetchedAt'] = datetime.fromtimestamp(fetched_at).isoformat() if fetched_at else None
+            entry['ageSeconds'] = round(now - fetched_at, 1) if fetched_at else None
+            datasets[task.name] = entry
+        started = self._started_at if self._pid == os.getpid() else None
+        return {
+            'ready': self.is_ready(),
+            'enabled': WARMUP_ENABLED,
+            'startedAt': datetime.fromtimestamp(started).isoformat() if started else None,
+            'datasets': datasets,
+        }
+
+
+warmup = Warmup()
@@ -0,0 +1,97 @@
+"""
+工作进程状态 - 记录当前进程的运行模式、线程数和请求负载，供健康检查返回
+
+多进程部署（serve.py）时每个工作进程各自统计，/health 返回处理该请求的进程的状态，
+负载均衡或监控可以据此判断某个进程是否被慢请求占满。
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+# 超过该秒数仍未结束的请求视为慢请求
+SLOW_REQUEST_SECONDS = float(os.getenv('SLOW_REQUEST_SECONDS', '10'))
+
+
+class WorkerStatus:
+    """当前进程的请求计数，线程安全。"""
+
+    def __init__(self):
+        self.mode = 'dev'
+        self.workers = 1
+        # 0 表示线程数不固定（开发服务器每个请求一个线程）
+        self.threads = 0
+        self._pid = os.getpid()
+        self._started_at = time.time()
+        self._in_flight: Dict[int, float] = {}
+        self._handled = 0
+        self._failed = 0
+        self._total_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, mode: str, workers: int, threads: int) -> None:
+        self.mode = mode
+        self.workers = workers
+        self.threads = threads
+
+    def _check_fork(self) -> None:
+        """调用方需持有 self._lock。主进程预加载后 fork 出的工作进程从零开始统计。"""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._started_at = time.time()
+            self._in_flight = {}
+            self._handled = 0
+            self._failed = 0
+            self._total_seconds = 0.0
+
+    def after_fork(self) -> None:
+        """工作进程启动时调用，重置统计。"""
+        with self._lock:
+            self._check_fork()
+
+    def begin(self) -> None:
+        with self._lock:
+            self._check_fork()
+            self._in_flight[threading.get_ident()] = time.time()
+
+    def end(self, failed: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            self._check_fork()
+            started = self._in_flight.pop(threading.get_ident(), None)
+            if started is None:
+                return
+            self._handled += 1
+            self._total_seconds += now - started
+            if failed:
+                self._failed += 1
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        now = now or time.time()
+        with self._lock:
+            self._check_fork()
+            durations = [now - started for started in self._in_flight.values()]
+            handled = self._handled
+            return {
+                'pid': self._pid,
+                'mode': self.mode,
+                'workers': self.workers,
+                'threads': self.threads,
+                'startedAt': datetime.fromtimestamp(self._started_at).isoformat(),
+                'uptimeSeconds': round(now - self._started_at, 1),
+                'inFlight': len(durations),
+                'slowInFlight': sum(1 for d in durations if d >= SLOW_REQUEST_SECONDS),
+                'longestInFlightSeconds': round(max(durations), 2) if durations else 0.0,
+                'busyRatio': round(len(durations) / self.threads, 2) if self.threads else None,
+                'handled': handled,
+                'failed': self._failed,
+                'avgSeconds': round(self._total_seconds / handled, 3) if handled else None,
+            }
+
+
+worker_status = WorkerStatus()